@@ -1,17 +1,26 @@
 import os
 import sys
 import time
+import queue
 import serial
-import subprocess
-import RPi.GPIO as GPIO
+import threading
+
+from booth_service import BoothService
+from bus_state import BusStateStore
+import tracing
+import serial_link
+from gpio_backend import RPiGPIOBackend, LOW, HIGH
+from keypad_driver import KeypadDriver
 
 try:
     import pygame
-    from text_to_speech_rpi import speak
+    from text_to_speech_rpi import speak, prewarm_vocabulary
+    from audio_player import PRIORITY_URGENT, PRIORITY_KEY
     tts_enabled = True
 except ImportError:
     def speak(text, **kwargs):
         print(f"[TTS 비활성] {text}")
+    PRIORITY_URGENT, PRIORITY_KEY = 0, 1
     tts_enabled = False
 
 LED_PIN = 18
@@ -25,77 +34,177 @@ KEYS_LAYOUT = [
 
 BASE_DIR           = "/home/pi"
 NUMBER_FILE        = os.path.join(BASE_DIR, "bus_number.txt")
-FETCH_SPEAK_SCRIPT = os.path.join(BASE_DIR, "fetch_and_speak.py")
-VOICE_SCRIPT       = os.path.join(BASE_DIR, "run_pipeline.sh")
-
-send_list      = []
-DEBOUNCE_DELAY = 0.3
-
-def launch_and_wait(cmd, cwd=None):
-    subprocess.run(cmd, cwd=cwd)
-
-def init_gpio():
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setwarnings(False)
-    for r in ROWS: GPIO.setup(r, GPIO.OUT, initial=GPIO.LOW)
-    for c in COLS: GPIO.setup(c, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-    GPIO.setup(LED_PIN, GPIO.OUT, initial=GPIO.LOW)
-
-def read_keypad():
-    for r_pin in ROWS:
-        GPIO.output(r_pin, GPIO.HIGH)
-        for c_pin in COLS:
-            if GPIO.input(c_pin) == GPIO.HIGH:
-                while GPIO.input(c_pin): time.sleep(0.01)
-                GPIO.output(r_pin, GPIO.LOW)
-                return KEYS_LAYOUT[ROWS.index(r_pin)][COLS.index(c_pin)]
-        GPIO.output(r_pin, GPIO.LOW)
-    return None
+
+state          = None   # BusStateStore (bus_number.txt + 저널)
+gpio           = None
+
+def init_gpio(backend=None):
+    global gpio
+    gpio = backend or RPiGPIOBackend()
+    gpio.setup_output(LED_PIN, LOW)
+    return gpio
 
 def add_bus_number(new_number):
-    if new_number not in send_list:
-        send_list.append(new_number)
-        with open(NUMBER_FILE, 'w', encoding='utf-8') as f:
-            for bus in sorted(send_list): f.write(bus + '\n')
-        print(f"{NUMBER_FILE}에 저장 완료: {new_number}")
+    if state.add(new_number):
+        print(f"{state.path}에 저장 완료: {new_number}")
         return True
     return False
 
 def remove_bus_number(bus_to_remove):
-    if bus_to_remove in send_list:
-        send_list.remove(bus_to_remove)
-        with open(NUMBER_FILE, 'w', encoding='utf-8') as f:
-            for bus in sorted(send_list): f.write(bus + '\n')
+    if state.remove(bus_to_remove):
         print(f"리스트 및 파일에서 제거: {bus_to_remove}")
-        speak(f"{bus_to_remove}번 버스 도착이 확인되었습니다.", speaker_keyword="USB")
-        if not send_list: speak("모든 버스 탑승이 완료되었습니다.", speaker_keyword="USB")
-    else: print(f"제거 요청된 버스({bus_to_remove})가 리스트에 없습니다.")
+        handle = speak(f"{bus_to_remove}번 버스 도착이 확인되었습니다.", speaker_keyword="USB", block=False, priority=PRIORITY_URGENT)
+        if not len(state): speak("모든 버스 탑승이 완료되었습니다.", speaker_keyword="USB", block=False, priority=PRIORITY_URGENT)
+        return handle
+    print(f"제거 요청된 버스({bus_to_remove})가 리스트에 없습니다.")
+    return None
+
+def trace_first_audio(handle, name, since):
+    # 입력(키/도착 신호) 시각부터 해당 안내가 실제로 재생되기 시작할 때까지
+    if handle is not None and tracing.enabled():
+        handle.on_start(lambda h: tracing.record(name, h.started_at - since))
 
 def update_led_status():
-    if send_list: GPIO.output(LED_PIN, GPIO.HIGH)
-    else: GPIO.output(LED_PIN, GPIO.LOW)
+    gpio.output(LED_PIN, HIGH if len(state) else LOW)
 
 def sync_state_from_file():
-    global send_list
-    if os.path.exists(NUMBER_FILE):
-        with open(NUMBER_FILE, 'r', encoding='utf-8') as f:
-            send_list = sorted([line.strip() for line in f if line.strip()])
-    else:
-        send_list = []
-    update_led_status() 
-
-def cleanup_and_exit(ser):
+    # 다른 프로세스가 남긴 변경분(저널)만 읽어 반영
+    added, removed = state.refresh()
+    update_led_status()
+    return added, removed
+
+def serial_write(link, text):
+    # 송신 큐에 넣기만 한다 (묶어서 보내고 ACK가 없으면 링크가 재전송)
+    with tracing.span("serial.write"):
+        link.register(text)
+    print(f"전송: {text}")
+
+def on_link_message(link, events, topic, data):
+    if topic == "arrived":
+        events.put(("serial", data, time.monotonic()))
+    elif topic == "hello":
+        # 아두이노가 재시작하면 송신 목록을 잃으므로 현재 목록을 다시 보낸다
+        for bus in state.items(): link.register(bus)
+
+def action_worker(service, actions, events):
+    # 조회/음성 입력처럼 오래 걸리는 작업은 여기서 처리하고, 메인 루프는 계속 이벤트를 받는다
+    while True:
+        action = actions.get()
+        if action is None: return
+        name, arg = action
+        try:
+            if name == "fetch": service.fetch(arg)
+            elif name == "voice": service.voice()
+        except Exception as e:
+            print(f"작업 처리 중 오류({name}): {e}", file=sys.stderr)
+        finally:
+            if name == "voice": events.put(("voice_done", None, time.monotonic()))
+
+def cleanup_and_exit(link, keypad=None):
+    if keypad: keypad.stop()
     if tts_enabled: pygame.quit()
-    if ser and ser.is_open: ser.close()
-    GPIO.cleanup()
+    if link: link.close()
+    if gpio: gpio.cleanup()
     sys.exit(0)
 
+def start_booth(link, service, number_file=NUMBER_FILE):
+    # 상태 저장소, 시리얼 링크 구독, 작업 스레드, 키패드 드라이버를 띄운다 (bench_pipeline.py도 같은 경로 사용)
+    global state
+    print("이전 버스 목록을 모두 삭제합니다.")
+    state = BusStateStore(number_file)
+    state.clear()
+    update_led_status()
+
+    events  = queue.Queue()
+    actions = queue.Queue()
+    stop    = threading.Event()
+    state.watch(lambda added, removed: events.put(("state", (added, removed), time.monotonic())))
+    link.subscribe(lambda topic, data: on_link_message(link, events, topic, data), topics=("arrived", "hello"))
+
+    threading.Thread(target=action_worker, args=(service, actions, events), daemon=True).start()
+    keypad = KeypadDriver(gpio, ROWS, COLS, KEYS_LAYOUT, events)
+    keypad.start()
+    return events, actions, stop, keypad
+
+def run_event_loop(link, service, events, actions):
+    input_string = ""
+    voice_active = False
+
+    while True:
+        kind, value, t = events.get()
+        if kind == "stop": return
+        if kind == "serial":
+            tracing.record("serial.dispatch", time.monotonic() - t)
+            print(f"도착 신호 수신: {value}")
+            trace_first_audio(remove_bus_number(value), "serial.arrived_to_audio", t)
+            update_led_status()
+            continue
+
+        if kind == "state":
+            added, removed = value
+            print(f"목록 변경 감지 (추가 {sorted(added)}, 제거 {sorted(removed)})")
+            update_led_status()
+            if added: service.buses_changed()
+            continue
+
+        if kind == "voice_done":
+            voice_active = False
+            sync_state_from_file()
+            print(f"음성 인식 후 상태 동기화 완료. 현재 목록: {state.items()}")
+            continue
+
+        if kind == "key_up": continue
+        key = value
+        tracing.record("keypad.dispatch", time.monotonic() - t)
+        if voice_active:
+            print(f"[Key] {key} (음성 입력 중, 무시)")
+            continue
+        print(f"[Key] {key}")
+        echo = None
+        if tts_enabled: 
+            if key.isdigit(): echo = speak(key, speaker_keyword="USB", block=False, priority=PRIORITY_KEY)
+            elif key == 'A': echo = speak("지우기", speaker_keyword="USB", block=False, priority=PRIORITY_KEY)
+            elif key == '*': echo = speak("다시", speaker_keyword="USB", block=False, priority=PRIORITY_KEY)
+            elif key == '#': echo = speak("엠", speaker_keyword="USB", block=False, priority=PRIORITY_KEY)
+            elif key == 'D': echo = speak("음성 입력 모드로 전환합니다.", speaker_keyword="USB", block=False)
+        trace_first_audio(echo, "keypad.key_to_audio", t)
+        
+        if key.isdigit(): input_string += key
+        elif key == '#': input_string += 'M'
+        elif key == 'A': input_string = input_string[:-1]
+        elif key == '*': input_string = ""
+        elif key == 'B':
+            if not len(state): speak("조회할 버스가 없습니다.", speaker_keyword="USB", block=False)
+            else:
+                speak("등록된 모든 버스의 실시간 도착 정보를 조회합니다.", speaker_keyword="USB", block=False)
+                actions.put(("fetch", None))
+        elif key == 'C': 
+            if not input_string: speak("입력된 버스 번호가 없습니다.", speaker_keyword="USB", block=False)
+            else:
+                known, matches = service.check_route(input_string)
+                if known is False:
+                    speak(f"{input_string}번 버스는 이 정류장을 지나지 않습니다. 입력하신 번호로 시작하는 노선은 {matches}개입니다.", speaker_keyword="USB", block=False)
+                elif add_bus_number(input_string):
+                    speak(f"{input_string}번 버스를 등록합니다.", speaker_keyword="USB", block=False)
+                    update_led_status()
+                    serial_write(link, input_string)
+                    actions.put(("fetch", input_string))
+                    service.buses_changed()
+                else: speak(f"{input_string}번 버스는 이미 등록되어 있습니다.", speaker_keyword="USB", block=False)
+                input_string = ""
+        elif key == 'D':
+            voice_active = True
+            actions.put(("voice", None))
+        
+        print("[Input]", input_string)
+
 def main():
-    global tts_enabled, send_list
-    ser = None
+    global tts_enabled
+    link = None
     try:
-        ser = serial.Serial('/dev/ttyACM0', 115200, timeout=0.05)
-        time.sleep(2)
+        port = serial_link.open_port()
+        time.sleep(2)   # 포트를 열면 우노가 재시작한다
+        link = serial_link.SerialLink(port).start()
     except serial.SerialException as e:
         print(f"시리얼 포트를 열 수 없습니다: {e}", file=sys.stderr)
         try: speak("시리얼 장치 연결을 확인해주세요.", speaker_keyword="USB")
@@ -109,72 +218,34 @@ def main():
             pygame.mixer.init()
         except Exception as e:
             print(f"{e}"); tts_enabled = False
+    if tts_enabled: prewarm_vocabulary()
 
-    print("이전 버스 목록을 모두 삭제합니다.")
-    send_list.clear()
-    if os.path.exists(NUMBER_FILE): os.remove(NUMBER_FILE)
+    def on_voice_confirmed(bus_number):
+        serial_write(link, bus_number)
 
-    update_led_status()
-    print("키패드 준비 완료 (Ctrl+C 종료)")
-    speak("키패드 사용이 가능합니다.", speaker_keyword="USB")
+    service = BoothService(number_file=NUMBER_FILE, on_bus_confirmed=on_voice_confirmed)
+    service.warm_up()
+    try: service.start_server()
+    except OSError as e: print(f"부스 서비스 소켓을 열 수 없습니다: {e}", file=sys.stderr)
+    # run_pipeline.sh 등 다른 프로세스는 포트를 직접 열지 않고 이 링크로 등록/구독한다
+    try: link.start_server()
+    except OSError as e: print(f"시리얼 링크 소켓을 열 수 없습니다: {e}", file=sys.stderr)
 
-    input_string = ""
-    last_key, last_time = None, 0
+    events, actions, stop, keypad = start_booth(link, service)
+    service.watch_arrivals(state.items)
+    print("키패드 준비 완료 (Ctrl+C 종료)")
+    speak("키패드 사용이 가능합니다.", speaker_keyword="USB", block=False)
 
     try:
-        while True:
-            if ser.in_waiting > 0:
-                response = ser.readline().decode('utf-8').strip()
-                if response.startswith("ARRIVED:"):
-                    arrived_bus = response.split(':')[1]
-                    print(f"도착 신호 수신: {arrived_bus}")
-                    remove_bus_number(arrived_bus)
-                    update_led_status()
-
-            key = read_keypad()
-            now = time.time()
-            if key and (key != last_key or now - last_time > DEBOUNCE_DELAY):
-                print(f"[Key] {key}")
-                if tts_enabled: 
-                    if key.isdigit(): speak(key, speaker_keyword="USB")
-                    elif key == 'A': speak("지우기", speaker_keyword="USB")
-                    elif key == '*': speak("다시", speaker_keyword="USB")
-                    elif key == '#': speak("엠", speaker_keyword="USB")
-                    elif key == 'D': speak("음성 입력 모드로 전환합니다.", speaker_keyword="USB")
-                
-                if key.isdigit(): input_string += key
-                elif key == '#': input_string += 'M'
-                elif key == 'A': input_string = input_string[:-1]
-                elif key == '*': input_string = ""
-                elif key == 'B':
-                    if not send_list: speak("조회할 버스가 없습니다.", speaker_keyword="USB")
-                    else:
-                        speak("등록된 모든 버스의 실시간 도착 정보를 조회합니다.", speaker_keyword="USB")
-                        launch_and_wait(["python3", FETCH_SPEAK_SCRIPT], cwd=BASE_DIR)
-                elif key == 'C': 
-                    if not input_string: speak("입력된 버스 번호가 없습니다.", speaker_keyword="USB")
-                    else:
-                        if add_bus_number(input_string):
-                            speak(f"{input_string}번 버스를 등록합니다.", speaker_keyword="USB")
-                            update_led_status()
-                            launch_and_wait(["python3", FETCH_SPEAK_SCRIPT, input_string], cwd=BASE_DIR)
-                            ser.write((input_string + '\n').encode())
-                            print(f"전송: {input_string}")
-                        else: speak(f"{input_string}번 버스는 이미 등록되어 있습니다.", speaker_keyword="USB")
-                        input_string = ""
-                elif key == 'D':
-                    launch_and_wait(["bash", VOICE_SCRIPT], cwd=BASE_DIR)
-                    sync_state_from_file()
-                    print(f"음성 인식 후 상태 동기화 완료. 현재 목록: {send_list}")
-                
-                print("[Input]", input_string)
-                last_key, last_time = key, now
-            time.sleep(0.02)
+        run_event_loop(link, service, events, actions)
     except KeyboardInterrupt:
         print("\n종료(Ctrl+C)")
     finally:
-        cleanup_and_exit(ser)
+        stop.set()
+        actions.put(None)
+        service.stop()
+        state.stop()
+        cleanup_and_exit(link, keypad)
 
 if __name__ == "__main__":
     main()
-
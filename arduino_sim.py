@@ -0,0 +1,254 @@
+import os
+import sys
+import tty
+import time
+import random
+import select
+import threading
+import collections
+
+from serial_link import (FrameParser, SerialLink, open_port, encode_frame,
+                         T_REGISTER, T_ARRIVED, T_HELLO, T_ACK, ACK_TIMEOUT, MAX_RETRIES)
+
+BAUD_RATE  = 115200
+LOOP_DELAY = (0.0, 0.004)   # 우노 loop()가 라디오 송신/LCD 갱신 때문에 늦게 읽는 시간
+LIST_SIZE  = 10             # transmitter.ino의 sendList 칸 수
+
+
+class ArduinoSimulator:
+    # pty 한쪽 끝에서 transmitter.ino처럼 동작한다. 회선 속도만큼 지연을 두고, corrupt 확률로 바이트마다 비트를 깨뜨린다(양방향).
+    # framed=False면 기존 방식(줄 단위 번호 수신, "ARRIVED:번호" 줄 송신, ACK/재전송 없음).
+    # 송신 목록은 capacity칸(None이면 무제한)이고, 가득 차면 번호를 버리고 ACK 내용으로 거절된 번호를 알린다
+    def __init__(self, corrupt=0.0, framed=True, baud=BAUD_RATE, seed=0, capacity=LIST_SIZE):
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port_name = os.ttyname(self._slave)
+        self.corrupt = corrupt
+        self.framed = framed
+        self.byte_time = 10 / baud
+        self.capacity = capacity
+        self.send_list = []
+        self.rejected = []
+        self.registered = []
+        self.registered_at = {}
+        self.stats = {"bad_frames": 0, "duplicates": 0, "retransmits": 0, "corrupted_bytes": 0}
+        self._rng = random.Random(seed)
+        self._parser = FrameParser()
+        self._line = bytearray()
+        self._rx_seq = None
+        self._last_reply = b""
+        self._tx_seq = 0
+        self._outbox = collections.deque()
+        self._inflight = None
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        if self.framed: self.reboot()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(1)
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _noise(self, data):
+        if not self.corrupt: return data
+        data = bytearray(data)
+        for i in range(len(data)):
+            if self._rng.random() < self.corrupt:
+                data[i] ^= 1 << self._rng.randrange(8)
+                self.stats["corrupted_bytes"] += 1
+        return bytes(data)
+
+    def _write_locked(self, data):
+        time.sleep(len(data) * self.byte_time)
+        os.write(self._master, self._noise(data))
+
+    def reboot(self):
+        # 전원이 다시 들어온 우노: 목록을 잃고 HELLO를 보낸다
+        with self._lock:
+            self._rx_seq = None
+            self.send_list.clear()
+            self._outbox.appendleft((T_HELLO, b""))
+
+    def arrive(self, bus):
+        # 도착 신호는 송신 목록에서 번호를 뺄 때 나간다
+        with self._lock:
+            if bus in self.send_list: self.send_list.remove(bus)
+            if self.framed: self._outbox.append((T_ARRIVED, bus.encode()))
+            else: self._write_locked(f"ARRIVED:{bus}\n".encode())
+
+    def wait_for(self, bus, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: bus in self.registered_at, timeout)
+
+    def _register_locked(self, bus):
+        # 목록에 있으면(이미 있던 번호 포함) True, 목록이 가득 차 넣지 못하면 False
+        if not bus or bus in self.send_list: return True
+        if self.capacity is not None and len(self.send_list) >= self.capacity:
+            self.rejected.append(bus)
+            return False
+        self.send_list.append(bus)
+        self.registered.append(bus)
+        self.registered_at.setdefault(bus, time.monotonic())
+        self._cond.notify_all()
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.01)
+            data = b""
+            if ready:
+                try: data = os.read(self._master, 4096)
+                except OSError: return
+                time.sleep(len(data) * self.byte_time + self._rng.uniform(*LOOP_DELAY))
+            with self._lock:
+                if data: self._receive_locked(self._noise(data))
+                if self.framed: self._service_outgoing_locked()
+
+    def _receive_locked(self, data):
+        if not self.framed:
+            self._line.extend(data)
+            *lines, rest = self._line.split(b"\n")
+            self._line = bytearray(rest)
+            for line in lines: self._register_locked(line.decode("utf-8", errors="replace").strip())
+            return
+        for seq, kind, payload in self._parser.feed(data):
+            if kind == T_ACK:
+                if self._inflight and self._inflight[0] == seq:
+                    self._inflight = None
+                    self._outbox.popleft()
+                continue
+            if kind not in (T_REGISTER, T_HELLO): continue
+            if kind == T_HELLO:
+                self._write_locked(encode_frame(seq, T_ACK))
+                self._rx_seq = seq
+                continue
+            if seq == self._rx_seq:
+                # ACK가 유실되어 다시 온 프레임: 처음과 같은 응답을 다시 보낸다
+                self.stats["duplicates"] += 1
+                self._write_locked(encode_frame(seq, T_ACK, self._last_reply))
+                continue
+            self._rx_seq = seq
+            # transmitter.ino처럼 목록에 넣은 뒤 ACK를 보내고, 거절된 번호를 ACK 내용에 싣는다
+            buses = payload.decode("utf-8", errors="replace").split(",")
+            self._last_reply = ",".join(bus for bus in buses if not self._register_locked(bus)).encode()
+            self._write_locked(encode_frame(seq, T_ACK, self._last_reply))
+        self.stats["bad_frames"] = self._parser.bad
+
+    def _service_outgoing_locked(self):
+        # transmitter.ino와 같은 정지-대기: 맨 앞 프레임 하나만 보내고 ACK가 없으면 ACK_TIMEOUT마다 재전송
+        now = time.monotonic()
+        if self._inflight:
+            seq, sent_at, tries = self._inflight
+            if now - sent_at < ACK_TIMEOUT: return
+            if tries > MAX_RETRIES:
+                self._inflight = None
+                self._outbox.popleft()
+                return
+            self.stats["retransmits"] += 1
+            kind, payload = self._outbox[0]
+            self._inflight = (seq, now, tries + 1)
+            self._write_locked(encode_frame(seq, kind, payload))
+            return
+        if not self._outbox: return
+        kind, payload = self._outbox[0]
+        seq, self._tx_seq = self._tx_seq, (self._tx_seq + 1) & 0xFF
+        self._inflight = (seq, now, 1)
+        self._write_locked(encode_frame(seq, kind, payload))
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+
+def _wait_quiet(count, expected, timeout, quiet=0.5):
+    # count()가 expected에 이르거나 quiet초 동안 변화가 없을 때까지
+    deadline = time.monotonic() + timeout
+    last, since = -1, time.monotonic()
+    while time.monotonic() < deadline:
+        n = count()
+        if n >= expected: return
+        if n != last: last, since = n, time.monotonic()
+        elif time.monotonic() - since > quiet: return
+        time.sleep(0.02)
+
+
+def run_burst(framed, corrupt, registrations=200, arrivals=100, seed=0):
+    # 등록 요청 registrations개를 한꺼번에 보내는 동안 아두이노가 도착 신호 arrivals개를 연달아 보낸다.
+    # 링크 손실만 재려고 송신 목록 칸 수 제한은 끈다
+    sim = ArduinoSimulator(corrupt=corrupt, framed=framed, seed=seed, capacity=None).start()
+    buses = [f"{n:04d}" for n in range(registrations)]
+    arrived_buses = [f"A{n:03d}" for n in range(arrivals)]
+    received, sent_at, deliveries = [], {}, []
+    lock = threading.Lock()
+
+    if framed:
+        link = SerialLink(open_port(sim.port_name)).start()
+        link.subscribe(lambda topic, bus: received.append(bus), topics=("arrived",))
+        send = lambda bus: deliveries.append(link.register(bus))
+    else:
+        port = open_port(sim.port_name)
+        def send(bus):
+            with lock: port.write(f"{bus}\n".encode())
+        def reader():
+            while not stop.is_set():
+                line = port.readline().decode("utf-8", errors="replace").strip()
+                if line.startswith("ARRIVED:"): received.append(line.split(":", 1)[1])
+        stop = threading.Event()
+        reader_thread = threading.Thread(target=reader, daemon=True)
+        reader_thread.start()
+
+    time.sleep(0.3)
+    start = time.monotonic()
+    threading.Thread(target=lambda: [sim.arrive(bus) for bus in arrived_buses], daemon=True).start()
+    for bus in buses:
+        sent_at[bus] = time.monotonic()
+        send(bus)
+    _wait_quiet(lambda: len(sim.registered_at) + len(received), registrations + arrivals, timeout=60,
+                quiet=3 * ACK_TIMEOUT * (MAX_RETRIES + 1) if framed else 0.5)
+    elapsed = time.monotonic() - start
+
+    delays = [sim.registered_at[bus] - sent_at[bus] for bus in buses if bus in sim.registered_at]
+    result = {
+        "registered_lost": sum(1 for bus in buses if bus not in sim.registered_at),
+        "arrived_lost": len(set(arrived_buses) - set(received)),
+        "duplicates_seen": len(received) - len(set(received)),
+        "p50": _percentile(delays, 0.5), "p99": _percentile(delays, 0.99), "elapsed": elapsed,
+    }
+    if framed:
+        rtts = [d.latency for d in deliveries if d.acked]
+        result.update(frames=link.stats["frames_sent"], retransmits=link.stats["retransmits"] + sim.stats["retransmits"],
+                      rtt_p50=_percentile(rtts, 0.5), rtt_p99=_percentile(rtts, 0.99))
+        link.close()
+    else:
+        stop.set()
+        reader_thread.join(1)
+        port.close()
+    sim.close()
+    return result
+
+
+def bench(registrations=200, arrivals=100, rates=(0.0, 0.0005, 0.005)):
+    print(f"등록 {registrations}건 + 도착 신호 {arrivals}건 동시 전송 (pty, {BAUD_RATE}bps 지연 모사)")
+    print("반영: 등록 요청 -> 아두이노 목록 반영, 왕복: 등록 요청 -> ACK 수신 (기존 방식은 확인 수단 없음)")
+    print(f"{'방식':<10}{'바이트 오류율':>12}{'등록 손실':>10}{'도착 손실':>10}{'반영 p50/p99(ms)':>18}{'왕복 p50/p99(ms)':>18}{'프레임':>8}{'재전송':>8}")
+    for rate in rates:
+        for framed in (False, True):
+            r = run_burst(framed, rate, registrations, arrivals)
+            name = "프레임+ACK" if framed else "기존(줄)"
+            rtt = f"{r['rtt_p50']:.0f}/{r['rtt_p99']:.0f}" if framed else "-"
+            delay = f"{r['p50']:.0f}/{r['p99']:.0f}"
+            print(f"{name:<10}{rate:>12.4f}{r['registered_lost']:>10}{r['arrived_lost']:>10}{delay:>18}"
+                  f"{rtt:>18}{r.get('frames', '-'):>8}{r.get('retransmits', '-'):>8}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    bench(*args)
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from arrival_snapshot import StationSnapshotCache, index_arrival_list
+
+# 여러 부스가 공공 API 대신 이 게이트웨이에 묻는다. 정류장별로 한 번만 받아 모든 노선/부스에 나눠 준다
+GATEWAY_PORT     = int(os.environ.get("BOOTH_GATEWAY_PORT", "8650"))
+SERVICE_KEY      = os.environ.get("GBIS_SERVICE_KEY", "")
+UPSTREAM_URL     = "http://apis.data.go.kr/6410000/busarrivalservice/v2/getBusArrivalListv2"
+UPSTREAM_TIMEOUT = 10
+SNAPSHOT_TTL       = 15
+SNAPSHOT_STALE_TTL = 60
+DAILY_QUOTA      = int(os.environ.get("GBIS_DAILY_QUOTA", "100000"))
+BUDGET_BURST     = 20
+BUDGET_WAIT      = 1.0    # 예산이 없을 때 토큰을 기다리는 최대 시간 (넘으면 오래된 값 또는 503)
+
+
+class RateLimited(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill_locked()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.try_acquire(): return True
+            with self._lock:
+                wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                with self._lock: self.denied += 1
+                return False
+            time.sleep(wait)
+
+
+def fetch_upstream(station_id, timeout=None, upstream_url=UPSTREAM_URL, service_key=SERVICE_KEY):
+    # serviceKey는 이미 URL 인코딩된 값이므로 그대로 붙인다
+    url = f"{upstream_url}?serviceKey={service_key}&stationId={urllib.parse.quote(station_id)}&format=json"
+    with urllib.request.urlopen(url, timeout=timeout or UPSTREAM_TIMEOUT) as response:
+        data = json.load(response)
+    msg_body = data["response"].get("msgBody") or {}
+    arrival_list = msg_body.get("busArrivalList") or []
+    if isinstance(arrival_list, dict): arrival_list = [arrival_list]
+    return {"busArrivalList": arrival_list, "index": index_arrival_list(arrival_list)}
+
+
+class ArrivalGateway:
+    def __init__(self, upstream=fetch_upstream, daily_quota=DAILY_QUOTA, burst=BUDGET_BURST,
+                 ttl=SNAPSHOT_TTL, stale_ttl=SNAPSHOT_STALE_TTL, budget_wait=BUDGET_WAIT):
+        self.upstream = upstream
+        self.budget = TokenBucket(daily_quota / 86400, burst)
+        self.budget_wait = budget_wait
+        # 같은 정류장 요청은 StationSnapshotCache가 정류장별 잠금으로 하나의 upstream 호출에 합친다
+        self.cache = StationSnapshotCache(self._load, ttl=ttl, stale_ttl=stale_ttl, snapshot_dir=None)
+        self.requests = 0
+        self.served = {"fresh": 0, "stale": 0, "expired": 0, "unavailable": 0}
+        self._lock = threading.Lock()
+
+    def _load(self, station_id, timeout=None):
+        if not self.budget.acquire(self.budget_wait):
+            raise RateLimited(f"upstream 호출 예산 초과 ({station_id})")
+        return time.time(), self.upstream(station_id, timeout)
+
+    def _count(self, kind):
+        with self._lock:
+            self.requests += 1
+            self.served[kind] += 1
+
+    def snapshot(self, station_id):
+        # (snapshot, 신선도 정보). 받을 수 없으면 snapshot은 None
+        try:
+            fetched_at, snapshot = self.cache.get(station_id)
+        except Exception as e:
+            entry = self.cache.peek(station_id)
+            if entry is None:
+                self._count("unavailable")
+                return None, {"error": str(e)}
+            fetched_at, snapshot = entry
+            kind = "expired"
+        else:
+            kind = "fresh" if time.time() - fetched_at < self.cache.ttl else "stale"
+        self._count(kind)
+        age = time.time() - fetched_at
+        return snapshot, {"stationId": station_id, "fetchedAt": fetched_at, "age": round(age, 3),
+                          "ttl": self.cache.ttl, "stale": kind != "fresh", "source": kind}
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "upstream_calls": self.cache.upstream_calls,
+                    "budget_denied": self.budget.denied, "budget_tokens": round(self.budget.tokens, 2),
+                    "served": dict(self.served)}
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+        gateway = self.server.gateway
+        if url.path == "/stats":
+            return self._reply(200, gateway.stats())
+        if url.path not in ("/arrivals", "/arrival") or "stationId" not in params:
+            return self._reply(404, {"error": "사용법: /arrivals?stationId= | /arrival?stationId=&routeId=[&staOrder=] | /stats"})
+        snapshot, meta = gateway.snapshot(params["stationId"])
+        if snapshot is None:
+            return self._reply(503, meta)
+        if url.path == "/arrivals":
+            return self._reply(200, dict(meta, busArrivalList=snapshot["busArrivalList"]))
+        route_id, sta_order = params.get("routeId", ""), params.get("staOrder")
+        index = snapshot["index"]
+        item = (index.get(f"{route_id}@{sta_order}") if sta_order else None) or index.get(route_id) or {}
+        self._reply(200, dict(meta, busArrivalItem=item))
+
+
+def start_gateway(gateway, port=GATEWAY_PORT, host="0.0.0.0"):
+    server = ThreadingHTTPServer((host, port), _GatewayHandler)
+    server.daemon_threads = True
+    server.gateway = gateway
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class FakeUpstream:
+    # 공공 API 흉내: 정류장마다 노선 몇 개, 응답 지연, 호출 수 기록
+    def __init__(self, latency=(0.1, 0.4), routes_per_station=6, seed=0):
+        self.latency = latency
+        self.routes_per_station = routes_per_station
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, station_id, timeout=None):
+        with self._lock:
+            self.calls += 1
+            delay = self._rng.uniform(*self.latency)
+            items = [{"routeId": f"2{station_id[-4:]}{n:03d}", "staOrder": n + 1,
+                      "predictTime1": self._rng.randint(1, 20), "locationNo1": self._rng.randint(1, 9)}
+                     for n in range(self.routes_per_station)]
+        time.sleep(delay)
+        return {"busArrivalList": items, "index": index_arrival_list(items)}
+
+
+def loadtest(booths=300, stations=40, seconds=30, interval=3.0, daily_quota=300000):
+    # 부스마다 정해진 정류장을 interval 간격(지터 포함)으로 조회. 부스 여러 개가 같은 정류장을 공유한다
+    upstream = FakeUpstream()
+    gateway = ArrivalGateway(upstream, daily_quota=daily_quota, burst=max(BUDGET_BURST, stations))
+    server = start_gateway(gateway, port=0, host="127.0.0.1")
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    latencies, failures = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def booth(n):
+        rng = random.Random(n)
+        station_id = f"22800{n % stations:04d}"
+        time.sleep(rng.uniform(0, interval))
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f"{base}/arrival?stationId={station_id}&routeId=2{station_id[-4:]}000", timeout=15) as r:
+                    r.read()
+                with lock: latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock: failures.append(str(e))
+            time.sleep(rng.uniform(0.5, 1.5) * interval)
+
+    threads = [threading.Thread(target=booth, args=(n,), daemon=True) for n in range(booths)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    server.shutdown()
+
+    stats = gateway.stats()
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    per_booth_cache = booths * -(-seconds // SNAPSHOT_TTL)   # 부스마다 15초 캐시만 둔 경우의 상한
+    print(f"부스 {booths}개 / 정류장 {stations}개 / {seconds}s: 부스 요청 {len(latencies) + len(failures)}건, 실패 {len(failures)}건")
+    print(f"upstream 호출: 게이트웨이 {upstream.calls}회 (직접 호출 시 {len(latencies) + len(failures)}회, "
+          f"부스별 캐시만 쓸 때 최대 {per_booth_cache}회) -> {(len(latencies) + len(failures)) / max(upstream.calls, 1):.1f}배 감소")
+    print(f"응답 지연: p50 {pct(0.5):.1f} ms, p99 {pct(0.99):.1f} ms, 최대 {pct(1.0):.1f} ms")
+    print(f"제공 구분: {stats['served']}, 예산 거부 {stats['budget_denied']}회")
+    return stats
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "serve":
+        if not SERVICE_KEY:
+            print("GBIS_SERVICE_KEY 환경 변수를 설정하세요.", file=sys.stderr)
+            sys.exit(2)
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else GATEWAY_PORT
+        server = start_gateway(ArrivalGateway(), port)
+        print(f"[Gateway] 도착 정보 게이트웨이 대기 중: {port}")
+        try:
+            while True: time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif len(sys.argv) >= 2 and sys.argv[1] == "loadtest":
+        args = [int(a) for a in sys.argv[2:5]]
+        loadtest(*args)
+    else:
+        print("사용법: arrival_gateway.py serve [포트] | loadtest [부스 수] [정류장 수] [초]", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "arrival_cache")
+
+
+def index_arrival_list(arrival_list):
+    # busArrivalList -> {routeId: item, "routeId@staOrder": item}
+    # 같은 노선이 정류장을 두 번 지나는 경우(순환 노선) 정류소 순번으로 구분할 수 있게 함께 저장
+    if isinstance(arrival_list, dict): arrival_list = [arrival_list]
+    routes = {}
+    for item in arrival_list or []:
+        route_id = str(item.get("routeId", ""))
+        if not route_id: continue
+        routes.setdefault(route_id, item)
+        if item.get("staOrder") is not None:
+            routes[f"{route_id}@{item['staOrder']}"] = item
+    return routes
+
+
+class StationSnapshotCache:
+    # 정류장 단위 도착 정보 스냅샷. ttl 안에서는 그대로, stale_ttl 안에서는 오래된 값을 돌려주며 백그라운드 갱신
+    # loader(station_id, timeout) -> (받은 시각, routes). 게이트웨이처럼 이미 캐시된 값을 받았다면 원래 받은 시각을 돌려준다
+    # snapshot_dir=None 이면 디스크에 남기지 않는다 (게이트웨이처럼 한 프로세스가 전부 처리할 때)
+    def __init__(self, loader, ttl=15, stale_ttl=60, snapshot_dir=SNAPSHOT_DIR):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.snapshot_dir = snapshot_dir
+        self.upstream_calls = 0
+        self._lock = threading.Lock()
+        self._snapshots = {}   # station_id -> (fetched_at, routes)
+        self._refreshing = set()
+        self._fetch_locks = {}
+        self._failures = {}    # station_id -> (실패 시각, 예외)
+
+    def _path(self, station_id):
+        return os.path.join(self.snapshot_dir, f"station_{station_id}.json")
+
+    def _read_disk(self, station_id):
+        if self.snapshot_dir is None: return None
+        try:
+            with open(self._path(station_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["fetched_at"], data["routes"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, station_id, fetched_at, routes):
+        if self.snapshot_dir is None: return
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.snapshot_dir)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": fetched_at, "routes": routes}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(station_id))
+        except OSError as e:
+            print(f"[Snapshot] 스냅샷 저장 실패: {e}", file=sys.stderr)
+
+    def _cached(self, station_id):
+        with self._lock:
+            entry = self._snapshots.get(station_id)
+        disk = self._read_disk(station_id)
+        # 다른 프로세스가 더 최근에 갱신했다면 그 값을 사용
+        if disk and (entry is None or disk[0] > entry[0]):
+            entry = disk
+            with self._lock: self._snapshots[station_id] = entry
+        return entry
+
+    def _fetch_lock(self, station_id):
+        with self._lock:
+            return self._fetch_locks.setdefault(station_id, threading.Lock())
+
+    def refresh(self, station_id, timeout=None):
+        requested_at = time.time()
+        with self._fetch_lock(station_id):
+            entry = self._snapshots.get(station_id)
+            # 같은 정류장을 동시에 요청한 경우 먼저 끝난 결과(실패 포함)를 함께 사용
+            if entry and time.time() - entry[0] < self.ttl: return entry
+            failure = self._failures.get(station_id)
+            if failure and failure[0] >= requested_at: raise failure[1]
+            try:
+                fetched_at, routes = self.loader(station_id, timeout)
+            except Exception as e:
+                self._failures[station_id] = (time.time(), e)
+                raise
+            self._failures.pop(station_id, None)
+            self.upstream_calls += 1
+            entry = (fetched_at, routes)
+            with self._lock: self._snapshots[station_id] = entry
+            self._write_disk(station_id, *entry)
+            return entry
+
+    def _refresh_in_background(self, station_id):
+        with self._lock:
+            if station_id in self._refreshing: return
+            self._refreshing.add(station_id)
+        def run():
+            try: self.refresh(station_id)
+            except Exception as e: print(f"[Snapshot] 백그라운드 갱신 실패: {e}", file=sys.stderr)
+            finally:
+                with self._lock: self._refreshing.discard(station_id)
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self, station_id, timeout=None):
+        entry = self._cached(station_id)
+        if entry:
+            age = time.time() - entry[0]
+            if age < self.ttl: return entry
+            if age < self.stale_ttl:
+                self._refresh_in_background(station_id)
+                return entry
+        return self.refresh(station_id, timeout)
+
+    def peek(self, station_id):
+        # 나이와 상관없이 마지막으로 받은 값 (갱신이 막혔을 때 오래된 값이라도 내보내기 위해)
+        with self._lock:
+            return self._snapshots.get(station_id)
@@ -0,0 +1,245 @@
+import os
+import sys
+import math
+import time
+import random
+import threading
+import collections
+
+import tracing
+
+# 등록된 노선을 백그라운드에서 조회해, 도착이 가까워질수록 자주 묻고 기준 시간을 지나면 먼저 안내한다
+ALERT_MINUTES  = sorted({int(m) for m in os.environ.get("BOOTH_ALERT_MINUTES", "2,1").split(",") if m.strip()}, reverse=True)
+SOON_MINUTES   = 1       # 이 이하면 "곧 도착"
+MIN_INTERVAL   = 15      # 정류장 스냅샷 캐시 ttl보다 자주 물어도 새 정보가 없다
+MAX_INTERVAL   = 300
+IDLE_INTERVAL  = 60      # 등록된 버스가 없을 때 (등록되면 wake()로 바로 깨운다)
+LEAD_FRACTION  = 0.5     # 다음 기준까지 남은 시간의 절반마다 다시 조회
+MAX_BACKOFF    = 600
+FORGET_AFTER   = 600     # 이만큼 보이지 않은 차량의 알림 기록은 지운다
+
+
+def alert_text(bus, minutes):
+    if minutes <= SOON_MINUTES: return f"{bus}번 버스가 곧 도착합니다."
+    return f"{bus}번 버스가 약 {minutes}분 후 도착합니다."
+
+
+def _minutes(value):
+    try: return int(value)
+    except (TypeError, ValueError): return None
+
+
+def vehicles(item):
+    # 첫째/둘째 차량: (순번, 차량 번호 또는 None, 예상 분, 남은 정류장)
+    result = []
+    for n in (1, 2):
+        minutes = _minutes(item.get(f"predictTime{n}"))
+        if minutes is None: continue
+        result.append((n, item.get(f"plateNo{n}") or None, minutes, _minutes(item.get(f"locationNo{n}"))))
+    return result
+
+
+class ArrivalWatcher:
+    # buses() -> 등록된 버스 목록, poll(buses) -> {버스: 도착 항목} (실패하면 예외), announce(text, urgent)
+    # fixed_interval을 주면 ETA와 상관없이 그 간격으로 조회 (비교용)
+    def __init__(self, buses, poll, announce, alert_minutes=ALERT_MINUTES, clock=time.monotonic, fixed_interval=None, seed=None, log=True):
+        self.buses = buses
+        self.poll = poll
+        self.announce = announce
+        self.alert_minutes = sorted(alert_minutes, reverse=True)
+        self.clock = clock
+        self.fixed_interval = fixed_interval
+        self.log = log
+        self.calls = 0
+        self.errors = 0
+        self.alerts = collections.deque(maxlen=200)   # (시각, 버스, 차량, 안내한 기준 분들, 예상 분)
+        self._rng = random.Random(seed)
+        self._alerted = {}    # (버스, 차량) -> 이미 안내한 기준 분
+        self._last_seen = {}  # (버스, 차량) -> (시각, 예상 분)
+        self._gaps, self._gaps_at = [], 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _vehicle_key(self, bus, n, plate, minutes, now):
+        # 차량 번호가 있으면 그것으로 구분. 없으면 순번으로 구분하되 예상 시간이 크게 늘면 앞 차가 지나간 것으로 본다
+        if plate: return (bus, plate)
+        key = (bus, f"#{n}")
+        seen = self._last_seen.get(key)
+        if seen and minutes > seen[1] + 2: self._alerted.pop(key, None)
+        return key
+
+    def _check(self, bus, n, plate, minutes, now):
+        key = self._vehicle_key(bus, n, plate, minutes, now)
+        first_sight = key not in self._last_seen
+        self._last_seen[key] = (now, minutes)
+        alerted = self._alerted.setdefault(key, set())
+        crossed = [m for m in self.alert_minutes if minutes <= m and m not in alerted]
+        if crossed and first_sight:
+            # 처음 본 차량(방금 등록한 버스 등)이 이미 기준 안이면 등록 때의 도착 정보 안내가 그 시간을 말했으므로
+            # 끼어들어 다시 알리지 않고 지난 기준으로만 적어 둔다
+            alerted.update(crossed)
+        elif crossed:
+            # 여러 기준을 한꺼번에 지났으면 가장 가까운 기준 하나만 안내
+            alerted.update(crossed)
+            self.alerts.append((now, bus, key[1], crossed, minutes))
+            self.announce(alert_text(bus, minutes), min(crossed) <= SOON_MINUTES)
+        pending = [m for m in self.alert_minutes if m not in alerted]
+        return minutes - max(pending) if pending else None
+
+    def next_interval(self, gaps):
+        # gaps: 아직 안내하지 않은 기준까지 남은 분 (차량별). 가장 가까운 것의 LEAD_FRACTION 만큼 뒤에 다시 조회
+        if self.fixed_interval: return self.fixed_interval
+        if not gaps: return MAX_INTERVAL
+        return min(MAX_INTERVAL, max(MIN_INTERVAL, min(gaps) * 60 * LEAD_FRACTION))
+
+    def step(self):
+        # 한 번 조회하고 필요한 알림을 낸 뒤, 다음 조회까지 기다릴 초를 돌려준다
+        now = self.clock()
+        buses = self.buses()
+        if not buses:
+            self._alerted.clear(); self._last_seen.clear()
+            return self.fixed_interval or IDLE_INTERVAL
+        try:
+            with tracing.span("watch.poll"):
+                items = self.poll(buses)
+            self.calls += 1
+        except Exception as e:
+            self.calls += 1
+            self.errors += 1
+            delay = self.fixed_interval or self._error_delay(now)
+            if self.log: print(f"[Watch] 도착 정보 조회 실패 ({self.errors}회 연속), {delay:.0f}초 후 재시도: {e}", file=sys.stderr)
+            return delay
+        self.errors = 0
+        gaps = []
+        for bus, item in items.items():
+            for n, plate, minutes, _ in vehicles(item or {}):
+                gap = self._check(bus, n, plate, minutes, now)
+                if gap is not None: gaps.append(gap)
+        for key in [k for k, (seen_at, _) in self._last_seen.items() if now - seen_at > FORGET_AFTER]:
+            self._last_seen.pop(key, None)
+            self._alerted.pop(key, None)
+        self._gaps, self._gaps_at = gaps, now
+        return self.next_interval(gaps)
+
+    def _error_delay(self, now):
+        delay = min(MAX_BACKOFF, MIN_INTERVAL * 2 ** self.errors)
+        if self._gaps:
+            # 마지막으로 받은 예상 시간에서 흐른 시간을 빼 보고, 곧 기준을 지날 차량이 있으면 그보다 오래 미루지 않는다
+            elapsed = (now - self._gaps_at) / 60
+            delay = min(delay, self.next_interval([max(0, gap - elapsed) for gap in self._gaps]))
+        return delay * self._rng.uniform(0.8, 1.2)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def wake(self):
+        # 버스가 새로 등록되었을 때 다음 조회를 기다리지 않고 바로 묻는다
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread: self._thread.join(2)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                delay = self.step()
+            except Exception as e:
+                print(f"[Watch] 감시 중 오류: {e}", file=sys.stderr)
+                delay = IDLE_INTERVAL
+            self._wake.wait(delay)
+            self._wake.clear()
+
+
+class FakeArrivalTimeline:
+    # 가상 시계 위의 GBIS 흉내: 노선마다 차량이 배차 간격으로 도착하고, 예상 시간은 멀수록 오차가 크며
+    # update_period마다만 바뀐다. error_rate로 가끔, outage 구간에는 항상 실패한다
+    def __init__(self, routes, seconds, headway=(480, 1200), update_period=20, error_rate=0.02,
+                 outage=(1800, 2100), seed=0):
+        rng = random.Random(seed)
+        self.update_period = update_period
+        self.error_rate = error_rate
+        self.outage = outage
+        self.calls = 0
+        self.vehicles = {}
+        for r, bus in enumerate(routes):
+            t, n, schedule = rng.uniform(0, headway[1]), 0, []
+            while t < seconds + 2 * headway[1]:
+                schedule.append((t, f"경기70사{r:02d}{n:02d}", rng.gauss(0, 0.15)))
+                t += rng.uniform(*headway)
+                n += 1
+            self.vehicles[bus] = schedule
+        self._rng = random.Random(seed + 1)
+
+    def _item(self, bus, now):
+        slot_time = now - now % self.update_period
+        item = {}
+        upcoming = [v for v in self.vehicles[bus] if v[0] > slot_time][:2]
+        for n, (arrival, plate, bias) in enumerate(upcoming, 1):
+            remaining = arrival - slot_time
+            # 예측 오차: 차량마다 정해진 치우침(남은 시간 비례) + 갱신마다 흔들림
+            noise = random.Random(f"{plate}:{int(slot_time)}").gauss(0, 15 + 0.05 * remaining)
+            item[f"predictTime{n}"] = max(1, round((remaining * (1 + bias) + noise) / 60))
+            item[f"locationNo{n}"] = max(1, round(remaining / 90))
+            item[f"plateNo{n}"] = plate
+        return item
+
+    def query(self, buses, now):
+        self.calls += 1
+        if self.outage and self.outage[0] <= now < self.outage[1]: raise ConnectionError("API 응답 없음 (장애 구간)")
+        if self._rng.random() < self.error_rate: raise ConnectionError("API 응답 없음")
+        return {bus: self._item(bus, now) for bus in buses}
+
+
+def simulate_one(routes, seconds, fixed_interval=None, seed=0):
+    # 가상 시계로 seconds 동안 감시. (호출 수, 기준별 늦음 목록, 놓친 수, 알림 수)
+    timeline = FakeArrivalTimeline(routes, seconds, seed=seed)
+    now = [0.0]
+    watcher = ArrivalWatcher(lambda: list(routes), lambda buses: timeline.query(buses, now[0]),
+                             lambda text, urgent: None, clock=lambda: now[0], fixed_interval=fixed_interval, seed=seed, log=False)
+    while now[0] < seconds:
+        now[0] += watcher.step()
+
+    fired = {}
+    for at, bus, vehicle, crossed, _ in watcher.alerts:
+        for m in crossed: fired.setdefault((bus, vehicle, m), at)
+    lateness, missed = {m: [] for m in watcher.alert_minutes}, 0
+    for bus, schedule in timeline.vehicles.items():
+        for arrival, plate, _ in schedule:
+            if arrival < 600 or arrival > seconds: continue   # 시작 직후/끝난 뒤 도착은 제외
+            for m in watcher.alert_minutes:
+                at = fired.get((bus, plate, m))
+                if at is None or at > arrival: missed += 1
+                else: lateness[m].append(at - (arrival - 60 * m))
+    return timeline.calls, lateness, missed, len(watcher.alerts)
+
+
+def simulate(hours=3, seeds=5):
+    seconds = hours * 3600
+    print(f"가상 {hours}시간 x 시드 {seeds}개, 기준 {ALERT_MINUTES}분, 장애 구간 5분 + 호출 실패 2%")
+    print("늦음: 실제로 기준 시간(도착 m분 전)이 된 시각부터 안내까지 (음수는 예측 오차로 먼저 안내)")
+    print(f"{'노선':>4}  {'방식':<10}{'시간당 호출':>10}" + "".join(f"{f'{m}분 늦음 p50/p90(s)':>22}" for m in ALERT_MINUTES) + f"{'놓침':>6}")
+    for routes in (["5100"], ["5100", "7000", "1112", "M5107"]):
+        for name, fixed in (("고정 30초", 30), ("고정 60초", 60), ("ETA 적응", None)):
+            calls, lateness, missed = 0, {m: [] for m in ALERT_MINUTES}, 0
+            for seed in range(seeds):
+                c, late, miss, _ = simulate_one(routes, seconds, fixed, seed)
+                calls += c
+                missed += miss
+                for m in late: lateness[m] += late[m]
+            pct = lambda values, q: sorted(values)[min(len(values) - 1, int(q * len(values)))] if values else math.nan
+            cols = "".join(f"{f'{pct(lateness[m], 0.5):.0f}/{pct(lateness[m], 0.9):.0f}':>22}" for m in ALERT_MINUTES)
+            print(f"{len(routes):>4}  {name:<10}{calls / seeds / hours:>10.0f}{cols}{missed:>6}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "simulate":
+        simulate(*[int(a) for a in sys.argv[2:4]])
+    else:
+        print("사용법: arrival_watch.py simulate [시간] [시드 수]", file=sys.stderr)
+        sys.exit(2)
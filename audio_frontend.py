@@ -0,0 +1,173 @@
+import sys
+import time
+import wave
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+INPUT_RATE    = 48000
+TARGET_RATE   = 16000
+FILTER_TAPS   = 96
+FRAME_MS      = 20
+MIN_RMS       = 300.0     # int16 기준 최소 음성 에너지
+NOISE_FACTOR  = 3.0
+SPEECH_ZCR    = 0.25      # 에너지는 약해도 영교차율이 높으면 마찰음(ㅅ, ㅊ 등)으로 본다
+LEAD_PAD_MS   = 150
+TAIL_PAD_MS   = 200
+MIN_SPEECH_MS = 60
+END_SILENCE_MS = 700
+TARGET_PEAK   = 0.7 * 32767
+MAX_GAIN      = 10.0
+
+
+def design_lowpass(input_rate=INPUT_RATE, target_rate=TARGET_RATE, taps=FILTER_TAPS):
+    # 목표 나이퀴스트의 90%를 차단 주파수로 하는 Kaiser 창 sinc FIR
+    cutoff = 0.9 * (target_rate / 2) / input_rate
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(taps, 8.0)
+    return (h / h.sum()).astype(np.float32)
+
+
+class Decimator:
+    # 이전 호출의 꼬리 샘플을 기억하므로 전체 버퍼와 스트리밍 청크 모두 같은 결과를 낸다
+    def __init__(self, input_rate=INPUT_RATE, target_rate=TARGET_RATE, taps=FILTER_TAPS):
+        if input_rate % target_rate:
+            raise ValueError(f"정수 배 다운샘플링만 지원합니다: {input_rate} -> {target_rate}")
+        self.factor = input_rate // target_rate
+        self.kernel = design_lowpass(input_rate, target_rate, taps)[::-1].copy()
+        self._buf = np.zeros(taps - 1, dtype=np.float32)
+
+    def process(self, samples):
+        buf = np.concatenate((self._buf, samples.astype(np.float32, copy=False)))
+        taps = len(self.kernel)
+        if len(buf) < taps:
+            self._buf = buf
+            return np.zeros(0, dtype=np.float32)
+        windows = sliding_window_view(buf, taps)[::self.factor]
+        out = windows @ self.kernel
+        self._buf = buf[len(out) * self.factor:]
+        return out
+
+
+def frame_features(samples, frame_len):
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_len - 1)
+    return rms, zcr
+
+
+def speech_mask(rms, zcr, noise_floor):
+    threshold = max(MIN_RMS, noise_floor * NOISE_FACTOR)
+    return (rms >= threshold) | ((rms >= threshold * 0.5) & (zcr >= SPEECH_ZCR))
+
+
+def to_int16_bytes(samples):
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16).tobytes()
+
+
+def preprocess(audio_bytes, input_rate=INPUT_RATE, target_rate=TARGET_RATE, normalize=True):
+    # 전체 버퍼: 다운샘플링 -> 앞뒤 무음 제거 -> (선택) 음량 정규화. 음성이 없으면 b'' 반환
+    samples = np.frombuffer(audio_bytes, dtype=np.int16)
+    out = Decimator(input_rate, target_rate).process(samples)
+    frame_len = target_rate * FRAME_MS // 1000
+    rms, zcr = frame_features(out, frame_len)
+    if not len(rms): return b""
+    mask = speech_mask(rms, zcr, np.percentile(rms, 10))
+    speech_frames = np.flatnonzero(mask)
+    if len(speech_frames) * FRAME_MS < MIN_SPEECH_MS: return b""
+    start = max(0, speech_frames[0] - LEAD_PAD_MS // FRAME_MS) * frame_len
+    end = min(len(rms), speech_frames[-1] + 1 + TAIL_PAD_MS // FRAME_MS) * frame_len
+    out = out[start:end]
+    if normalize:
+        peak = np.max(np.abs(out))
+        if peak > 0: out = out * min(MAX_GAIN, TARGET_PEAK / peak)
+    return to_int16_bytes(out)
+
+
+class StreamingFrontend:
+    # 청크 단위 처리. 발화 시작 전 무음은 버리고(LEAD_PAD 만큼은 남김), 발화 뒤 END_SILENCE_MS 이상 조용하면 ended
+    def __init__(self, input_rate=INPUT_RATE, target_rate=TARGET_RATE, normalize=True,
+                 end_silence_ms=END_SILENCE_MS):
+        self.decimator = Decimator(input_rate, target_rate)
+        self.frame_len = target_rate * FRAME_MS // 1000
+        self.normalize = normalize
+        self.end_silence_frames = end_silence_ms // FRAME_MS
+        self.in_speech = False
+        self.ended = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=LEAD_PAD_MS // FRAME_MS)
+        self._noise_floor = None
+        self._silent_frames = 0
+        self._peak = 0.0
+
+    def process(self, chunk):
+        self.bytes_in += len(chunk)
+        if self.ended: return b""
+        out = np.concatenate((self._pending, self.decimator.process(np.frombuffer(chunk, dtype=np.int16))))
+        n_frames = len(out) // self.frame_len
+        self._pending = out[n_frames * self.frame_len:]
+        if not n_frames: return b""
+        frames = out[:n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        rms, zcr = frame_features(frames.ravel(), self.frame_len)
+        noise_floor = self._noise_floor if self._noise_floor is not None else float(np.min(rms))
+
+        emitted = []
+        for frame, level, is_speech in zip(frames, rms, speech_mask(rms, zcr, noise_floor)):
+            if not is_speech:
+                self._noise_floor = level if self._noise_floor is None else 0.95 * self._noise_floor + 0.05 * level
+            if not self.in_speech:
+                if not is_speech:
+                    self._preroll.append(frame)
+                    continue
+                self.in_speech = True
+                emitted.extend(self._preroll)
+                self._preroll.clear()
+            emitted.append(frame)
+            self._silent_frames = 0 if is_speech else self._silent_frames + 1
+            if self._silent_frames >= self.end_silence_frames:
+                self.ended = True
+                break
+        if not emitted: return b""
+        data = np.concatenate(emitted)
+        if self.normalize:
+            self._peak = max(self._peak, float(np.max(np.abs(data))))
+            if self._peak > 0: data = data * min(MAX_GAIN, TARGET_PEAK / self._peak)
+        result = to_int16_bytes(data)
+        self.bytes_out += len(result)
+        return result
+
+
+def _read_wav(path):
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1:
+            raise ValueError(f"16비트 모노 WAV만 지원합니다: {path}")
+        return f.readframes(f.getnframes()), f.getframerate()
+
+
+def _synthetic_fixture(rate=INPUT_RATE, seconds=3.0, speech=(1.0, 1.8)):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(rate * seconds)) / rate
+    audio = rng.normal(0, 60, len(t))
+    voiced = (t >= speech[0]) & (t < speech[1])
+    audio[voiced] += 6000 * np.sin(2 * np.pi * 180 * t[voiced]) * np.sin(2 * np.pi * 3 * t[voiced]) ** 2
+    return audio.astype(np.int16).tobytes(), rate
+
+
+def bench(paths=(), rounds=20):
+    fixtures = [(p, *_read_wav(p)) for p in paths] or [("synthetic 3s", *_synthetic_fixture())]
+    for name, audio, rate in fixtures:
+        seconds = len(audio) / 2 / rate
+        start = time.perf_counter()
+        for _ in range(rounds): out = preprocess(audio, input_rate=rate)
+        per_call = (time.perf_counter() - start) / rounds
+        print(f"{name}: {len(audio)} B -> {len(out)} B ({len(out) / len(audio) * 100:.1f}%), "
+              f"오디오 1초당 처리 {per_call / seconds * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    bench(sys.argv[1:])
@@ -0,0 +1,394 @@
+import os
+import sys
+import time
+import wave
+import fcntl
+import heapq
+import itertools
+import threading
+import subprocess
+
+import tracing
+
+PRIORITY_URGENT = 0   # 도착 신호 등 즉시 알려야 하는 안내
+PRIORITY_KEY    = 1   # 키 입력 에코
+PRIORITY_INFO   = 2   # 도착 정보 등 긴 안내
+SND_DEV_DIR     = "/dev/snd"
+PCM_RATE        = 24000   # gTTS mp3와 phrase_synth 조각 WAV가 모두 24kHz 모노
+PCM_BLOCK_FRAMES = 480    # WAV는 20ms씩 써서 취소를 바로 반영
+PIPE_BYTES      = 4096    # 장치 앞 파이프에 쌓이는 소리를 ~85ms로 제한 (끼어들기 지연)
+F_SETPIPE_SZ    = 1031
+RESERVE_HOLD    = 15      # 합성 중인 예약이 뒤 순서 안내를 붙잡아 두는 최대 시간 (gTTS가 멈춰도 큐 전체가 막히지 않게)
+
+
+class PlaybackHandle:
+    def __init__(self, clip_path, priority, interruptible=True):
+        self.clip_path = clip_path
+        self.priority = priority
+        self.interruptible = interruptible
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = False
+        self.error = None
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+        self._player = None
+        self._seq = None
+        self._start_lock = threading.Lock()
+        self._start_callbacks = []
+
+    def wait(self, timeout=None):
+        return self._done_event.wait(timeout)
+
+    def on_start(self, callback):
+        # 재생이 시작되면 callback(handle) 호출. 이미 시작했다면 바로 호출
+        with self._start_lock:
+            if self.started_at is None:
+                self._start_callbacks.append(callback)
+                return
+        callback(self)
+
+    def _start(self):
+        with self._start_lock:
+            self.started_at = time.monotonic()
+            callbacks, self._start_callbacks = self._start_callbacks, []
+        for callback in callbacks: callback(self)
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self._player: self._player._on_cancel(self)
+
+    @property
+    def done(self):
+        return self._done_event.is_set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def start_latency(self):
+        if self.started_at is None: return None
+        return self.started_at - self.enqueued_at
+
+    def _finish(self, cancelled=False, error=None):
+        self.cancelled = cancelled
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._done_event.set()
+
+
+class Mpg123Sink:
+    # 장치는 상주 aplay(raw PCM) 하나만 연다. mp3는 상주 mpg123 -R이 LOAD/STOP 명령으로 디코딩해 같은 파이프에 넣고,
+    # 조각을 이어 붙인 WAV는 그 파이프에 직접 쓴다 (재생마다 프로세스를 띄우지 않고, 장치를 두 번 열지 않는다)
+    def __init__(self, resolve_device):
+        self._resolve_device = resolve_device
+        self._proc = None
+        self._aplay = None
+        self._pcm = None
+        self._snd_signature = None
+        self._cond = threading.Condition()
+        self._playing = False
+        self._error = None
+        self.device = None
+
+    def _current_snd_signature(self):
+        try: return os.stat(SND_DEV_DIR).st_mtime
+        except OSError: return None
+
+    def _ensure_open(self):
+        signature = self._current_snd_signature()
+        if (self._proc and self._proc.poll() is None and self._aplay and self._aplay.poll() is None
+                and signature == self._snd_signature):
+            return
+        if self._proc or self._aplay: print("[Player] 오디오 장치 변경 또는 오류 감지, 장치를 다시 찾습니다.")
+        self.close()
+        with tracing.span("audio.mpg123_spawn"):
+            self._snd_signature = signature
+            self.device = self._resolve_device()
+            read_fd, write_fd = os.pipe()
+            try: fcntl.fcntl(write_fd, F_SETPIPE_SZ, PIPE_BYTES)
+            except OSError: pass
+            cmd = ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(PCM_RATE)]
+            if self.device: cmd.extend(["-D", self.device.replace("hw:", "plughw:", 1)])
+            try:
+                self._aplay = subprocess.Popen(cmd, stdin=read_fd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            finally:
+                os.close(read_fd)
+            self._pcm = os.fdopen(write_fd, "wb", buffering=0)
+            # -s: 디코딩한 PCM을 stdout(파이프)으로, 상태 응답(@P/@E)은 stderr로
+            self._proc = subprocess.Popen(["mpg123", "-R", "--remote-err", "-s", "-m", "-e", "s16", "-r", str(PCM_RATE)],
+                                          stdin=subprocess.PIPE, stdout=self._pcm, stderr=subprocess.PIPE,
+                                          text=True, bufsize=1)
+        threading.Thread(target=self._read_status, args=(self._proc,), daemon=True).start()
+
+    def _read_status(self, proc):
+        for line in proc.stderr:
+            line = line.strip()
+            with self._cond:
+                if line.startswith("@P 0"):
+                    self._playing = False
+                    self._cond.notify_all()
+                elif line.startswith("@E"):
+                    self._error = line[3:].strip()
+                    self._playing = False
+                    self._cond.notify_all()
+        with self._cond:
+            if self._playing: self._error = self._error or "mpg123 프로세스 종료"
+            self._playing = False
+            self._cond.notify_all()
+
+    def _send(self, command):
+        self._proc.stdin.write(command + "\n")
+        self._proc.stdin.flush()
+
+    def _play_once(self, clip_path, cancel_event):
+        self._ensure_open()
+        with self._cond:
+            self._playing, self._error = True, None
+        self._send(f"LOAD {clip_path}")
+        with self._cond:
+            while self._playing:
+                if cancel_event.is_set():
+                    self._send("STOP")
+                    self._cond.wait_for(lambda: not self._playing, timeout=0.5)
+                    self._playing = False
+                    return False, None
+                self._cond.wait(0.05)
+            return True, self._error
+
+    def _play_wav_once(self, clip_path, cancel_event):
+        # 조각을 이어 붙인 WAV 안내: 상주 aplay 파이프에 PCM을 블록 단위로 직접 쓴다
+        with wave.open(clip_path, "rb") as src:
+            if (src.getnchannels(), src.getsampwidth(), src.getframerate()) != (1, 2, PCM_RATE):
+                raise RuntimeError(f"{clip_path}: {PCM_RATE}Hz 16비트 모노 WAV가 아닙니다.")
+            self._ensure_open()
+            while True:
+                if cancel_event.is_set(): return False, None
+                frames = src.readframes(PCM_BLOCK_FRAMES)
+                if not frames: return True, None
+                self._pcm.write(frames)
+
+    def play(self, clip_path, cancel_event):
+        play_once = self._play_wav_once if clip_path.lower().endswith(".wav") else self._play_once
+        try:
+            completed, error = play_once(clip_path, cancel_event)
+        except (OSError, ValueError) as e:
+            completed, error = True, str(e)
+        if error and not cancel_event.is_set():
+            # 장치가 빠졌거나 프로세스가 죽은 경우 한 번만 다시 열어 재시도
+            print(f"[Player] 재생 오류, 장치 재탐색 후 재시도: {error}", file=sys.stderr)
+            self.close()
+            completed, error = play_once(clip_path, cancel_event)
+        if error: raise RuntimeError(error)
+        return completed
+
+    def interrupt(self):
+        with self._cond: self._cond.notify_all()
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        pcm, self._pcm = self._pcm, None
+        aplay, self._aplay = self._aplay, None
+        if proc:
+            try:
+                if proc.poll() is None:
+                    proc.stdin.write("QUIT\n"); proc.stdin.flush()
+                    proc.wait(timeout=1)
+            except Exception:
+                proc.kill()
+        if pcm:
+            try: pcm.close()
+            except OSError: pass
+        if aplay:
+            aplay.terminate()
+            try: aplay.wait(timeout=1)
+            except subprocess.TimeoutExpired: aplay.kill()
+
+
+class NullSink:
+    # 사운드카드 없이 큐/지연 시간을 확인하기 위한 싱크. clip_duration은 초 또는 callable
+    def __init__(self, clip_duration=0.0):
+        self.clip_duration = clip_duration
+        self.played = []
+        self._wake = threading.Event()
+
+    def play(self, clip_path, cancel_event):
+        duration = self.clip_duration(clip_path) if callable(self.clip_duration) else self.clip_duration
+        start = time.monotonic()
+        deadline = start + duration
+        while not cancel_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            self._wake.wait(remaining); self._wake.clear()
+        completed = not cancel_event.is_set()
+        self.played.append((clip_path, start, time.monotonic(), completed))
+        return completed
+
+    def interrupt(self):
+        self._wake.set()
+
+    def close(self):
+        pass
+
+
+class WavFileSink:
+    # 재생 대신 WAV 클립의 PCM을 하나의 WAV 파일로 이어 붙인다 (끼어들기 시 잘린 지점까지만 기록)
+    def __init__(self, output_path, realtime=False, block_frames=1024):
+        self.output_path = output_path
+        self.realtime = realtime
+        self.block_frames = block_frames
+        self.played = []
+        self._out = None
+
+    def play(self, clip_path, cancel_event):
+        start = time.monotonic()
+        written = 0
+        completed = True
+        if not clip_path.lower().endswith(".wav"):
+            print(f"[Player] WAV 싱크는 WAV 클립만 기록합니다: {clip_path}", file=sys.stderr)
+        else:
+            with wave.open(clip_path, "rb") as src:
+                if self._out is None:
+                    self._out = wave.open(self.output_path, "wb")
+                    self._out.setnchannels(src.getnchannels())
+                    self._out.setsampwidth(src.getsampwidth())
+                    self._out.setframerate(src.getframerate())
+                rate = src.getframerate()
+                while True:
+                    if cancel_event.is_set():
+                        completed = False; break
+                    frames = src.readframes(self.block_frames)
+                    if not frames: break
+                    self._out.writeframes(frames)
+                    written += len(frames) // (src.getsampwidth() * src.getnchannels())
+                    if self.realtime: time.sleep(self.block_frames / rate)
+        self.played.append((clip_path, start, time.monotonic(), completed, written))
+        return completed
+
+    def interrupt(self):
+        pass
+
+    def close(self):
+        if self._out:
+            self._out.close()
+            self._out = None
+
+
+class AudioPlayer:
+    def __init__(self, sink):
+        self.sink = sink
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._current = None
+        self._closed = False
+        self._reserved = {}   # 합성 중인 예약 핸들 -> 붙잡아 두는 기한
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _new_handle(self, clip_path, priority, interruptible):
+        handle = PlaybackHandle(clip_path, priority, interruptible)
+        handle._player = self
+        handle._seq = next(self._seq)
+        return handle
+
+    def play(self, clip_path, priority=PRIORITY_INFO, interruptible=True):
+        return self._enqueue(self._new_handle(clip_path, priority, interruptible))
+
+    def reserve(self, priority=PRIORITY_INFO, interruptible=True):
+        # 클립이 아직 없는 재생 요청: 순서는 지금 정해 두고, 합성이 끝나면 submit()으로 큐에 넣는다.
+        # 그동안 같거나 덜 급한 뒤 순서 안내는 재생하지 않고 기다린다 (RESERVE_HOLD까지)
+        handle = self._new_handle(None, priority, interruptible)
+        with self._cond:
+            if self._closed: handle._finish(cancelled=True)
+            else: self._reserved[handle] = time.monotonic() + RESERVE_HOLD
+        return handle
+
+    def submit(self, handle, clip_path, error=None):
+        with self._cond:
+            self._reserved.pop(handle, None)
+            self._cond.notify_all()
+        if handle.done: return handle
+        if error is not None:
+            handle._finish(error=error)
+        elif handle.cancel_requested:
+            # 취소된 예약은 큐에 넣지 않는다 (급한 예약이라도 재생 중인 안내를 끊지 않게)
+            handle._finish(cancelled=True)
+        else:
+            handle.clip_path = clip_path
+            handle.enqueued_at = time.monotonic()
+            self._enqueue(handle)
+        return handle
+
+    def _enqueue(self, handle):
+        priority = handle.priority
+        with self._cond:
+            if self._closed:
+                handle._finish(cancelled=True)
+                return handle
+            heapq.heappush(self._queue, (priority, handle._seq, handle))
+            current = self._current
+            if current and current.interruptible and priority < current.priority:
+                # 더 급한 안내가 들어오면 재생 중인 긴 안내를 끊는다 (barge-in)
+                current._cancel_event.set()
+                self.sink.interrupt()
+            self._cond.notify_all()
+        return handle
+
+    def idle(self):
+        with self._cond:
+            return not self._queue and self._current is None and not self._reserved
+
+    def _on_cancel(self, handle):
+        with self._cond:
+            if self._reserved.pop(handle, None) is not None: handle._finish(cancelled=True)
+            if handle is self._current: self.sink.interrupt()
+            self._cond.notify_all()
+
+    def _held_until_locked(self):
+        # 큐 맨 앞 항목보다 앞 순서인 예약이 아직 합성 중이면 그 기한, 아니면 None
+        priority, seq, _ = self._queue[0]
+        now = time.monotonic()
+        holds = [until for handle, until in self._reserved.items()
+                 if (handle.priority, handle._seq) < (priority, seq) and until > now]
+        return min(holds) if holds else None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._queue: return
+                    if not self._queue:
+                        self._cond.wait()
+                        continue
+                    held_until = self._held_until_locked()
+                    if held_until is None: break
+                    self._cond.wait(held_until - time.monotonic())
+                _, _, handle = heapq.heappop(self._queue)
+                if handle._cancel_event.is_set():
+                    handle._finish(cancelled=True)
+                    continue
+                self._current = handle
+            handle._start()
+            tracing.record("audio.queue_wait", handle.start_latency)
+            try:
+                with tracing.span("audio.play"):
+                    completed = self.sink.play(handle.clip_path, handle._cancel_event)
+                handle._finish(cancelled=not completed)
+            except Exception as e:
+                print(f"[Player] 재생 실패: {e}", file=sys.stderr)
+                handle._finish(error=e)
+            with self._cond:
+                self._current = None
+
+    def close(self, timeout=2):
+        with self._cond:
+            self._closed = True
+            for _, _, handle in self._queue: handle._cancel_event.set()
+            for handle in self._reserved: handle._finish(cancelled=True)
+            self._reserved.clear()
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self.sink.close()
@@ -0,0 +1,517 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import tempfile
+import threading
+
+import tracing
+
+# 스크립트 세션: 키 입력, 음성 입력(인식기가 돌려줄 문장들), 아두이노 도착 신호를 순서대로 재생한다
+SESSIONS = {
+    "keypad": [
+        ("key", "5"), ("key", "1"), ("key", "0"), ("key", "0"), ("key", "C"),
+        ("settle", None),
+        ("key", "#"), ("key", "5"), ("key", "1"), ("key", "0"), ("key", "7"), ("key", "C"),
+        ("settle", None),
+        ("key", "B"), ("settle", None),
+        ("arrived", "5100"), ("settle", None),
+        ("arrived", "M5107"), ("settle", None),
+    ],
+    "voice": [
+        ("voice", ["오천백번", "네"]), ("wait_serial", "5100"), ("settle", None),
+        ("arrived", "5100"), ("settle", None),
+    ],
+    "typo": [
+        ("key", "9"), ("key", "9"), ("key", "A"), ("key", "7"), ("key", "C"), ("settle", None),
+        ("key", "*"), ("key", "7"), ("key", "0"), ("key", "0"), ("key", "0"), ("key", "C"), ("settle", None),
+        ("arrived", "7000"), ("settle", None),
+    ],
+}
+
+KEY_HOLD, KEY_GAP       = 0.06, 0.12
+HTTP_LATENCY            = (0.08, 0.35)     # 가짜 GBIS 응답 지연 범위 (초)
+TTS_LATENCY_PER_CHAR    = 0.004            # 가짜 gTTS 합성 지연
+TTS_LATENCY_BASE        = 0.12
+PLAYBACK_SECONDS_PER_CH = 0.01             # 가짜 스피커 재생 시간
+WAV_TIME_SCALE          = PLAYBACK_SECONDS_PER_CH / 0.08   # 톤 WAV(글자당 0.08s)도 같은 속도로 재생
+SETTLE_TIMEOUT          = 30
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeGBISSession:
+    # 경기도 버스 도착 API 흉내. 지연은 시드 고정 난수
+    def __init__(self, route_ids, rng):
+        self.route_ids = route_ids
+        self.rng = rng
+        self.calls = 0
+        self.list_available = True
+        self.route_delays = {}     # routeId -> 고정 지연 (마감 시간 확인용)
+        self.failing_routes = set()
+        self._lock = threading.Lock()
+
+    def _item(self, route_id):
+        with self._lock:
+            return {"routeId": route_id, "staOrder": 56, "predictTime1": self.rng.randint(1, 15),
+                    "locationNo1": self.rng.randint(1, 9)}
+
+    def get(self, url, timeout=None):
+        route_id = url.split("routeId=")[1].split("&")[0] if "routeId=" in url else None
+        with self._lock:
+            self.calls += 1
+            delay = self.route_delays.get(route_id) or self.rng.uniform(*HTTP_LATENCY)
+        time.sleep(delay)
+        if "getBusArrivalListv2" in url:
+            if not self.list_available: raise ConnectionError("정류장 목록 API 응답 없음")
+            items = [self._item(route_id) for route_id in self.route_ids]
+            return FakeResponse({"response": {"msgBody": {"busArrivalList": items}}})
+        if route_id in self.failing_routes: raise ConnectionError(f"노선 {route_id} 응답 없음")
+        return FakeResponse({"response": {"msgBody": {"busArrivalItem": self._item(route_id)}}})
+
+
+class FakeTTS:
+    # gTTS 대신: 글자 수에 비례한 합성 지연 후 문장을 그대로 담은 가짜 클립을 쓴다
+    def __init__(self, text, lang="ko", slow=False):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        time.sleep(TTS_LATENCY_BASE + TTS_LATENCY_PER_CHAR * len(self.text))
+        fp.write(self.text.encode("utf-8"))
+
+
+def clip_duration(path):
+    if path.endswith(".wav"):
+        import wave
+        with wave.open(path, "rb") as f: return f.getnframes() / f.getframerate() * WAV_TIME_SCALE
+    return os.path.getsize(path) / 3 * PLAYBACK_SECONDS_PER_CH
+
+
+class ScriptedSpeechClient:
+    # 스트리밍 인식 호출마다 준비된 문장을 하나씩 꺼내 로컬 흉내 인식기로 돌려준다
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.transcripts = queue.Queue()
+
+    def streaming_recognize(self, config=None, requests=()):
+        from stt_standin import LocalStreamingRecognizer
+        transcript = self.transcripts.get(timeout=5)
+        return LocalStreamingRecognizer(transcript, sample_rate=self.sample_rate).streaming_recognize(config, requests)
+
+
+class Harness:
+    def __init__(self, workdir, seed=0):
+        self.workdir = workdir
+        self.rng = random.Random(seed)
+        self.speech_client = None
+
+    def setup_backends(self):
+        # 가짜 gTTS / 스피커 / GBIS 연결까지 (부스 루프 없이)
+        import tts_cache
+        import text_to_speech_rpi
+        import fetch_and_speak
+        from audio_player import AudioPlayer, NullSink
+
+        text_to_speech_rpi.gTTS = FakeTTS
+        tts_cache._default_cache = tts_cache.TTSClipCache(os.path.join(self.workdir, "tts_cache"))
+        self.player = AudioPlayer(NullSink(clip_duration))
+        text_to_speech_rpi.set_player(self.player, "USB")
+        # 안내 문장 조각은 톤 WAV로 미리 채워 둔다 (실제 부스에서는 최초 1회 gTTS로 생성)
+        import phrase_synth
+        engine = phrase_synth.PhraseEngine(os.path.join(self.workdir, "phrase_fragments"),
+                                           os.path.join(self.workdir, "phrase_out"))
+        engine.build(phrase_synth.all_fragments(fetch_and_speak.BUS_ROUTE_IDS), phrase_synth._tone_renderer(self.workdir))
+        text_to_speech_rpi._phrase_engine = self.phrase_engine = engine
+
+        fetch_and_speak._catalog, fetch_and_speak._catalog_loaded = None, True
+        self.http = FakeGBISSession(list(fetch_and_speak.BUS_ROUTE_IDS.values()), self.rng)
+        fetch_and_speak._session = self.http
+        self.reset_arrivals(os.path.join(self.workdir, "arrival_cache"))
+
+    def reset_arrivals(self, snapshot_dir=None):
+        import fetch_and_speak
+        from arrival_snapshot import StationSnapshotCache
+        fetch_and_speak._snapshot_cache = StationSnapshotCache(
+            fetch_and_speak.fetch_station_arrivals, ttl=fetch_and_speak.ARRIVAL_CACHE_TTL,
+            stale_ttl=fetch_and_speak.ARRIVAL_CACHE_STALE_TTL, snapshot_dir=snapshot_dir)
+
+    def setup(self):
+        import text_to_speech_rpi
+        import KEYPAD
+        from gpio_backend import SimulatedGPIO
+        from booth_service import BoothService
+        from serial_link import SerialLink, open_port
+        from arduino_sim import ArduinoSimulator
+
+        self.setup_backends()
+        # 아두이노 대신 pty 흉내 장치. 부스는 실제와 같은 프레임/ACK 링크로 연결된다
+        self.arduino = ArduinoSimulator().start()
+        self.link = SerialLink(open_port(self.arduino.port_name)).start()
+        self.voice = self._setup_voice()
+
+        KEYPAD.speak, KEYPAD.tts_enabled = text_to_speech_rpi.speak, True
+        self.gpio = KEYPAD.init_gpio(SimulatedGPIO(KEYPAD.ROWS, KEYPAD.COLS, KEYPAD.KEYS_LAYOUT))
+        self.service = BoothService(number_file=os.path.join(self.workdir, "bus_number.txt"),
+                                    on_bus_confirmed=lambda bus: KEYPAD.serial_write(self.link, bus))
+        self.service.warm_up(voice=self.voice)
+        self.keypad_module = KEYPAD
+        self.events, self.actions, self.stop_event, self.keypad = KEYPAD.start_booth(
+            self.link, self.service, number_file=self.service.number_file)
+        self.loop = threading.Thread(target=KEYPAD.run_event_loop,
+                                     args=(self.link, self.service, self.events, self.actions), daemon=True)
+        self.loop.start()
+
+    def _setup_voice(self):
+        try:
+            import speech_to_text_rpi as stt
+        except (Exception, SystemExit) as e:
+            print(f"음성 세션 생략 (speech_to_text_rpi 로드 실패: {e})", file=sys.stderr)
+            return False
+        from mic_capture import CaptureEngine, FakeInputDevice
+        from stt_standin import synthetic_utterance
+        key_file = os.path.join(self.workdir, "service_account.json")
+        open(key_file, "w").close()
+        stt.KEY_FILE_PATH = key_file
+        sample_rate = stt.audio_frontend.TARGET_RATE if stt.FRONTEND_ENABLED else stt.RATE
+        self.speech_client = ScriptedSpeechClient(sample_rate)
+        stt.set_speech_client(self.speech_client)
+        source = b"".join(synthetic_utterance(0.6, 1.2, sample_rate=stt.RATE, chunk=stt.CHUNK))
+        engine = CaptureEngine(FakeInputDevice(source, stt.RATE, chunk=stt.CHUNK, realtime=True))
+        engine.start()
+        stt.set_capture_engine(engine)
+        return True
+
+    def teardown(self):
+        self.events.put(("stop", None, time.monotonic()))
+        self.loop.join(2)
+        self.stop_event.set()
+        self.actions.put(None)
+        self.keypad.stop()
+        self.keypad_module.state.stop()
+        self.link.close()
+        self.arduino.close()
+        self.player.close()
+
+    def settle(self, timeout=SETTLE_TIMEOUT):
+        # 작업 큐와 재생 큐가 모두 비고 잠시 조용할 때까지
+        deadline = time.monotonic() + timeout
+        quiet_since = None
+        while time.monotonic() < deadline:
+            busy = (not self.actions.empty() or not self.events.empty() or not self.player.idle()
+                    or self.service._lock.locked())
+            if busy: quiet_since = None
+            elif quiet_since is None: quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since > 0.3: return True
+            time.sleep(0.02)
+        print("  [경고] 안정화 시간 초과", file=sys.stderr)
+        return False
+
+    def press(self, key):
+        self.gpio.press(key)
+        time.sleep(KEY_HOLD)
+        self.gpio.release(key)
+        time.sleep(KEY_GAP)
+
+    def run(self, steps):
+        for action, arg in steps:
+            if action == "key": self.press(arg)
+            elif action == "arrived": self.arduino.arrive(arg)
+            elif action == "settle": self.settle()
+            elif action == "wait": time.sleep(arg)
+            elif action == "wait_serial":
+                if not self.arduino.wait_for(arg, SETTLE_TIMEOUT): print(f"  [경고] 시리얼 송신 없음: {arg}", file=sys.stderr)
+            elif action == "voice":
+                if not self.voice: continue
+                for transcript in arg: self.speech_client.transcripts.put(transcript)
+                self.press("D")
+
+
+def measure_off_switch(n=200000):
+    # 측정이 꺼져 있을 때 traced/span이 더하는 비용 (호출당 ns)
+    was_enabled = tracing.enabled()
+    tracing.enable(False)
+    def plain(): return None
+    wrapped = tracing.traced("bench.noop")(plain)
+    def with_span():
+        with tracing.span("bench.noop"): return None
+    results = {}
+    for name, func in (("plain", plain), ("traced", wrapped), ("span", with_span)):
+        start = time.perf_counter()
+        for _ in range(n): func()
+        results[name] = (time.perf_counter() - start) / n * 1e9
+    tracing.enable(was_enabled)
+    return results
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["spans"]
+
+
+def compare(current, baseline):
+    print("\n기준 대비 p50 / p90 변화")
+    for name, h in current.items():
+        if name not in baseline: continue
+        b = baseline[name]
+        print(f"  {name:<28}{(h['p50'] - b['p50']) * 1000:>+9.1f} ms{(h['p90'] - b['p90']) * 1000:>+9.1f} ms")
+
+
+# 'B' 안내 비교용 추가 노선 (기본 4개 + 6개 = 10개)
+EXTRA_ROUTES = {"3000": "200000301", "8100": "200000302", "1550": "200000303",
+                "G6000": "200000304", "9": "200000305", "720-2": "200000306"}
+
+
+class NoPhraseEngine:
+    # 조각이 없는 부스: 모든 문장을 온라인(가짜 gTTS)으로 합성
+    def render(self, text):
+        return None
+
+
+def legacy_announce(buses):
+    # 변경 전 경로: 모든 노선 조회를 기다린 뒤 한 문단으로 합쳐 한 번에 합성/재생
+    import fetch_and_speak
+    from text_to_speech_rpi import speak
+    infos, late = fetch_and_speak.get_all_bus_info(buses)
+    return [speak(fetch_and_speak.compose_speech(infos, late), block=False)]
+
+
+def streaming_announce(buses):
+    import fetch_and_speak
+    return fetch_and_speak.announce_streaming(buses, block=False)[2]
+
+
+def bench_announce(repeats=3, counts=(1, 4, 10)):
+    # 버스 수별로 첫 음성까지 / 안내 끝까지 시간 (중앙값). 캐시는 매번 비운다
+    import tts_cache
+    import text_to_speech_rpi
+    import fetch_and_speak
+    fetch_and_speak.BUS_ROUTE_IDS.update(EXTRA_ROUTES)
+    workdir = tempfile.mkdtemp(prefix="announce_bench_")
+    harness = Harness(workdir)
+    harness.setup_backends()
+    routes = list(fetch_and_speak.BUS_ROUTE_IDS)
+    median = lambda values: sorted(values)[len(values) // 2] * 1000
+    print(f"{'합성':<8}{'조회':<8}{'버스':>4}  {'경로':<10}{'첫 음성(ms)':>12}{'전체(ms)':>10}")
+    try:
+        for synth, engine in (("조각", harness.phrase_engine), ("온라인", NoPhraseEngine())):
+            text_to_speech_rpi._phrase_engine = engine
+            for source in ("정류장", "노선별"):
+                harness.http.list_available = source == "정류장"
+                for count in counts:
+                    for name, announce in (("기존", legacy_announce), ("스트리밍", streaming_announce)):
+                        firsts, totals = [], []
+                        for r in range(repeats):
+                            tts_cache._default_cache = tts_cache.TTSClipCache(
+                                os.path.join(workdir, f"tts_{synth}_{source}_{count}_{name}_{r}"))
+                            harness.reset_arrivals()
+                            start = time.monotonic()
+                            handles = [h for h in announce(routes[:count]) if h]
+                            for h in handles: h.wait()
+                            firsts.append(min(h.started_at for h in handles) - start)
+                            totals.append(max(h.finished_at for h in handles) - start)
+                        print(f"{synth:<8}{source:<8}{count:>4}  {name:<10}{median(firsts):>12.0f}{median(totals):>10.0f}")
+    finally:
+        harness.player.close()
+
+
+def check_deadline(deadline=2.0):
+    # 정류장 목록 API가 죽어 노선별로 조회할 때: 느린 노선은 마감 시간에 늦은 노선으로 빠지고, 실패한 노선은 바로
+    # 실패 문장으로 안내되며, 전체 시간은 지연의 합이 아니라 마감 시간에서 끝나야 한다. 어긋난 항목 목록을 돌려준다
+    import fetch_and_speak
+    harness = Harness(tempfile.mkdtemp(prefix="deadline_check_"))
+    harness.setup_backends()
+    http = harness.http
+    http.list_available = False
+    buses = list(fetch_and_speak.BUS_ROUTE_IDS)[:4]
+    ids = [fetch_and_speak.BUS_ROUTE_IDS[bus] for bus in buses]
+    failures = []
+    try:
+        cases = [
+            # (설명, 노선별 지연, 실패 노선, 기대하는 늦은 노선, 최소/최대 시간). 앞서 실패하는 목록 API 호출 지연만큼 여유를 둔다
+            ("모두 제시간", {ids[0]: 0.3, ids[1]: 0.5, ids[2]: 1.0, ids[3]: 0.2}, set(), [],
+             1.0, 1.0 + HTTP_LATENCY[1] + 0.2),
+            ("느린 노선 + 실패 노선", {ids[0]: 0.3, ids[1]: 0.5, ids[2]: 0.1, ids[3]: 3.0}, {ids[2]}, [buses[3]],
+             deadline, deadline + HTTP_LATENCY[1] + 0.2),
+        ]
+        for name, delays, failing, expected_late, low, high in cases:
+            http.route_delays, http.failing_routes = delays, failing
+            harness.reset_arrivals()
+            start = time.monotonic()
+            infos, late = fetch_and_speak.get_all_bus_info(buses, deadline=deadline)
+            elapsed = time.monotonic() - start
+            on_time = [bus for bus in buses if bus not in expected_late]
+            print(f"  {name}: {elapsed:.2f}s, 늦은 노선 {late}")
+            if late != expected_late: failures.append(f"{name}: 늦은 노선 {late} (기대 {expected_late})")
+            if not low <= elapsed <= high: failures.append(f"{name}: {elapsed:.2f}s (기대 {low:.2f}~{high:.2f}s)")
+            if [info.split("번")[0] for info in infos] != on_time:
+                failures.append(f"{name}: 안내 순서 {infos}")
+            for bus, info in zip(on_time, infos):
+                failed = fetch_and_speak.BUS_ROUTE_IDS[bus] in failing
+                if failed != ("실패" in info): failures.append(f"{name}: {bus} 안내 '{info}'")
+    finally:
+        http.route_delays, http.failing_routes = {}, set()
+        harness.player.close()
+    return failures
+
+
+EVENT_LATENCY_LIMIT = 0.5   # 조회/합성이 진행 중이어도 키 에코와 도착 안내는 이 안에 시작해야 한다
+CHECK_TIMEOUT = 3           # 시리얼 등록 결과를 기다리는 시간
+
+
+def _span_count(name):
+    return tracing.snapshot().get(name, {}).get("count", 0)
+
+
+def _clip_text(path):
+    # 가짜 gTTS 클립은 문장을 그대로 담고 있다 (조각 합성 WAV는 None)
+    if path.endswith(".wav"): return None
+    with open(path, "r", encoding="utf-8") as f: return f.read()
+
+
+def check_events():
+    # 시뮬레이션 GPIO + pty 아두이노로 실제 이벤트 루프(KEYPAD.run_event_loop)를 돌린다.
+    # 1) 'C' 등록 확인 문장(온라인 합성)이 같은 키의 도착 정보 안내보다 먼저 나온다
+    # 2) 도착 정보 조회가 2초 넘게 걸리는 동안에도 키 에코, 도착 신호 안내, 시리얼 등록이 바로 처리된다
+    global TTS_LATENCY_BASE
+    import fetch_and_speak
+    was_enabled = tracing.enabled()
+    tracing.enable()
+    tracing.reset()
+    harness = Harness(tempfile.mkdtemp(prefix="events_check_"))
+    harness.setup()
+    sink, failures = harness.player.sink, []
+    saved_tts = TTS_LATENCY_BASE
+    try:
+        for key in "5100": harness.press(key)
+        harness.settle()
+        sink.played.clear()
+        TTS_LATENCY_BASE = 0.6   # 등록 확인 문장 합성이 도착 정보 조회보다 늦게 끝나게
+        harness.press("C")
+        harness.settle()
+        TTS_LATENCY_BASE = saved_tts
+        order = [("confirm" if _clip_text(path) == "5100번 버스를 등록합니다." else "wav" if path.endswith(".wav") else "other")
+                 for path, *_ in sink.played]
+        print(f"  'C' 이후 재생 순서: {order}")
+        if "confirm" not in order or "wav" not in order or order.index("confirm") > order.index("wav"):
+            failures.append(f"등록 확인이 도착 정보보다 늦게 재생됨: {order}")
+
+        harness.reset_arrivals()
+        harness.http.list_available = False
+        harness.http.route_delays = {route_id: 2.0 for route_id in fetch_and_speak.BUS_ROUTE_IDS.values()}
+        for key in "7000": harness.press(key)
+        harness.settle()
+        tracing.reset()
+        pressed_at = time.monotonic()
+        harness.press("C")
+        if not harness.arduino.wait_for("7000", EVENT_LATENCY_LIMIT * 2):
+            failures.append("조회 중 시리얼 등록(7000)이 아두이노에 닿지 않음")
+        registered = harness.arduino.registered_at.get("7000", time.monotonic()) - pressed_at
+        harness.press("1")
+        harness.arduino.arrive("5100")
+        deadline = time.monotonic() + 2
+        while _span_count("serial.arrived_to_audio") < 1 and time.monotonic() < deadline: time.sleep(0.01)
+        fetch_running = harness.service._lock.locked()
+        spans = tracing.snapshot()
+        harness.settle()
+        key_max = spans.get("keypad.key_to_audio", {}).get("max")
+        arrived_max = spans.get("serial.arrived_to_audio", {}).get("max")
+        print(f"  조회 중: 시리얼 등록 {registered * 1000:.0f} ms, 키 에코 최대 {(key_max or 0) * 1000:.0f} ms, "
+              f"도착 안내 {(arrived_max or 0) * 1000:.0f} ms, 그때 조회 진행 중 {fetch_running}")
+        if not fetch_running: failures.append("도착 안내가 조회가 끝난 뒤에야 재생됨")
+        if key_max is None or key_max > EVENT_LATENCY_LIMIT: failures.append(f"키 에코 지연 {key_max}")
+        if arrived_max is None or arrived_max > EVENT_LATENCY_LIMIT: failures.append(f"도착 안내 지연 {arrived_max}")
+    finally:
+        TTS_LATENCY_BASE = saved_tts
+        harness.http.route_delays, harness.http.list_available = {}, True
+        harness.teardown()
+        tracing.reset()
+        tracing.enable(was_enabled)
+    return failures
+
+
+def check_serial_full():
+    # 아두이노 송신 목록(10칸)이 가득 차 넣지 못한 번호는 ACK를 받아도 실패로 돌아와야 하고,
+    # 이미 있는 번호는 성공, 도착 신호로 칸이 비면 다시 등록된다
+    from serial_link import SerialLink, open_port
+    from arduino_sim import ArduinoSimulator, LIST_SIZE
+    arduino = ArduinoSimulator().start()
+    link = SerialLink(open_port(arduino.port_name)).start()
+    buses = [f"{9000 + n}" for n in range(LIST_SIZE + 2)]
+    failures = []
+    try:
+        deliveries = [link.register(bus) for bus in buses]
+        results = [d.wait(CHECK_TIMEOUT) for d in deliveries]
+        print(f"  등록 {len(buses)}건: 성공 {sum(results)}, 거절 {sum(d.rejected for d in deliveries)}")
+        if results != [True] * LIST_SIZE + [False] * 2:
+            failures.append(f"칸 수를 넘은 등록 결과: {results}")
+        if not all(d.acked for d in deliveries): failures.append("거절된 등록에 ACK가 오지 않음")
+        if not link.register(buses[0]).wait(CHECK_TIMEOUT): failures.append("이미 있는 번호의 재등록이 실패로 돌아옴")
+        arduino.arrive(buses[0])
+        if not link.register(buses[-1]).wait(CHECK_TIMEOUT): failures.append("칸이 빈 뒤의 재등록이 실패로 돌아옴")
+        if buses[-1] not in arduino.send_list: failures.append("재등록한 번호가 아두이노 목록에 없음")
+    finally:
+        link.close()
+        arduino.close()
+    return failures
+
+
+CHECKS = {"deadline": check_deadline, "events": check_events, "serial_full": check_serial_full}
+
+
+def run_checks(names):
+    failed = 0
+    for name in names or CHECKS:
+        print(f"[Check] {name}")
+        failures = CHECKS[name]()
+        for failure in failures: print(f"  실패: {failure}", file=sys.stderr)
+        print(f"  -> {'통과' if not failures else f'실패 {len(failures)}건'}")
+        failed += bool(failures)
+    return failed
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "announce":
+        bench_announce(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        # 스크립트 확인: 하나라도 어긋나면 종료 코드 1
+        sys.exit(1 if run_checks(sys.argv[2:]) else 0)
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    # 결과 파일을 덮어쓰기 전에 기준 결과를 먼저 읽어 둔다
+    baseline = load_baseline(sys.argv[2]) if len(sys.argv) > 2 else None
+    tracing.enable()
+    tracing.reset()
+    workdir = tempfile.mkdtemp(prefix="booth_bench_")
+    harness = Harness(workdir)
+    harness.setup()
+    start = time.perf_counter()
+    try:
+        for r in range(rounds):
+            for name, steps in SESSIONS.items():
+                print(f"[Bench] 라운드 {r + 1}/{rounds} 세션 '{name}'", file=sys.stderr)
+                harness.run(steps)
+                harness.settle()
+    finally:
+        harness.teardown()
+    elapsed = time.perf_counter() - start
+
+    spans = tracing.snapshot()
+    print(f"\n세션 {rounds * len(SESSIONS)}개 재생 ({elapsed:.1f}s), 가짜 HTTP 호출 {harness.http.calls}회, "
+          f"아두이노 등록 {harness.arduino.registered}")
+    tracing.report(spans)
+    off = measure_off_switch()
+    print(f"\n측정 꺼짐 비용: 일반 호출 {off['plain']:.0f} ns, traced {off['traced']:.0f} ns, span {off['span']:.0f} ns")
+    print(f"히스토그램 저장: {tracing.export()}")
+    if baseline: compare(spans, baseline)
+
+
+if __name__ == "__main__":
+    main()
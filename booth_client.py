@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+
+BOOTH_SOCKET = "/tmp/booth_service.sock"
+CLIENT_TIMEOUT = 120
+EXIT_UNAVAILABLE = 3   # 연결 자체가 안 됨: run_pipeline.sh가 개별 스크립트로 대신 처리한다
+EXIT_NO_RESPONSE = 4   # 연결 뒤 시간 초과/끊김: 서비스 쪽 세션이 아직 진행 중일 수 있으므로 대신 처리하지 않는다
+BASE_DIR     = os.path.dirname(os.path.abspath(__file__))
+BENCH_FILE   = os.path.join(BASE_DIR, "booth_client_bench.json")
+ACTIONS      = ("fetch", "voice")
+
+
+def call(cmd, socket_path=BOOTH_SOCKET, timeout=CLIENT_TIMEOUT, **args):
+    # 상주 서비스가 없으면 connect에서 FileNotFoundError / ConnectionRefusedError.
+    # 연결된 뒤의 시간 초과는 socket.timeout, 응답 없이 끊기면 ConnectionError
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        request = dict(args, cmd=cmd)
+        sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            line = f.readline()
+    if not line: raise ConnectionError("서비스 응답이 없습니다.")
+    return json.loads(line)
+
+
+def service_available(socket_path=BOOTH_SOCKET):
+    try: return call("ping", socket_path=socket_path, timeout=1).get("ok", False)
+    except OSError: return False
+
+
+def _legacy_command(action, bus):
+    # 상주 서비스 이전 경로: 동작마다 새 python3/bash 프로세스
+    if action == "fetch": return [sys.executable, "fetch_and_speak.py", bus]
+    return ["bash", "run_pipeline.sh"]
+
+
+def bench(actions=ACTIONS, rounds=3, bus="5100", socket_path=BOOTH_SOCKET, result_file=BENCH_FILE):
+    # 동작(fetch/voice)별 요청부터 안내 재생이 끝날 때까지. 서비스가 떠 있으면 소켓 호출, 없으면 run_pipeline.sh 경로.
+    # 마이크와 스피커는 한쪽만 잡을 수 있어 두 경로를 한 번에 잴 수 없다. 서비스를 끈 채로 한 번, 켠 채로 한 번
+    # 실행하면 결과 파일에 합쳐 두 경로를 비교한다
+    path = "service" if service_available(socket_path) else "legacy"
+    try:
+        with open(result_file, "r", encoding="utf-8") as f: results = json.load(f)
+    except (OSError, ValueError):
+        results = {}
+    results[path] = results.get(path, {})
+    print(f"측정 경로: {'상주 서비스' if path == 'service' else '기존 run_pipeline.sh (매번 새 프로세스)'}")
+    for action in actions:
+        times, failed = [], 0
+        for r in range(rounds):
+            if action == "voice": print(f"  [{r + 1}/{rounds}] 버스 번호를 말씀해 주세요.")
+            start = time.perf_counter()
+            if path == "service":
+                ok = call(action, socket_path=socket_path, **({"bus": bus} if action == "fetch" else {})).get("ok")
+            else:
+                ok = subprocess.run(_legacy_command(action, bus), cwd=BASE_DIR, capture_output=True).returncode == 0
+            times.append(time.perf_counter() - start)
+            failed += not ok
+        results[path][action] = times
+        status = f" (실패 {failed}회)" if failed else ""
+        print(f"  {action}: 중앙값 {sorted(times)[len(times) // 2] * 1000:.0f} ms, 평균 {sum(times) / len(times) * 1000:.0f} ms{status}")
+    with open(result_file, "w", encoding="utf-8") as f: json.dump(results, f)
+
+    if "service" in results and "legacy" in results:
+        median = lambda values: sorted(values)[len(values) // 2] * 1000
+        print(f"\n{'동작':<8}{'기존(ms)':>10}{'서비스(ms)':>12}{'차이(ms)':>10}")
+        for action in ACTIONS:
+            if action in results["service"] and action in results["legacy"]:
+                old, new = median(results["legacy"][action]), median(results["service"][action])
+                print(f"{action:<8}{old:>10.0f}{new:>12.0f}{new - old:>+10.0f}")
+    else:
+        other = "켠" if path == "legacy" else "끈"
+        print(f"\n비교하려면 서비스를 {other} 상태로 한 번 더 실행하세요 (결과: {result_file})")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("사용법: booth_client.py fetch [버스번호] | voice | speak <문장> | ping | stats | bench [fetch|voice] [횟수]",
+              file=sys.stderr)
+        sys.exit(2)
+    cmd = sys.argv[1]
+    if cmd == "bench":
+        actions = (sys.argv[2],) if len(sys.argv) > 2 and sys.argv[2] in ACTIONS else ACTIONS
+        bench(actions, int(sys.argv[3]) if len(sys.argv) > 3 else 3); return
+    args = {}
+    if cmd == "fetch" and len(sys.argv) > 2: args["bus"] = sys.argv[2]
+    if cmd == "speak": args["text"] = " ".join(sys.argv[2:])
+    try:
+        response = call(cmd, **args)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        print(f"[오류] 부스 서비스에 연결할 수 없습니다: {e}", file=sys.stderr)
+        sys.exit(EXIT_UNAVAILABLE)
+    except (OSError, ValueError) as e:
+        print(f"[오류] 부스 서비스 응답을 받지 못했습니다: {e}", file=sys.stderr)
+        sys.exit(EXIT_NO_RESPONSE)
+    if not response.get("ok"):
+        print(f"[오류] {response.get('error')}", file=sys.stderr)
+        sys.exit(1)
+    result = response.get("result")
+    if cmd == "voice":
+        if not result: sys.exit(1)
+        print(f"CONFIRMED_BUS:{result}")
+    elif cmd == "stats":
+        import tracing
+        if not result["tracing"]: print("구간 측정이 꺼져 있습니다 (서비스를 BOOTH_TRACE=1 로 시작).")
+        tracing.report(result["spans"])
+    elif result is not None:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+import threading
+import socketserver
+
+import tracing
+import arrival_watch
+from audio_player import PRIORITY_URGENT, PRIORITY_INFO
+
+BOOTH_SOCKET = "/tmp/booth_service.sock"
+BASE_DIR     = os.path.dirname(os.path.abspath(__file__))
+NUMBER_FILE  = os.path.join(BASE_DIR, "bus_number.txt")
+USB_SPEAKER_KEYWORD = "USB"
+
+
+class BoothService:
+    # requests / gtts / google.cloud.speech / pyaudio 를 한 번만 불러오고
+    # 조회, 음성 인식, 음성 출력을 같은 프로세스 안에서 처리한다
+    def __init__(self, number_file=NUMBER_FILE, on_bus_confirmed=None):
+        self.number_file = number_file
+        self.on_bus_confirmed = on_bus_confirmed
+        self.load_times = {}
+        self._lock = threading.Lock()
+        self._fetch = None
+        self._stt = None
+        self._tts = None
+        self._server = None
+        self._watcher = None
+        self._phrases_warmed = False
+
+    def _load(self, name):
+        start = time.perf_counter()
+        try:
+            module = __import__(name)
+        except (Exception, SystemExit) as e:
+            print(f"[Booth] {name} 모듈 로드 실패: {e}", file=sys.stderr)
+            return None
+        self.load_times[name] = time.perf_counter() - start
+        return module
+
+    def warm_up(self, voice=True):
+        if self._tts is None: self._tts = self._load("text_to_speech_rpi")
+        if self._fetch is None: self._fetch = self._load("fetch_and_speak")
+        if voice and self._stt is None: self._stt = self._load("speech_to_text_rpi")
+        if self._tts and self._fetch and not self._phrases_warmed:
+            self._phrases_warmed = True
+            self._tts.prewarm_phrases(self._fetch.valid_route_numbers())
+        print(f"[Booth] 모듈 로드 완료: " + ", ".join(f"{k} {v:.2f}s" for k, v in self.load_times.items()))
+
+    def speak(self, text, **kwargs):
+        if self._tts is None: self.warm_up(voice=False)
+        if self._tts is None:
+            print(f"[TTS 비활성] {text}")
+            return None
+        kwargs.setdefault("speaker_keyword", USB_SPEAKER_KEYWORD)
+        return self._tts.speak(text, **kwargs)
+
+    def fetch(self, bus_number=None):
+        if self._fetch is None: self.warm_up(voice=False)
+        if self._fetch is None:
+            self.speak("버스 정보 조회 기능을 사용할 수 없습니다.")
+            return None
+        with self._lock:
+            return self._fetch.announce_arrivals(bus_number, number_file=self.number_file)
+
+    def watch_arrivals(self, buses):
+        # buses() 노선을 백그라운드에서 감시하다가 기준 시간(arrival_watch.ALERT_MINUTES)을 지나면 먼저 안내
+        if self._fetch is None: self.warm_up(voice=False)
+        if self._fetch is None: return None
+        def announce(text, urgent):
+            print(f"[Watch] {text}")
+            self.speak(text, block=False, priority=PRIORITY_URGENT if urgent else PRIORITY_INFO)
+        self._watcher = arrival_watch.ArrivalWatcher(buses, self._fetch.poll_arrivals, announce).start()
+        return self._watcher
+
+    def buses_changed(self):
+        if self._watcher: self._watcher.wake()
+
+    def check_route(self, bus_number):
+        # 노선 카탈로그가 있을 때만 판정: (이 정류장 노선 여부, 같은 접두어 노선 수). 판정 불가면 (None, 0)
+        if self._fetch is None or self._fetch.get_catalog() is None: return None, 0
+        return self._fetch.resolve_route(bus_number) is not None, self._fetch.count_matching_routes(bus_number)
+
+    def voice(self):
+        if self._stt is None: self.warm_up()
+        if self._stt is None:
+            self.speak("음성 인식 기능을 사용할 수 없습니다.")
+            return None
+        if not self._stt.check_key_file(): return None
+        with self._lock:
+            bus_number = self._stt.run_voice_session(number_file=self.number_file)
+        if bus_number:
+            if self.on_bus_confirmed: self.on_bus_confirmed(bus_number)
+            self.fetch(bus_number)
+        return bus_number
+
+    def handle(self, request):
+        cmd = request.get("cmd")
+        start = time.perf_counter()
+        if cmd == "ping": result = True
+        elif cmd == "stats": result = {"tracing": tracing.enabled(), "spans": tracing.snapshot()}
+        elif cmd == "fetch": result = self.fetch(request.get("bus"))
+        elif cmd == "voice": result = self.voice()
+        elif cmd == "speak":
+            handle = self.speak(request.get("text", ""))
+            result = handle is not None
+        else:
+            return {"ok": False, "error": f"알 수 없는 명령: {cmd}"}
+        if cmd != "stats": tracing.record(f"service.{cmd}", time.perf_counter() - start)
+        return {"ok": True, "result": result, "elapsed": time.perf_counter() - start}
+
+    def serve_forever(self, socket_path=BOOTH_SOCKET):
+        self._server = _make_server(self, socket_path)
+        print(f"[Booth] 서비스 대기 중: {socket_path}")
+        try: self._server.serve_forever()
+        finally: self.stop()
+
+    def start_server(self, socket_path=BOOTH_SOCKET):
+        self._server = _make_server(self, socket_path)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[Booth] 서비스 대기 중: {socket_path}")
+
+    def stop(self):
+        watcher, self._watcher = self._watcher, None
+        if watcher: watcher.stop()
+        server, self._server = self._server, None
+        if not server: return
+        server.shutdown()
+        server.server_close()
+        try: os.remove(server.server_address)
+        except OSError: pass
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.service.handle(json.loads(line))
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _make_server(service, socket_path):
+    if os.path.exists(socket_path): os.remove(socket_path)
+    server = _Server(socket_path, _RequestHandler)
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    service = BoothService()
+    service.warm_up()
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        print("\n종료(Ctrl+C)")
@@ -0,0 +1,212 @@
+import re
+import sys
+import time
+
+kor2num = { '공': '0', '영': '0', '일': '1', '이': '2', '삼': '3', '사': '4', '오': '5', '육': '6', '칠': '7', '팔': '8', '구': '9' }
+kor_syllable_to_letter = { "에이": "A", "비": "B", "씨": "C", "디": "D", "이": "E", "에프": "F", "지": "G", "에이치": "H", "아이": "I", "제이": "J", "케이": "K", "엘": "L", "엠": "M", "엔": "N", "오": "O", "피": "P", "큐": "Q", "알": "R", "에스": "S", "티": "T", "유": "U", "브이": "V", "더블유": "W", "엑스": "X", "와이": "Y", "제트": "Z" }
+kor_units = { '십': 10, '백': 100, '천': 1000 }
+separators = { '다시': '-', '-': '-' }
+
+DIGIT_PRIOR     = 1.0
+UNIT_PRIOR      = 1.0
+LETTER_PRIOR    = 0.6
+AMBIGUOUS_PRIOR = 0.3    # '이'(2/E), '오'(5/O)처럼 숫자로도 읽히는 글자를 알파벳으로 읽을 때
+SKIP_PRIOR      = 0.9    # 아무 토큰도 시작하지 않는 글자 건너뛰기
+SKIP_OVER_TOKEN = 0.2    # 토큰이 시작되는 글자를 건너뛰기
+NOT_A_ROUTE     = 0.05
+BEAM_WIDTH      = 16
+BUS_NUMBER_RE   = re.compile(r'[A-Z]?\d{1,5}(?:-\d{1,2})?')
+
+
+def _build_trie():
+    root = {}
+    def add(text, token):
+        node = root
+        for ch in text: node = node.setdefault(ch, {})
+        node.setdefault(None, []).append(token)
+    for syl, digit in kor2num.items(): add(syl, ("digit", digit, DIGIT_PRIOR))
+    for syl, letter in kor_syllable_to_letter.items():
+        add(syl, ("letter", letter, AMBIGUOUS_PRIOR if syl in kor2num else LETTER_PRIOR))
+    for syl, unit in kor_units.items(): add(syl, ("unit", unit, UNIT_PRIOR))
+    for text, sep in separators.items(): add(text, ("sep", sep, 1.0))
+    for ch in "ABCDEFGHIJKLMNOPQRSTUVWXYZ": add(ch, ("letter", ch, 1.0))
+    for ch in "0123456789": add(ch, ("digit", ch, 1.0))
+    return root
+
+_TRIE = _build_trie()
+
+
+def normalize(text):
+    return re.sub(r'[\s.,?!]+', '', text.upper().replace("번", "").replace("버스", ""))
+
+
+def _matches(text, i):
+    node, j = _TRIE, i
+    while j < len(text):
+        node = node.get(text[j])
+        if node is None: return
+        j += 1
+        for token in node.get(None, ()): yield j, token
+
+
+def _render_number(run):
+    if not any(kind == "unit" for kind, _ in run):
+        return "".join(value for _, value in run)
+    total, pending = 0, None
+    for kind, value in run:
+        if kind == "digit":
+            if pending is not None: return None
+            pending = int(value)
+        else:
+            total += (pending if pending is not None else 1) * value
+            pending = None
+    return str(total + (pending or 0))
+
+
+def _render_segment(tokens):
+    parts, run = [], []
+    for kind, value in tokens:
+        if kind in ("digit", "unit"):
+            run.append((kind, value)); continue
+        if run:
+            number = _render_number(run)
+            if number is None: return None
+            parts.append(number); run = []
+        parts.append(value)
+    if run:
+        number = _render_number(run)
+        if number is None: return None
+        parts.append(number)
+    return "".join(parts)
+
+
+def render(tokens):
+    segments, current = [], []
+    for kind, value in tokens:
+        if kind == "sep":
+            segments.append(current); current = []
+        else:
+            current.append((kind, value))
+    segments.append(current)
+    rendered = [s for s in (_render_segment(seg) for seg in segments) if s]
+    if not rendered: return None
+    bus_number = rendered[0]
+    if len(rendered) > 1 and rendered[0].isdigit() and rendered[1].isdigit():
+        bus_number += "-" + rendered[1]
+    if len(bus_number) <= 8 and BUS_NUMBER_RE.fullmatch(bus_number):
+        return bus_number
+    return None
+
+
+class BusNumberDecoder:
+    # 미리 만든 트라이로 한 번 훑으며 가능한 읽기를 모두 격자로 만들고, 빔 탐색으로 후보 번호를 뽑는다
+    def __init__(self, valid_routes=None, beam_width=BEAM_WIDTH):
+        self.valid_routes = set(valid_routes) if valid_routes else None
+        self.beam_width = beam_width
+
+    def decode(self, text):
+        text = normalize(text)
+        if not text: return {}
+        beams = [[] for _ in range(len(text) + 1)]
+        beams[0] = [(1.0, ())]
+        for i in range(len(text)):
+            if not beams[i]: continue
+            beams[i].sort(key=lambda b: -b[0])
+            del beams[i][self.beam_width:]
+            matches = list(_matches(text, i))
+            skip = SKIP_OVER_TOKEN if matches else SKIP_PRIOR
+            for prior, tokens in beams[i]:
+                for end, (kind, value, token_prior) in matches:
+                    beams[end].append((prior * token_prior, tokens + ((kind, value),)))
+                beams[i + 1].append((prior * skip, tokens))
+        candidates = {}
+        for prior, tokens in beams[-1]:
+            bus_number = render(tokens)
+            if bus_number and prior > candidates.get(bus_number, 0):
+                candidates[bus_number] = prior
+        return candidates
+
+    def rank(self, alternatives):
+        # alternatives: [(transcript, confidence, word_confidences or None), ...] (인식기 순위 순)
+        scores = {}
+        for rank, alternative in enumerate(alternatives):
+            transcript, confidence = alternative[0], alternative[1]
+            words = alternative[2] if len(alternative) > 2 else None
+            if words: weight = sum(words) / len(words)
+            elif confidence: weight = confidence
+            else: weight = max(0.1, 0.6 * 0.7 ** rank)
+            for bus_number, prior in self.decode(transcript).items():
+                scores[bus_number] = scores.get(bus_number, 0.0) + weight * prior
+        if self.valid_routes is not None:
+            for bus_number in scores:
+                if bus_number not in self.valid_routes: scores[bus_number] *= NOT_A_ROUTE
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+    def best(self, alternatives):
+        ranked = self.rank(alternatives)
+        return ranked[0] if ranked else (None, 0.0)
+
+
+# (인식 후보들, 정답) - 현장에서 자주 나온 인식 결과 유형
+BENCH_CORPUS = [
+    ([("5100번", 0.92)], "5100"),
+    ([("오천백번", 0.88)], "5100"),
+    ([("오일공공", 0.81)], "5100"),
+    ([("오천 원", 0.62), ("오천백", 0.0)], "5100"),
+    ([("칠천번 버스", 0.90)], "7000"),
+    ([("칠공공공", 0.85)], "7000"),
+    ([("7000", 0.93)], "7000"),
+    ([("천백십이", 0.77)], "1112"),
+    ([("일일일이", 0.80)], "1112"),
+    ([("1112번", 0.91)], "1112"),
+    ([("일일일e", 0.55), ("일일일이", 0.0)], "1112"),
+    ([("엠오일공칠", 0.70)], "M5107"),
+    ([("m5107", 0.86)], "M5107"),
+    ([("엠 오천백칠", 0.74)], "M5107"),
+    ([("M 5107번", 0.89)], "M5107"),
+    ([("앰오일공칠", 0.52), ("엠오일공칠", 0.0)], "M5107"),
+    ([("오 천 백", 0.66)], "5100"),
+    ([("오백 일", 0.40), ("오천백", 0.0)], "5100"),
+]
+
+
+def _legacy_extract(text):
+    # 이전 방식: 첫 번째 인식 결과만, 글자마다 사전을 정렬해 startswith 비교
+    processed = re.sub(r'\s+', '', text.upper().replace("번", "").replace("버스", "").strip())
+    match = re.fullmatch(r'([A-Z])?(\d{1,5})(?:-(\d{1,2}))?', processed)
+    if match: return processed
+    def segment(s):
+        out, i = [], 0
+        while i < len(s):
+            for syl, letter in sorted(kor_syllable_to_letter.items(), key=lambda it: len(it[0]), reverse=True):
+                if s[i:].startswith(syl): out.append(letter); i += len(syl); break
+            else:
+                if s[i] in kor2num: out.append(kor2num[s[i]])
+                elif 'A' <= s[i] <= 'Z' or '0' <= s[i] <= '9': out.append(s[i])
+                i += 1
+        return "".join(out)
+    segments = [segment(s) for s in processed.split("다시") if s and segment(s)]
+    if not segments: return ""
+    result = segments[0]
+    if len(segments) > 1 and segments[0].isdigit() and segments[1].isdigit(): result += "-" + segments[1]
+    return result if re.search(r'\d', result) and BUS_NUMBER_RE.fullmatch(result) else ""
+
+
+def bench(valid_routes=("5100", "7000", "1112", "M5107"), rounds=200):
+    decoder = BusNumberDecoder(valid_routes)
+    legacy_wrong = sum(_legacy_extract(alts[0][0]) != expected for alts, expected in BENCH_CORPUS)
+    new_wrong = sum(decoder.best(alts)[0] != expected for alts, expected in BENCH_CORPUS)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for alts, _ in BENCH_CORPUS: decoder.best(alts)
+    elapsed = time.perf_counter() - start
+    n = len(BENCH_CORPUS)
+    print(f"말뭉치 {n}건: 재확인 필요(첫 후보 오답) 이전 {legacy_wrong}건 -> 현재 {new_wrong}건")
+    print(f"디코딩 처리량: {rounds * n / elapsed:.0f} 건/초")
+    for alts, expected in BENCH_CORPUS:
+        got = decoder.best(alts)[0]
+        if got != expected: print(f"  오답: {alts} -> {got} (정답 {expected})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+import fcntl
+import select
+import struct
+import ctypes
+import contextlib
+import ctypes.util
+import threading
+
+COMPACT_AFTER = 64        # 저널이 이만큼 쌓이면 스냅샷으로 합친다
+POLL_INTERVAL = 0.5       # inotify를 쓸 수 없을 때 확인 주기
+
+IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x002, 0x008, 0x080, 0x100
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class BusStateStore:
+    # 등록된 버스 목록: 스냅샷(bus_number.txt) + 추가 전용 저널(+번호/-번호) + 프로세스 간 파일 잠금
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.lock_path = path + ".lock"
+        self._buses = set()
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._mutex = threading.RLock()
+        self._watch_thread = None
+        self._stop = threading.Event()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.refresh()
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        with self._mutex:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                yield
+            finally:
+                os.close(fd)   # 닫으면 잠금도 풀린다
+
+    def _read_snapshot(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def _apply(self, line, buses, added, removed):
+        op, bus = line[:1], line[1:]
+        if not bus: return
+        if op == "+" and bus not in buses:
+            buses.add(bus)
+            if bus in removed: removed.discard(bus)
+            else: added.add(bus)
+        elif op == "-" and bus in buses:
+            buses.discard(bus)
+            if bus in added: added.discard(bus)
+            else: removed.add(bus)
+
+    def _catch_up_locked(self):
+        # 마지막으로 읽은 위치 이후의 저널만 적용. 압축으로 저널이 바뀌었으면 스냅샷부터 다시 읽는다
+        added, removed = set(), set()
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            st = None
+        ino = (st.st_dev, st.st_ino) if st else None
+        if ino != self._journal_ino or (st and st.st_size < self._journal_offset):
+            buses = self._read_snapshot()
+            added, removed = buses - self._buses, self._buses - buses
+            self._buses = buses
+            self._journal_ino, self._journal_offset, self._journal_entries = ino, 0, 0
+        if st is None: return added, removed
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1   # 쓰다 만 마지막 줄은 무시
+        for line in data[:end].decode("utf-8").splitlines():
+            self._apply(line.strip(), self._buses, added, removed)
+            self._journal_entries += 1
+        self._journal_offset += end
+        return added, removed
+
+    def _append_locked(self, line):
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (line + "\n").encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._catch_up_locked()
+        if self._journal_entries >= COMPACT_AFTER: self._compact_locked()
+
+    def _write_atomic(self, path, text):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _compact_locked(self):
+        self._write_atomic(self.path, "".join(bus + "\n" for bus in sorted(self._buses)))
+        self._write_atomic(self.journal_path, "")
+        st = os.stat(self.journal_path)
+        self._journal_ino, self._journal_offset, self._journal_entries = (st.st_dev, st.st_ino), 0, 0
+
+    def add(self, bus):
+        with self._locked(exclusive=True):
+            self._catch_up_locked()
+            if bus in self._buses: return False
+            self._append_locked("+" + bus)
+            return True
+
+    def remove(self, bus):
+        with self._locked(exclusive=True):
+            self._catch_up_locked()
+            if bus not in self._buses: return False
+            self._append_locked("-" + bus)
+            return True
+
+    def clear(self):
+        with self._locked(exclusive=True):
+            self._catch_up_locked()
+            self._buses = set()
+            self._compact_locked()
+
+    def refresh(self):
+        with self._locked(exclusive=False):
+            return self._catch_up_locked()
+
+    def items(self):
+        with self._mutex:
+            return sorted(self._buses)
+
+    def __contains__(self, bus):
+        with self._mutex:
+            return bus in self._buses
+
+    def __len__(self):
+        with self._mutex:
+            return len(self._buses)
+
+    def watch(self, callback):
+        # 다른 프로세스의 변경을 감지하면 callback(추가된 번호들, 제거된 번호들) 호출
+        self._stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, args=(callback,), daemon=True)
+        self._watch_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watch_thread: self._watch_thread.join(2)
+
+    def _notify(self, callback):
+        added, removed = self.refresh()
+        if added or removed: callback(added, removed)
+
+    def _watch_loop(self, callback):
+        fd = _inotify_watch(self.directory)
+        if fd is None: print("inotify를 사용할 수 없어 주기적으로 확인합니다.", file=sys.stderr)
+        names = {os.path.basename(p).encode() for p in (self.path, self.journal_path)}
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    time.sleep(POLL_INTERVAL)
+                    self._notify(callback)
+                    continue
+                ready, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+                if not ready: continue
+                if any(name in names for name in _read_inotify_names(fd)):
+                    self._notify(callback)
+        finally:
+            if fd is not None: os.close(fd)
+
+
+def _inotify_watch(directory):
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0: return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+            os.close(fd); return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _read_inotify_names(fd):
+    data = os.read(fd, 4096)
+    offset = 0
+    while offset + _INOTIFY_EVENT.size <= len(data):
+        _, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+        offset += _INOTIFY_EVENT.size
+        yield data[offset:offset + length].rstrip(b"\0")
+        offset += length
+
+
+def _stress_writer(path, worker, ops, results):
+    store = BusStateStore(path)
+    misses = wins = 0
+    for i in range(ops):
+        bus = f"{worker}-{i}"
+        if not store.add(bus): misses += 1
+        if i % 3 == 0 and not store.remove(bus): misses += 1
+        # 모든 프로세스가 같은 번호를 추가한다: 번호마다 딱 한 프로세스만 성공해야 한다
+        if store.add(f"shared-{i}"): wins += 1
+    results.put((misses, wins))
+
+
+def _file_duplicates(path):
+    # 스냅샷에 두 번 적힌 번호와, 저널을 다시 적용할 때 이미 있는 번호를 또 추가하는 줄
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    duplicates = len(lines) - len(set(lines))
+    buses = set(lines)
+    try:
+        with open(path + ".journal", "r", encoding="utf-8") as f:
+            for line in f:
+                op, bus = line[:1], line[1:].strip()
+                if op == "+" and bus in buses: duplicates += 1
+                elif op == "-" and bus not in buses: duplicates += 1
+                if op == "+": buses.add(bus)
+                else: buses.discard(bus)
+    except FileNotFoundError:
+        pass
+    return duplicates
+
+
+def stress(workers=8, ops=200):
+    # 여러 프로세스가 동시에 추가/제거할 때 유실, 중복, 잘못 남은 항목이 없고 감시자가 최종 상태로 수렴하는지.
+    # 어긋난 항목 목록을 돌려준다 (비어 있으면 통과)
+    import tempfile
+    import multiprocessing
+    path = os.path.join(tempfile.mkdtemp(), "bus_number.txt")
+    observer = BusStateStore(path)
+    seen = []
+    observer.watch(lambda added, removed: seen.append((len(added), len(removed))))
+    results = multiprocessing.Queue()
+    start = time.perf_counter()
+    procs = [multiprocessing.Process(target=_stress_writer, args=(path, w, ops, results)) for w in range(workers)]
+    for p in procs: p.start()
+    outcomes = [results.get(timeout=120) for _ in procs]
+    for p in procs: p.join()
+    elapsed = time.perf_counter() - start
+    time.sleep(POLL_INTERVAL * 2)
+    observer.stop()
+
+    expected = {f"{w}-{i}" for w in range(workers) for i in range(ops) if i % 3} | {f"shared-{i}" for i in range(ops)}
+    final = set(BusStateStore(path).items())
+    failures = []
+    if expected - final: failures.append(f"유실 {len(expected - final)}건")
+    if final - expected: failures.append(f"잘못 남은 항목 {len(final - expected)}건")
+    duplicates = _file_duplicates(path)
+    if duplicates: failures.append(f"중복 기록 {duplicates}건")
+    misses = sum(m for m, _ in outcomes)
+    if misses: failures.append(f"자기 번호 추가/제거가 거부됨 {misses}건")
+    wins = sum(w for _, w in outcomes)
+    if wins != ops: failures.append(f"같은 번호 동시 추가 성공 {wins}회 (기대 {ops}회)")
+    if set(observer.items()) != final: failures.append(f"감시자 반영 {len(observer)}/{len(final)}")
+    print(f"쓰기 프로세스 {workers}개 x {ops}건: {elapsed:.2f}s, 최종 {len(final)}건, 중복 기록 {duplicates}건, "
+          f"동시 추가 성공 {wins}/{ops}, 감시자 반영 {len(observer)}/{len(final)}, 알림 {len(seen)}회")
+    return failures
+
+
+if __name__ == "__main__":
+    failures = stress()
+    for failure in failures: print(f"실패: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
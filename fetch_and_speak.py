@@ -1,9 +1,18 @@
 import requests
 import os
 import sys
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+
+from arrival_snapshot import StationSnapshotCache, index_arrival_list
+from route_catalog import open_catalog
+from bus_state import BusStateStore
+import tracing
 
 try:
-    from text_to_speech_rpi import speak
+    from text_to_speech_rpi import speak, render_announcement, get_player
 except ImportError:
     print("text_to_speech_rpi.py 파일을 찾을 수 없습니다.", file=sys.stderr)
     def speak(text, **kwargs): pass
@@ -11,73 +20,304 @@ except ImportError:
 
 BUS_NUMBER_FILE = "bus_number.txt"
 USB_SPEAKER_KEYWORD = "USB"
+# route_catalog.db가 없을 때 쓰는 기본 노선 (부스 설치 정류장 기준)
 BUS_ROUTE_IDS = {
     "5100":  "200000115", "7000":  "200000112",
     "1112":  "234000016", "M5107": "234001243"
 }
-STATION_ID  = "228000723"
+STATION_ID  = os.environ.get("BOOTH_STATION_ID", "228000723")
 STA_ORDER   = "56"
 SERVICE_KEY = "fyVjph7SaBxYmvv2CF0Z%2B30SYBnR4MjVuWiH8sVdEtdYnj%2FbSb8KMK9WmxMnCMuNtBWgq2O%2B%2FLn21gZ2pSVDpw%3D%3D"
 
-def get_single_bus_info(bus_number):
-    if bus_number not in BUS_ROUTE_IDS:
-        return f"{bus_number}번 버스는 지원되지 않는 노선입니다."
+REQUEST_TIMEOUT = 10
+BATCH_DEADLINE  = 8
+MAX_WORKERS     = 8
+RENDER_WORKERS  = 4       # 안내 문장 합성은 조회 풀과 따로 (합성이 조회 자리를 잡아 늦은 응답을 만들지 않게)
+ARRIVAL_CACHE_TTL       = 15
+ARRIVAL_CACHE_STALE_TTL = 60
+ARRIVAL_ITEM_URL = "http://apis.data.go.kr/6410000/busarrivalservice/v2/getBusArrivalItemv2"
+ARRIVAL_LIST_URL = "http://apis.data.go.kr/6410000/busarrivalservice/v2/getBusArrivalListv2"
+# 설정하면 공공 API 대신 arrival_gateway.py 로 조회 (여러 부스가 정류장별 호출 하나를 나눠 씀)
+GATEWAY_URL      = os.environ.get("BOOTH_GATEWAY_URL", "").rstrip("/")
+
+_session = None
+_executor = None
+_render_executor = None
+_snapshot_cache = None
+_catalog = None
+_catalog_loaded = False
+_pool_lock = threading.Lock()
+
+def get_catalog():
+    global _catalog, _catalog_loaded
+    with _pool_lock:
+        if not _catalog_loaded:
+            _catalog = open_catalog()
+            _catalog_loaded = True
+        return _catalog
+
+def resolve_route(bus_number):
+    # (routeId, staOrder) 또는 이 정류장을 지나지 않는 노선이면 None
+    catalog = get_catalog()
+    if catalog is not None:
+        return catalog.lookup(bus_number, STATION_ID)
+    if bus_number in BUS_ROUTE_IDS:
+        return BUS_ROUTE_IDS[bus_number], STA_ORDER
+    return None
+
+def valid_route_numbers():
+    catalog = get_catalog()
+    if catalog is not None:
+        return set(catalog.station_routes(STATION_ID))
+    return set(BUS_ROUTE_IDS)
 
-    route_id = BUS_ROUTE_IDS[bus_number]
+def count_matching_routes(prefix):
+    catalog = get_catalog()
+    if catalog is not None:
+        return catalog.count_prefix(prefix, STATION_ID)
+    return sum(1 for bus in BUS_ROUTE_IDS if bus.startswith(prefix.upper()))
+
+def get_session():
+    global _session
+    with _pool_lock:
+        if _session is None:
+            # 같은 호스트에 keep-alive 연결을 재사용 (동시 조회 수만큼 풀 유지)
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def get_executor():
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="arrival")
+        return _executor
+
+def get_render_executor():
+    global _render_executor
+    with _pool_lock:
+        if _render_executor is None:
+            _render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+        return _render_executor
+
+def _gateway_get(path, timeout):
+    with tracing.span("fetch.http_gateway"):
+        response = get_session().get(f"{GATEWAY_URL}{path}", timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    if data.get("stale"):
+        print(f"[Gateway] {data.get('age', 0):.0f}초 전 도착 정보 사용 ({data.get('source')})", file=sys.stderr)
+    return data
+
+def fetch_arrival_item(route_id, sta_order, timeout=REQUEST_TIMEOUT):
+    if GATEWAY_URL:
+        return _gateway_get(f"/arrival?stationId={STATION_ID}&routeId={route_id}&staOrder={sta_order}",
+                            timeout)["busArrivalItem"]
     url = (
-        "http://apis.data.go.kr/6410000/busarrivalservice/v2/getBusArrivalItemv2"
-        f"?serviceKey={SERVICE_KEY}&stationId={STATION_ID}"
-        f"&routeId={route_id}&staOrder={STA_ORDER}&format=json"
+        f"{ARRIVAL_ITEM_URL}?serviceKey={SERVICE_KEY}&stationId={STATION_ID}"
+        f"&routeId={route_id}&staOrder={sta_order}&format=json"
     )
-    
+    with tracing.span("fetch.http_item"):
+        data = get_session().get(url, timeout=timeout).json()
+    return data["response"]["msgBody"]["busArrivalItem"]
+
+def fetch_station_arrivals(station_id, timeout=None):
+    # 스냅샷 캐시 loader: (받은 시각, 노선별 항목)
+    if GATEWAY_URL:
+        # 게이트웨이가 캐시해 둔 값이면 그 나이만큼 받은 시각을 당겨, 부스 캐시가 새로 받은 값으로 다시 세지 않게 한다
+        # (fetchedAt 대신 age를 쓰는 것은 두 기기의 시계가 어긋나도 맞게 하려는 것)
+        data = _gateway_get(f"/arrivals?stationId={station_id}", timeout or REQUEST_TIMEOUT)
+        return time.time() - float(data.get("age") or 0), index_arrival_list(data["busArrivalList"])
+    url = f"{ARRIVAL_LIST_URL}?serviceKey={SERVICE_KEY}&stationId={station_id}&format=json"
+    with tracing.span("fetch.http_list"):
+        data = get_session().get(url, timeout=timeout or REQUEST_TIMEOUT).json()
+    msg_body = data["response"].get("msgBody") or {}
+    return time.time(), index_arrival_list(msg_body.get("busArrivalList"))
+
+def get_snapshot_cache():
+    global _snapshot_cache
+    with _pool_lock:
+        if _snapshot_cache is None:
+            _snapshot_cache = StationSnapshotCache(fetch_station_arrivals, ttl=ARRIVAL_CACHE_TTL,
+                                                   stale_ttl=ARRIVAL_CACHE_STALE_TTL)
+        return _snapshot_cache
+
+def get_station_snapshot(timeout=None):
+    # 정류장 전체 도착 정보. 실패하면 None을 돌려주어 노선별 조회로 대체
     try:
-        data = requests.get(url, timeout=10).json()
-        item = data["response"]["msgBody"]["busArrivalItem"]
-        predict_time = item.get("predictTime1")
-        location_no  = item.get("locationNo1")
-        
-        if predict_time and location_no:
-            return f"{bus_number}번 버스는 {predict_time}분 후 도착 예정이며, 남은 정류장은 {location_no}개 입니다."
-        else:
-            return f"{bus_number}번 버스의 실시간 도착 정보가 없습니다."
+        _, routes = get_snapshot_cache().get(STATION_ID, timeout=timeout)
+        return routes
+    except Exception as e:
+        print(f"정류장 도착 정보 조회 실패, 노선별 조회로 전환: {e}", file=sys.stderr)
+        return None
+
+def format_arrival(bus_number, item):
+    predict_time = item.get("predictTime1")
+    location_no  = item.get("locationNo1")
+    if predict_time and location_no:
+        return f"{bus_number}번 버스는 {predict_time}분 후 도착 예정이며, 남은 정류장은 {location_no}개 입니다."
+    return f"{bus_number}번 버스의 실시간 도착 정보가 없습니다."
+
+def get_route_bus_info(bus_number, timeout=REQUEST_TIMEOUT):
+    route = resolve_route(bus_number)
+    if route is None:
+        return f"{bus_number}번 버스는 지원되지 않는 노선입니다."
+
+    try:
+        item = fetch_arrival_item(*route, timeout=timeout)
+        return format_arrival(bus_number, item)
     except Exception as e:
         print(f"{bus_number}번 버스 정보 조회 실패: {e}", file=sys.stderr)
         return f"{bus_number}번 버스 정보를 가져오는 데 실패했습니다."
 
-def main():
+def snapshot_item(snapshot, route_id, sta_order):
+    return snapshot.get(f"{route_id}@{sta_order}") or snapshot.get(route_id) or {}
+
+def poll_arrivals(buses, timeout=REQUEST_TIMEOUT):
+    # 백그라운드 감시용: 정류장 스냅샷(ttl 안이면 재사용)에서 노선별 도착 항목. 실패하면 예외를 그대로 올린다
+    _, snapshot = get_snapshot_cache().refresh(STATION_ID, timeout=timeout)
+    items = {}
+    for bus in buses:
+        route = resolve_route(bus)
+        if route is not None: items[bus] = snapshot_item(snapshot, *route)
+    return items
+
+@tracing.traced("fetch.bus_info")
+def get_single_bus_info(bus_number, timeout=REQUEST_TIMEOUT, snapshot=None):
+    route = resolve_route(bus_number)
+    if route is None:
+        return f"{bus_number}번 버스는 지원되지 않는 노선입니다."
+
+    if snapshot is None:
+        snapshot = get_station_snapshot(timeout=timeout)
+    if snapshot is None:
+        return get_route_bus_info(bus_number, timeout=timeout)
+    return format_arrival(bus_number, snapshot_item(snapshot, *route))
+
+@tracing.traced("fetch.all_bus_info")
+def get_all_bus_info(buses, deadline=BATCH_DEADLINE):
+    # 모든 노선을 동시에 조회하고, 전체 마감 시간 안에 끝난 결과만 순서대로 돌려준다
+    if not buses: return [], []
+    timeout = min(REQUEST_TIMEOUT, deadline)
+    snapshot = get_station_snapshot(timeout=timeout)
+    if snapshot is not None:
+        return [get_single_bus_info(bus, snapshot=snapshot) for bus in buses], []
+
+    executor = get_executor()
+    futures = [executor.submit(get_route_bus_info, bus, timeout) for bus in buses]
+    wait(futures, timeout=deadline)
+
+    infos, late = [], []
+    for bus, future in zip(buses, futures):
+        if future.done():
+            infos.append(future.result())
+        else:
+            future.cancel()
+            late.append(bus)
+    return infos, late
+
+def late_sentence(late):
+    late_names = ", ".join(f"{bus}번" for bus in late)
+    return f"{late_names} 버스는 응답이 늦어 도착 정보를 안내하지 못했습니다."
+
+def compose_speech(infos, late):
+    sentences = []
+    if infos: sentences.append(" 그리고, ".join(infos))
+    if late: sentences.append(late_sentence(late))
+    return " ".join(sentences)
+
+def _render_sentence(sentence):
+    try:
+        return render_announcement(sentence)
+    except Exception as e:
+        print(f"예외 발생: {e}", file=sys.stderr)
+        return None
+
+def _render_when_looked_up(lookup, joined, rendered):
+    # 조회가 끝나면 그 노선 문장을 합성 풀에서 합성해 rendered에 담는다 (두 번째 문장부터는 "그리고, "를 붙여서)
+    if lookup.cancelled():
+        rendered.cancel()
+        return
+    try:
+        info = lookup.result()
+    except Exception as e:
+        rendered.set_exception(e)
+        return
+    sentence = f"그리고, {info}" if joined else info
+    get_render_executor().submit(lambda: rendered.set_result((info, sentence, _render_sentence(sentence))))
+
+def announce_streaming(buses, deadline=BATCH_DEADLINE, block=True):
+    # 노선별 조회+합성을 동시에 시작하고, 순서대로 준비되는 문장부터 재생 큐에 넣는다.
+    # 첫 문장이 재생되는 동안 나머지 문장은 계속 조회/합성된다. (안내 문장들, 늦은 노선, 재생 핸들들)
+    # 마감 시간은 조회에만 적용한다. 조회가 끝난 노선은 합성이 느려도 늦은 응답으로 돌리지 않는다
+    started = time.monotonic()
+    timeout = min(REQUEST_TIMEOUT, deadline)
+    executor = get_executor()
+    lookups = [executor.submit(get_single_bus_info, bus, timeout) for bus in buses]
+    renders = [Future() for _ in buses]
+    for i, (lookup, rendered) in enumerate(zip(lookups, renders)):
+        lookup.add_done_callback(lambda f, joined=i > 0, rendered=rendered: _render_when_looked_up(f, joined, rendered))
+    player = get_player(USB_SPEAKER_KEYWORD)
+    infos, late, handles = [], [], []
+    for bus, lookup, rendered in zip(buses, lookups, renders):
+        try:
+            lookup.result(timeout=max(0, deadline - (time.monotonic() - started)))
+        except FutureTimeoutError:
+            lookup.cancel()
+            late.append(bus)
+            continue
+        info, sentence, clip_path = rendered.result()
+        if not infos and sentence != info:
+            # 앞 노선이 모두 늦어 이 문장이 첫 문장이 되었으면 "그리고" 없이 다시 합성
+            sentence, clip_path = info, _render_sentence(info)
+        infos.append(info)
+        print(sentence)
+        if clip_path:
+            handles.append(player.play(clip_path))
+    if late:
+        print(f"마감 시간 초과: {late}", file=sys.stderr)
+        clip_path = _render_sentence(late_sentence(late))
+        if clip_path: handles.append(player.play(clip_path))
+
+    if handles and tracing.enabled():
+        handles[0].on_start(lambda h: tracing.record("fetch.first_audio", h.started_at - started))
+    if block:
+        for handle in handles: handle.wait()
+        if handles: tracing.record("fetch.announce_session", time.monotonic() - started)
+        for handle in handles:
+            if handle.error:
+                print(f"[TTS Helper] 재생 실패: {handle.error}", file=sys.stderr)
+                break
+    return infos, late, handles
+
+def announce_arrivals(bus_number=None, number_file=BUS_NUMBER_FILE):
     buses_to_check = []
     
-    if len(sys.argv) > 1:
-        buses_to_check.append(sys.argv[1])
+    if bus_number:
+        buses_to_check.append(bus_number)
         print(f"단일 버스 조회 모드: {buses_to_check}")
     else:
         print("전체 버스 조회 모드")
         try:
-            if not os.path.exists(BUS_NUMBER_FILE):
-                speak("저장된 버스 정보가 없습니다.", speaker_keyword=USB_SPEAKER_KEYWORD)
-                return
-            
-            with open(BUS_NUMBER_FILE, 'r', encoding='utf-8') as f:
-                buses_to_check = [line.strip() for line in f if line.strip()]
-            
+            buses_to_check = BusStateStore(number_file).items()
+
             if not buses_to_check:
                 speak("저장된 버스 정보가 없습니다.", speaker_keyword=USB_SPEAKER_KEYWORD)
-                return
+                return None
 
         except Exception as e:
             speak("버스 번호 파일을 읽는 데 실패했습니다.", speaker_keyword=USB_SPEAKER_KEYWORD)
-            return
+            return None
 
-    all_info = []
-    for bus in buses_to_check:
-        info = get_single_bus_info(bus)
-        all_info.append(info)
+    all_info, late, _ = announce_streaming(buses_to_check)
+    if all_info or late:
+        return compose_speech(all_info, late)
+    return None
 
-    if all_info:
-        final_speech = " 그리고, ".join(all_info)
-        print(f"{final_speech}")
-        speak(final_speech, speaker_keyword=USB_SPEAKER_KEYWORD)
+def main():
+    announce_arrivals(sys.argv[1] if len(sys.argv) > 1 else None)
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,123 @@
+import queue
+import threading
+
+LOW, HIGH = 0, 1
+RISING, FALLING, BOTH = "rising", "falling", "both"
+
+
+class RPiGPIOBackend:
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self._GPIO = GPIO
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+        self._edges = {RISING: GPIO.RISING, FALLING: GPIO.FALLING, BOTH: GPIO.BOTH}
+
+    def setup_output(self, pin, initial=LOW):
+        self._GPIO.setup(pin, self._GPIO.OUT, initial=self._GPIO.HIGH if initial else self._GPIO.LOW)
+
+    def setup_input(self, pin, pull_down=True):
+        pud = self._GPIO.PUD_DOWN if pull_down else self._GPIO.PUD_UP
+        self._GPIO.setup(pin, self._GPIO.IN, pull_up_down=pud)
+
+    def output(self, pin, value):
+        self._GPIO.output(pin, self._GPIO.HIGH if value else self._GPIO.LOW)
+
+    def input(self, pin):
+        return HIGH if self._GPIO.input(pin) else LOW
+
+    def add_edge_callback(self, pin, edge, callback, bouncetime=None):
+        kwargs = {"callback": lambda channel: callback(channel)}
+        if bouncetime: kwargs["bouncetime"] = int(bouncetime * 1000)
+        self._GPIO.add_event_detect(pin, self._edges[edge], **kwargs)
+
+    def remove_edge_callback(self, pin):
+        self._GPIO.remove_event_detect(pin)
+
+    def cleanup(self):
+        self._GPIO.cleanup()
+
+
+class SimulatedGPIO:
+    # 라즈베리파이 없이 키패드 매트릭스를 흉내낸다.
+    # 행 출력과 눌린 키로 열 입력 값을 계산하고, 값이 바뀌면 콜백 스레드에서 엣지 콜백 호출
+    def __init__(self, rows=(), cols=(), layout=()):
+        self.rows = list(rows)
+        self.cols = list(cols)
+        self.layout = [list(r) for r in layout]
+        self.outputs = {}
+        self.pressed = set()
+        self.input_reads = 0
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._levels = {}
+        self._dispatch = queue.Queue()
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+
+    def _key_position(self, key):
+        for r, row in enumerate(self.layout):
+            if key in row: return self.rows[r], self.cols[row.index(key)]
+        raise KeyError(key)
+
+    def _level_locked(self, pin):
+        if pin in self.outputs: return self.outputs[pin]
+        for key in self.pressed:
+            row_pin, col_pin = self._key_position(key)
+            if col_pin == pin and self.outputs.get(row_pin, LOW): return HIGH
+        return LOW
+
+    def _update_edges_locked(self):
+        for pin, (edge, callback) in self._callbacks.items():
+            level = self._level_locked(pin)
+            previous = self._levels.get(pin, LOW)
+            self._levels[pin] = level
+            if level == previous: continue
+            if edge == BOTH or (edge == RISING and level) or (edge == FALLING and not level):
+                self._dispatch.put((callback, pin))
+
+    def _dispatch_loop(self):
+        while True:
+            callback, pin = self._dispatch.get()
+            callback(pin)
+
+    def setup_output(self, pin, initial=LOW):
+        with self._lock:
+            self.outputs[pin] = initial
+            self._update_edges_locked()
+
+    def setup_input(self, pin, pull_down=True):
+        pass
+
+    def output(self, pin, value):
+        with self._lock:
+            self.outputs[pin] = HIGH if value else LOW
+            self._update_edges_locked()
+
+    def input(self, pin):
+        with self._lock:
+            self.input_reads += 1
+            return self._level_locked(pin)
+
+    def add_edge_callback(self, pin, edge, callback, bouncetime=None):
+        with self._lock:
+            self._callbacks[pin] = (edge, callback)
+            self._levels[pin] = self._level_locked(pin)
+
+    def remove_edge_callback(self, pin):
+        with self._lock:
+            self._callbacks.pop(pin, None)
+
+    def press(self, key):
+        with self._lock:
+            self.pressed.add(key)
+            self._update_edges_locked()
+
+    def release(self, key):
+        with self._lock:
+            self.pressed.discard(key)
+            self._update_edges_locked()
+
+    def cleanup(self):
+        with self._lock:
+            self._callbacks.clear()
+            self.outputs.clear()
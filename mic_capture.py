@@ -0,0 +1,204 @@
+import sys
+import time
+import threading
+
+SAMPLE_WIDTH     = 2      # paInt16
+CAPACITY_SECONDS = 20
+PRE_ROLL_SECONDS = 0.3
+
+
+class PyAudioInput:
+    # USB 마이크를 콜백 모드로 한 번만 열어 두고 들어오는 청크를 그대로 넘긴다
+    def __init__(self, rate, channels, chunk, find_device):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.find_device = find_device
+        self._pa = None
+        self._stream = None
+
+    def start(self, on_data):
+        import pyaudio
+        self._pa = pyaudio.PyAudio()
+        device_index = self.find_device(self._pa)
+        if device_index is None:
+            self._pa.terminate(); self._pa = None
+            raise OSError("사용할 수 있는 마이크가 없습니다.")
+
+        def callback(in_data, frame_count, time_info, status):
+            on_data(in_data)
+            return (None, pyaudio.paContinue)
+
+        self._stream = self._pa.open(format=pyaudio.paInt16, channels=self.channels, rate=self.rate, input=True,
+                                     frames_per_buffer=self.chunk, input_device_index=device_index,
+                                     stream_callback=callback)
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream:
+            self._stream.stop_stream(); self._stream.close(); self._stream = None
+        if self._pa:
+            self._pa.terminate(); self._pa = None
+
+
+class FakeInputDevice:
+    # 테스트용 입력 장치. source(bytes)를 청크 단위로 반복 재생하며, 버퍼는 하나만 만들어 재사용한다
+    def __init__(self, source, rate, channels=1, chunk=1024, realtime=True):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.realtime = realtime
+        self.chunk_bytes = chunk * channels * SAMPLE_WIDTH
+        usable = len(source) - len(source) % self.chunk_bytes
+        if not usable: raise ValueError("source가 청크 하나보다 짧습니다.")
+        self._source = memoryview(bytes(source[:usable]))
+        self._buffer = bytearray(self.chunk_bytes)
+        self.chunks_delivered = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, on_data):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_data,), daemon=True)
+        self._thread.start()
+
+    def _run(self, on_data):
+        offset, interval = 0, self.chunk / self.rate
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            self._buffer[:] = self._source[offset:offset + self.chunk_bytes]
+            on_data(self._buffer)
+            self.chunks_delivered += 1
+            offset = (offset + self.chunk_bytes) % len(self._source)
+            if self.realtime:
+                next_time += interval
+                delay = next_time - time.monotonic()
+                if delay > 0: time.sleep(delay)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(1)
+
+
+class CaptureEngine:
+    # 미리 할당한 링 버퍼에 마이크 입력을 계속 채운다. 위치는 시작 이후 누적 바이트 수로 표현
+    def __init__(self, device, capacity_seconds=CAPACITY_SECONDS):
+        self.device = device
+        self.rate = device.rate
+        self.chunk_bytes = device.chunk * device.channels * SAMPLE_WIDTH
+        self.bytes_per_second = device.rate * device.channels * SAMPLE_WIDTH
+        n_chunks = -(-int(capacity_seconds * self.bytes_per_second) // self.chunk_bytes)
+        self.capacity = n_chunks * self.chunk_bytes
+        self._ring = bytearray(self.capacity)
+        self._ring_view = memoryview(self._ring)
+        self._write_pos = 0
+        self._cond = threading.Condition()
+        self.overruns = 0
+        self.running = False
+
+    def start(self):
+        if self.running: return
+        self.device.start(self._on_data)
+        self.running = True
+
+    def stop(self):
+        if not self.running: return
+        self.device.stop()
+        self.running = False
+        with self._cond: self._cond.notify_all()
+
+    def _on_data(self, data):
+        n = len(data)
+        offset = self._write_pos % self.capacity
+        first = min(n, self.capacity - offset)
+        self._ring_view[offset:offset + first] = data[:first] if first < n else data
+        if first < n: self._ring_view[:n - first] = data[first:]
+        with self._cond:
+            self._write_pos += n
+            self._cond.notify_all()
+
+    @property
+    def position(self):
+        return self._write_pos
+
+    def _seconds_to_bytes(self, seconds):
+        n = int(seconds * self.bytes_per_second)
+        return n - n % self.chunk_bytes
+
+    def start_position(self, pre_roll=PRE_ROLL_SECONDS):
+        # 요청 시점보다 pre_roll 만큼 앞선 위치 (링에 남아 있는 범위 안에서, 청크 경계에 맞춤)
+        now = self._write_pos
+        now -= now % self.chunk_bytes
+        oldest = max(0, self._write_pos - self.capacity + self.chunk_bytes)
+        start = max(now - self._seconds_to_bytes(pre_roll), oldest)
+        return start + (-start % self.chunk_bytes)
+
+    def _wait_for(self, position, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._write_pos >= position or not self.running, timeout)
+
+    def copy_segment(self, start, end, out=None):
+        if self._write_pos - start > self.capacity:
+            raise BufferError("요청 구간이 이미 덮어써졌습니다.")
+        size = end - start
+        if out is None: out = bytearray(size)
+        offset = start % self.capacity
+        first = min(size, self.capacity - offset)
+        out[:first] = self._ring_view[offset:offset + first]
+        if first < size: out[first:size] = self._ring_view[:size - first]
+        return out
+
+    def record(self, duration_seconds, pre_roll=PRE_ROLL_SECONDS, out=None):
+        start = self.start_position(pre_roll)
+        end = start + self._seconds_to_bytes(duration_seconds + pre_roll)
+        if not self._wait_for(end, duration_seconds + pre_roll + 2) or self._write_pos < end:
+            raise TimeoutError("마이크 입력이 들어오지 않습니다.")
+        return self.copy_segment(start, end, out)
+
+    def iter_chunks(self, stop_event, max_seconds, pre_roll=PRE_ROLL_SECONDS):
+        # 링 버퍼 위의 memoryview를 그대로 넘긴다 (소비자가 capacity 안에 처리해야 함)
+        position = self.start_position(pre_roll)
+        end = position + self._seconds_to_bytes(max_seconds + pre_roll)
+        while position < end and not stop_event.is_set():
+            if not self._wait_for(position + self.chunk_bytes, 1.0) or not self.running:
+                print("마이크 입력이 끊겼습니다.", file=sys.stderr)
+                return
+            if self._write_pos - position > self.capacity - self.chunk_bytes:
+                self.overruns += 1
+                position = self.start_position(0)
+                continue
+            offset = position % self.capacity
+            yield self._ring_view[offset:offset + self.chunk_bytes]
+            position += self.chunk_bytes
+
+
+def self_check(seconds=2.0):
+    import tracemalloc
+    rate, chunk = 48000, 1024
+    source = bytes(range(256)) * (rate * SAMPLE_WIDTH // 256)
+    device = FakeInputDevice(source, rate, chunk=chunk, realtime=False)
+    engine = CaptureEngine(device, capacity_seconds=1)
+    engine.start()
+    engine._wait_for(engine.capacity * 2, 2)  # 링을 한 바퀴 이상 채운 뒤 측정
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start_chunks = device.chunks_delivered
+    time.sleep(seconds)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in after.compare_to(before, "filename")
+                 if stat.traceback[0].filename.endswith("mic_capture.py"))
+    engine.stop()
+
+    delivered = device.chunks_delivered - start_chunks
+    segment = engine.copy_segment(engine.position - engine.chunk_bytes * 4, engine.position)
+    period = len(source) // device.chunk_bytes * device.chunk_bytes
+    expected_offset = (engine.position - len(segment)) % period
+    expected = (source[:period] * 2)[expected_offset:expected_offset + len(segment)]
+    print(f"정상 상태 청크 {delivered}개 처리 중 mic_capture 메모리 증가: {growth} B")
+    print(f"링 버퍼 구간 내용 일치: {bytes(segment) == expected}")
+
+
+if __name__ == "__main__":
+    self_check()
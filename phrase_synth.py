@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import time
+import wave
+import array
+import tempfile
+import threading
+import subprocess
+
+from tts_cache import TTSClipCache, clip_key
+
+BASE_DIR         = os.path.dirname(os.path.abspath(__file__))
+FRAGMENT_DIR     = os.path.join(BASE_DIR, "phrase_cache", "fragments")
+OUTPUT_DIR       = os.path.join(BASE_DIR, "phrase_cache", "announcements")
+FRAGMENT_MAX_BYTES = 64 * 1024 * 1024
+OUTPUT_MAX_BYTES   = 8 * 1024 * 1024
+SAMPLE_RATE      = 24000     # gTTS 출력과 같은 24kHz 모노
+CROSSFADE_MS     = 15
+TRIM_THRESHOLD   = 400       # 앞뒤 무음 판단 (16비트 진폭)
+TRIM_PAD_MS      = 20
+PAUSE_MS         = {",": 120, ".": 280}
+MAX_MINUTES      = 90
+MAX_STOPS        = 40
+MAX_ALERT_MINUTES = 10
+FRAGMENT_LANG    = "ko-fragment"
+JOINER           = " 그리고, "
+JOINER_FRAGMENT  = "그리고,"
+
+BUS = r"(?P<bus>[A-Z]?\d{1,5}(?:-\d{1,2})?)"
+# fetch_and_speak / KEYPAD 안내 문장 템플릿 -> 조각 목록
+TEMPLATES = [
+    (re.compile(BUS + r"번 버스는 (?P<n>\d+)분 후 도착 예정이며, 남은 정류장은 (?P<m>\d+)개 입니다\."),
+     lambda g: [f"{g['bus']}번 버스는", f"{int(g['n'])}분 후 도착 예정이며,", f"남은 정류장은 {int(g['m'])}개 입니다."]),
+    (re.compile(BUS + r"번 버스의 실시간 도착 정보가 없습니다\."),
+     lambda g: [f"{g['bus']}번 버스의", "실시간 도착 정보가 없습니다."]),
+    (re.compile(BUS + r"번 버스 도착이 확인되었습니다\."),
+     lambda g: [f"{g['bus']}번 버스", "도착이 확인되었습니다."]),
+    # arrival_watch 알림
+    (re.compile(BUS + r"번 버스가 약 (?P<n>\d+)분 후 도착합니다\."),
+     lambda g: [f"{g['bus']}번 버스가", f"약 {int(g['n'])}분 후 도착합니다."]),
+    (re.compile(BUS + r"번 버스가 곧 도착합니다\."),
+     lambda g: [f"{g['bus']}번 버스가", "곧 도착합니다."]),
+]
+
+
+def plan(text):
+    # 템플릿 문장들을 조각 목록으로 나눈다. 한 문장이라도 템플릿에 맞지 않으면 None
+    # 문장 단위로 나눠 안내할 때는 두 번째 문장부터 "그리고, "로 시작한다
+    fragments = []
+    text = text.strip()
+    if text.startswith(JOINER.lstrip()):
+        fragments.append(JOINER_FRAGMENT)
+        text = text[len(JOINER.lstrip()):]
+    for i, sentence in enumerate(text.split(JOINER)):
+        if i: fragments.append(JOINER_FRAGMENT)
+        for pattern, build in TEMPLATES:
+            match = pattern.fullmatch(sentence.strip())
+            if match:
+                fragments.extend(build(match.groupdict()))
+                break
+        else:
+            return None
+    return fragments
+
+
+def all_fragments(routes):
+    fragments = [JOINER_FRAGMENT, "실시간 도착 정보가 없습니다.", "도착이 확인되었습니다.", "곧 도착합니다."]
+    for bus in sorted(routes):
+        fragments += [f"{bus}번 버스는", f"{bus}번 버스의", f"{bus}번 버스", f"{bus}번 버스가"]
+    fragments += [f"약 {n}분 후 도착합니다." for n in range(1, MAX_ALERT_MINUTES + 1)]
+    fragments += [f"{n}분 후 도착 예정이며," for n in range(1, MAX_MINUTES + 1)]
+    fragments += [f"남은 정류장은 {m}개 입니다." for m in range(1, MAX_STOPS + 1)]
+    return fragments
+
+
+def read_pcm(path):
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2 or f.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: {SAMPLE_RATE}Hz 16비트 WAV가 아닙니다.")
+        samples = array.array("h", f.readframes(f.getnframes()))
+        if f.getnchannels() == 2:
+            samples = array.array("h", ((samples[i] + samples[i + 1]) // 2 for i in range(0, len(samples), 2)))
+    return samples
+
+
+def write_wav(fp, samples):
+    with wave.open(fp, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+
+
+def trim(samples, threshold=TRIM_THRESHOLD, pad_ms=TRIM_PAD_MS):
+    loud = [i for i in range(len(samples)) if abs(samples[i]) >= threshold]
+    if not loud: return array.array("h")
+    pad = SAMPLE_RATE * pad_ms // 1000
+    return samples[max(0, loud[0] - pad):loud[-1] + pad + 1]
+
+
+def splice(segments, crossfade_ms=CROSSFADE_MS):
+    # segments: [(samples, 뒤에 둘 쉼 ms)]. 쉼 없이 이어지는 조각은 짧게 겹쳐(crossfade) 끊김을 없앤다
+    out = array.array("h")
+    overlap_next = False
+    for samples, pause_ms in segments:
+        n = min(SAMPLE_RATE * crossfade_ms // 1000, len(out), len(samples)) if overlap_next else 0
+        for i in range(n):
+            w = (i + 1) / (n + 1)
+            out[len(out) - n + i] = int(out[len(out) - n + i] * (1 - w) + samples[i] * w)
+        out.extend(samples[n:])
+        if pause_ms: out.extend(array.array("h", bytes(2 * (SAMPLE_RATE * pause_ms // 1000))))
+        overlap_next = not pause_ms
+    return out
+
+
+def decode_mp3(src, dst):
+    subprocess.run(["mpg123", "-q", "-m", "-r", str(SAMPLE_RATE), "-w", dst, src],
+                   check=True, timeout=30, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class PhraseEngine:
+    # 조각(노선 번호, 숫자, 고정 구절)을 한 번만 합성해 PCM으로 저장해 두고, 안내 문장은 이어 붙여 만든다
+    def __init__(self, fragment_dir=FRAGMENT_DIR, output_dir=OUTPUT_DIR):
+        self.fragments = TTSClipCache(fragment_dir, FRAGMENT_MAX_BYTES, clip_ext=".wav")
+        self.outputs = TTSClipCache(output_dir, OUTPUT_MAX_BYTES, clip_ext=".wav")
+        self.composed = 0
+        self.missing = 0
+        self._pcm = {}
+        self._lock = threading.Lock()
+
+    def _key(self, text):
+        return clip_key(text, FRAGMENT_LANG)
+
+    def _load(self, text):
+        with self._lock:
+            samples = self._pcm.get(text)
+        if samples is not None: return samples
+        path = self.fragments.lookup(self._key(text))
+        if path is None: return None
+        samples = read_pcm(path)
+        with self._lock: self._pcm[text] = samples
+        return samples
+
+    def add_fragment(self, text, wav_path):
+        samples = trim(read_pcm(wav_path))
+        self.fragments.store(self._key(text), lambda f: write_wav(f, samples))
+        with self._lock: self._pcm[text] = samples
+
+    def build(self, texts, render, decode=decode_mp3):
+        # render(text) -> 클립 경로 (mp3는 decode로 WAV 변환). 이미 있는 조각은 건너뛴다
+        built = 0
+        for text in texts:
+            if self.fragments.lookup(self._key(text)): continue
+            try:
+                src = render(text)
+                if src.lower().endswith(".wav"):
+                    self.add_fragment(text, src)
+                else:
+                    fd, tmp_path = tempfile.mkstemp(suffix=".wav")
+                    os.close(fd)
+                    try:
+                        decode(src, tmp_path)
+                        self.add_fragment(text, tmp_path)
+                    finally:
+                        os.remove(tmp_path)
+                built += 1
+            except Exception as e:
+                print(f"[Phrase] 조각 생성 실패 '{text}': {e}", file=sys.stderr)
+        return built
+
+    def render(self, text):
+        # 템플릿 문장이고 조각이 모두 있으면 WAV 경로, 아니면 None (호출 측에서 온라인 합성)
+        fragments = plan(text)
+        if fragments is None: return None
+        key = self._key(text)
+        path = self.outputs.lookup(key)
+        if path: return path
+        segments = []
+        for fragment in fragments:
+            samples = self._load(fragment)
+            if samples is None:
+                self.missing += 1
+                print(f"[Phrase] 조각 없음, 온라인 합성으로 대체: '{fragment}'", file=sys.stderr)
+                return None
+            segments.append((samples, PAUSE_MS.get(fragment[-1], 0)))
+        samples = splice(segments)
+        self.composed += 1
+        return self.outputs.store(key, lambda f: write_wav(f, samples))
+
+
+def _tone_renderer(workdir):
+    # 벤치마크용: 글자 수에 비례한 길이의 톤 WAV (앞뒤 무음 포함)
+    import math
+    def render(text):
+        path = os.path.join(workdir, f"{abs(hash(text))}.wav")
+        n = int(SAMPLE_RATE * (0.08 * len(text) + 0.2))
+        pad = SAMPLE_RATE // 10
+        samples = array.array("h", bytes(2 * pad))
+        samples.extend(int(6000 * math.sin(2 * math.pi * 200 * i / SAMPLE_RATE)) for i in range(n))
+        samples.extend(array.array("h", bytes(2 * pad)))
+        with open(path, "wb") as f: write_wav(f, samples)
+        return path
+    return render
+
+
+def bench(routes=("5100", "7000", "1112", "M5107", "3000", "8100", "1550", "G6000", "9", "720-2")):
+    from audio_player import AudioPlayer, NullSink
+    workdir = tempfile.mkdtemp(prefix="phrase_bench_")
+    engine = PhraseEngine(os.path.join(workdir, "fragments"), os.path.join(workdir, "out"))
+    start = time.perf_counter()
+    built = engine.build(all_fragments(routes), _tone_renderer(workdir))
+    print(f"조각 {built}개 생성 ({time.perf_counter() - start:.1f}s, 최초 1회)")
+    engine._pcm.clear()   # 재시작 직후처럼 디스크에서 읽는 경우까지 포함
+
+    player = AudioPlayer(NullSink(0.0))
+    for count in (1, 4, 10):
+        text = JOINER.join(f"{bus}번 버스는 {3 + i}분 후 도착 예정이며, 남은 정류장은 {1 + i}개 입니다."
+                           for i, bus in enumerate(routes[:count]))
+        start = time.perf_counter()
+        path = engine.render(text)
+        handle = player.play(path)
+        handle.wait()
+        started = handle.started_at - handle.enqueued_at + (handle.enqueued_at - start)
+        with wave.open(path, "rb") as f: seconds = f.getnframes() / SAMPLE_RATE
+        print(f"버스 {count}대 안내 ({seconds:.1f}s 분량): 재생 시작까지 {started * 1000:.1f} ms (네트워크 호출 없음)")
+    player.close()
+    print(f"템플릿 밖 문장: {plan('키패드 사용이 가능합니다.')} -> 온라인 합성")
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        # 실제 gTTS로 부스 정류장 노선의 조각을 미리 만든다 (네트워크 필요, 최초 1회)
+        from text_to_speech_rpi import render_clip
+        from fetch_and_speak import valid_route_numbers
+        engine = PhraseEngine()
+        print(f"조각 {engine.build(all_fragments(valid_route_numbers()), render_clip)}개 생성")
+    else:
+        bench()
+
+
+if __name__ == "__main__":
+    main()
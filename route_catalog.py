@@ -0,0 +1,155 @@
+import os
+import sys
+import csv
+import time
+import sqlite3
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "route_catalog.db")
+
+# GBIS 기반정보 파일의 컬럼 이름 (대소문자/표기 차이 허용)
+ROUTE_ID_COLUMNS   = ("ROUTE_ID", "ROUTEID")
+ROUTE_NM_COLUMNS   = ("ROUTE_NM", "ROUTENAME", "ROUTE_NAME")
+STATION_ID_COLUMNS = ("STATION_ID", "STATIONID")
+STATION_NM_COLUMNS = ("STATION_NM", "STATIONNAME", "STATION_NAME")
+STA_ORDER_COLUMNS  = ("STA_ORDER", "STAORDER", "STATION_SEQ")
+
+SCHEMA = """
+CREATE TABLE routes (route_id TEXT PRIMARY KEY, route_nm TEXT NOT NULL) WITHOUT ROWID;
+CREATE INDEX routes_by_nm ON routes (route_nm, route_id);
+CREATE TABLE stations (station_id TEXT PRIMARY KEY, station_nm TEXT) WITHOUT ROWID;
+CREATE TABLE route_stations (
+    station_id TEXT NOT NULL, route_id TEXT NOT NULL, sta_order INTEGER NOT NULL,
+    PRIMARY KEY (station_id, route_id, sta_order)) WITHOUT ROWID;
+"""
+
+
+def _read_rows(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096); f.seek(0)
+        delimiter = "|" if sample.count("|") > sample.count(",") else ","
+        reader = csv.reader(f, delimiter=delimiter)
+        header = [h.strip().upper() for h in next(reader)]
+        for row in reader:
+            if row: yield dict(zip(header, (v.strip() for v in row)))
+
+
+def _column(row, names, path):
+    for name in names:
+        if name in row: return row[name]
+    raise KeyError(f"{path}: {names[0]} 컬럼이 없습니다.")
+
+
+def build_catalog(routes_path, route_stations_path, stations_path=None, output=CATALOG_FILE):
+    # 임시 파일에 만든 뒤 교체하므로 부스가 읽는 중에도 안전하게 갱신된다
+    start = time.perf_counter()
+    tmp_path = output + ".tmp"
+    if os.path.exists(tmp_path): os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT OR REPLACE INTO routes VALUES (?, ?)",
+                         ((_column(r, ROUTE_ID_COLUMNS, routes_path), _column(r, ROUTE_NM_COLUMNS, routes_path).upper())
+                          for r in _read_rows(routes_path)))
+        conn.executemany("INSERT OR IGNORE INTO route_stations VALUES (?, ?, ?)",
+                         ((_column(r, STATION_ID_COLUMNS, route_stations_path), _column(r, ROUTE_ID_COLUMNS, route_stations_path),
+                           int(_column(r, STA_ORDER_COLUMNS, route_stations_path)))
+                          for r in _read_rows(route_stations_path)))
+        if stations_path:
+            conn.executemany("INSERT OR REPLACE INTO stations VALUES (?, ?)",
+                             ((_column(r, STATION_ID_COLUMNS, stations_path), _column(r, STATION_NM_COLUMNS, stations_path))
+                              for r in _read_rows(stations_path)))
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+        counts = [conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("routes", "route_stations", "stations")]
+    finally:
+        conn.close()
+    os.replace(tmp_path, output)
+    print(f"노선 {counts[0]}개, 노선-정류소 {counts[1]}개, 정류소 {counts[2]}개 -> {output} "
+          f"({os.path.getsize(output) // 1024} KB, {time.perf_counter() - start:.1f}s)")
+
+
+class RouteCatalog:
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        self._station_cache = {}
+
+    def close(self):
+        self._conn.close()
+
+    def station_routes(self, station_id):
+        # 정류소를 지나는 노선 {노선번호: (routeId, staOrder)} - 부스 정류소는 메모리에 올려 O(1) 조회
+        routes = self._station_cache.get(station_id)
+        if routes is None:
+            rows = self._conn.execute(
+                "SELECT r.route_nm, rs.route_id, MIN(rs.sta_order) FROM route_stations rs "
+                "JOIN routes r ON r.route_id = rs.route_id WHERE rs.station_id = ? "
+                "GROUP BY rs.route_id ORDER BY r.route_nm", (station_id,)).fetchall()
+            routes = {nm: (route_id, str(order)) for nm, route_id, order in rows}
+            self._station_cache[station_id] = routes
+        return routes
+
+    def route_ids(self, route_nm):
+        return [r[0] for r in self._conn.execute(
+            "SELECT route_id FROM routes WHERE route_nm = ?", (route_nm.upper(),))]
+
+    def lookup(self, route_nm, station_id=None):
+        # (routeId, staOrder). 정류소가 주어지면 그 정류소를 지나는 노선만
+        route_nm = route_nm.upper()
+        if station_id:
+            return self.station_routes(station_id).get(route_nm)
+        ids = self.route_ids(route_nm)
+        return (ids[0], None) if ids else None
+
+    def prefix_matches(self, prefix, station_id=None, limit=None):
+        prefix = prefix.upper()
+        if station_id:
+            matches = [nm for nm in self.station_routes(station_id) if nm.startswith(prefix)]
+            return matches[:limit] if limit else matches
+        sql = "SELECT DISTINCT route_nm FROM routes WHERE route_nm >= ? AND route_nm < ? ORDER BY route_nm"
+        params = [prefix, prefix + "￿"]
+        if limit:
+            sql += " LIMIT ?"; params.append(limit)
+        return [r[0] for r in self._conn.execute(sql, params)]
+
+    def count_prefix(self, prefix, station_id=None):
+        if station_id: return len(self.prefix_matches(prefix, station_id))
+        return self._conn.execute(
+            "SELECT COUNT(DISTINCT route_nm) FROM routes WHERE route_nm >= ? AND route_nm < ?",
+            (prefix.upper(), prefix.upper() + "￿")).fetchone()[0]
+
+    def station_name(self, station_id):
+        row = self._conn.execute("SELECT station_nm FROM stations WHERE station_id = ?", (station_id,)).fetchone()
+        return row[0] if row else None
+
+
+def open_catalog(path=CATALOG_FILE):
+    if not os.path.exists(path): return None
+    try:
+        return RouteCatalog(path)
+    except sqlite3.Error as e:
+        print(f"노선 카탈로그를 열 수 없습니다: {e}", file=sys.stderr)
+        return None
+
+
+def main():
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        build_catalog(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "lookup":
+        start = time.perf_counter()
+        catalog = RouteCatalog()
+        station_id = sys.argv[3] if len(sys.argv) > 3 else None
+        result = catalog.lookup(sys.argv[2], station_id)
+        print(f"{sys.argv[2]} -> {result}, 같은 접두어 노선 {catalog.count_prefix(sys.argv[2], station_id)}개 "
+              f"({(time.perf_counter() - start) * 1000:.2f} ms, 카탈로그 열기 포함)")
+    else:
+        print("사용법: route_catalog.py build <노선파일> <노선-정류소파일> [정류소파일]\n"
+              "        route_catalog.py lookup <노선번호> [정류소ID]", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
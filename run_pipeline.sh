@@ -7,6 +7,23 @@ echo "--- run_pipeline.sh 시작됨 - $(date) ---"
 LED_PIN = 18
 SYSFS_GPIO="/sys/class/gpio"
 
+echo
+echo "상주 부스 서비스로 음성 입력 요청 중..."
+python3 booth_client.py voice
+CLIENT_EXIT_CODE=$?
+if [ $CLIENT_EXIT_CODE -eq 0 ]; then
+    echo "--- 부스 서비스에서 등록/송신/안내까지 처리 완료 ---"
+    exit 0
+elif [ $CLIENT_EXIT_CODE -eq 4 ]; then
+    # 연결은 됐지만 응답이 없음: 서비스의 음성 세션이 아직 마이크를 쓰고 있을 수 있어 개별 스크립트로 넘어가지 않는다
+    echo "[오류] 부스 서비스 응답이 없습니다."
+    exit 1
+elif [ $CLIENT_EXIT_CODE -ne 3 ]; then
+    echo "[오류] 부스 서비스에서 음성 입력이 실패했습니다."
+    exit 1
+fi
+echo "부스 서비스가 없어 개별 스크립트로 실행합니다."
+
 echo
 echo "음성인식 모듈(speech_to_text_rpi.py) 실행 중..."
 
@@ -32,14 +49,8 @@ echo "음성인식으로 확인된 번호: $CONFIRMED_BUS"
 
 echo
 echo "아두이노우노로 시리얼 송신 중..."
-SERIAL_PORT="/dev/ttyACM0"
-BAUD_RATE=115200
-echo -e "${CONFIRMED_BUS}\n" > "$SERIAL_PORT"
-if [ $? -eq 0 ]; then
-    echo "[시리얼 송신 성공] $CONFIRMED_BUS -> $SERIAL_PORT"
-else
-    echo "[시리얼 송신 실패] $CONFIRMED_BUS"
-fi
+# 포트를 직접 쓰지 않고 링크 소유 프로세스(KEYPAD.py)를 거친다. 없으면 serial_link.py가 잠시 포트를 열어 ACK까지 확인
+python3 serial_link.py send "$CONFIRMED_BUS"
 
 echo "[LED 깜빡임 시작]"
 if [ ! -d "$SYSFS_GPIO/gpio$LED_PIN" ]; then
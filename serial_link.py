@@ -0,0 +1,405 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import threading
+import collections
+import socketserver
+
+import tracing
+
+# 아두이노(transmitter.ino) 시리얼 포트는 이 링크 하나만 연다. 다른 프로세스는 LINK_SOCKET으로 등록/구독한다
+SERIAL_PORT  = os.environ.get("BOOTH_SERIAL_PORT", "/dev/ttyACM0")
+BAUD_RATE    = 115200
+LINK_SOCKET  = "/tmp/booth_serial.sock"
+CLIENT_TIMEOUT = 10
+
+# 프레임: A5 5A | 길이 | 순번 | 종류 | 내용 | Fletcher-16(길이~내용). transmitter.ino와 같은 형식
+SYNC         = b"\xa5\x5a"
+MAX_PAYLOAD  = 48        # 우노 수신 버퍼(64바이트)에 프레임 하나가 통째로 들어가게
+T_REGISTER, T_ARRIVED, T_HELLO, T_ACK, T_LOG = ord("R"), ord("A"), ord("H"), ord("K"), ord("L")
+RELIABLE     = (T_REGISTER, T_ARRIVED, T_HELLO)   # 받으면 ACK를 돌려주는 종류
+ACK_TIMEOUT  = 0.25
+MAX_RETRIES  = 8
+BATCH_WINDOW = 0.02      # 이 시간 동안 들어온 등록 요청은 한 프레임으로 묶는다
+KEEPALIVE    = 5
+
+
+def checksum(data):
+    a = b = 0
+    for byte in data:
+        a = (a + byte) % 255
+        b = (b + a) % 255
+    return bytes((b, a))
+
+
+def encode_frame(seq, kind, payload=b""):
+    body = bytes((len(payload), seq & 0xFF, kind)) + payload
+    return SYNC + body + checksum(body)
+
+
+class FrameParser:
+    # 바이트 스트림에서 프레임을 꺼낸다. 깨진 프레임은 버리고 다음 동기 바이트부터 다시 찾는다
+    def __init__(self):
+        self.buffer = bytearray()
+        self.bad = 0
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        frames = []
+        while True:
+            start = self.buffer.find(SYNC)
+            if start < 0:
+                del self.buffer[:max(0, len(self.buffer) - 1)]
+                return frames
+            del self.buffer[:start]
+            if len(self.buffer) < 5: return frames
+            length = self.buffer[2]
+            end = 5 + length + 2
+            if length > MAX_PAYLOAD:
+                self.bad += 1
+                del self.buffer[:1]
+                continue
+            if len(self.buffer) < end: return frames
+            body = bytes(self.buffer[2:end - 2])
+            if checksum(body) != bytes(self.buffer[end - 2:end]):
+                self.bad += 1
+                del self.buffer[:1]
+                continue
+            frames.append((body[1], body[2], body[3:]))
+            del self.buffer[:end]
+
+
+class Delivery:
+    # 등록/신뢰 프레임 하나의 결과. wait()는 ACK를 받았고 아두이노가 거절하지 않았으면 True
+    # (rejected: 아두이노 송신 목록 10칸이 가득 차 넣지 못함. ACK 내용으로 알려 온다)
+    def __init__(self):
+        self.acked = None
+        self.rejected = False
+        self.latency = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return bool(self.acked) and not self.rejected
+
+    def _finish(self, acked, latency=None, rejected=False):
+        self.acked, self.latency, self.rejected = acked, latency, rejected
+        self._done.set()
+
+
+class _InFlight:
+    __slots__ = ("seq", "frame", "first_sent", "sent_at", "tries", "deliveries")
+
+    def __init__(self, seq, frame, now, deliveries):
+        self.seq, self.frame, self.deliveries = seq, frame, deliveries
+        self.first_sent = self.sent_at = now
+        self.tries = 1
+
+
+def open_port(path=SERIAL_PORT, baud=BAUD_RATE):
+    import serial
+    return serial.Serial(path, baud, timeout=0.05)
+
+
+class SerialLink:
+    # 시리얼 포트의 유일한 소유자. 신뢰 프레임은 한 번에 하나씩 보내고 ACK가 없으면 재전송(정지-대기 ARQ),
+    # 받은 프레임은 순번으로 중복을 걸러 구독자에게 나눠 준다 (주제: arrived, log, hello)
+    def __init__(self, port, ack_timeout=ACK_TIMEOUT, max_retries=MAX_RETRIES, batch_window=BATCH_WINDOW):
+        self.port = port
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.batch_window = batch_window
+        self.stats = {"frames_sent": 0, "retransmits": 0, "acked": 0, "failed": 0, "rejected": 0,
+                      "received": 0, "duplicates": 0, "bad_frames": 0}
+        self._parser = FrameParser()
+        self._tx_seq = 0
+        self._rx_seq = None
+        self._outbox = collections.deque()
+        self._pending = []
+        self._pending_since = None
+        self._inflight = None
+        self._subscribers = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+
+    def start(self):
+        self.send(T_HELLO)   # 상대가 이전 순번으로 중복 판정하지 않도록 먼저 알린다
+        self._threads = [threading.Thread(target=loop, daemon=True) for loop in (self._read_loop, self._write_loop)]
+        for t in self._threads: t.start()
+        return self
+
+    def close(self):
+        self.stop_server()
+        self._stop.set()
+        with self._cond: self._cond.notify_all()
+        for t in self._threads: t.join(1)
+        try: self.port.close()
+        except OSError: pass
+
+    def send(self, kind, payload=b""):
+        delivery = Delivery()
+        with self._cond:
+            self._outbox.append((kind, payload, [(None, delivery)]))
+            self._cond.notify_all()
+        return delivery
+
+    def register(self, bus):
+        # 바로 보내지 않고 BATCH_WINDOW 동안(또는 앞 프레임의 ACK를 기다리는 동안) 모아 한 프레임으로 보낸다
+        delivery = Delivery()
+        with self._cond:
+            for pending_bus, deliveries in self._pending:
+                if pending_bus == bus:
+                    deliveries.append((bus, delivery))
+                    break
+            else:
+                self._pending.append((bus, [(bus, delivery)]))
+            if self._pending_since is None: self._pending_since = time.monotonic()
+            self._cond.notify_all()
+        return delivery
+
+    def subscribe(self, callback, topics=None):
+        # callback(topic, data). 돌려준 함수를 부르면 구독 해제
+        entry = (set(topics) if topics else None, callback)
+        with self._cond: self._subscribers.append(entry)
+        def unsubscribe():
+            with self._cond:
+                if entry in self._subscribers: self._subscribers.remove(entry)
+        return unsubscribe
+
+    def _publish(self, topic, data):
+        with self._cond: subscribers = list(self._subscribers)
+        for topics, callback in subscribers:
+            if topics is not None and topic not in topics: continue
+            try: callback(topic, data)
+            except Exception as e: print(f"[Serial] 구독자 처리 오류({topic}): {e}", file=sys.stderr)
+
+    def _write(self, frame):
+        try:
+            with self._write_lock: self.port.write(frame)
+        except OSError as e:
+            print(f"시리얼 송신 오류: {e}", file=sys.stderr)
+
+    def _next_frame_locked(self, now):
+        if self._outbox: return self._outbox.popleft()
+        if not self._pending or now - self._pending_since < self.batch_window: return None
+        buses, deliveries, size = [], [], -1
+        while self._pending:
+            data = self._pending[0][0].encode("utf-8")
+            if buses and size + 1 + len(data) > MAX_PAYLOAD: break
+            bus, waiting = self._pending.pop(0)
+            buses.append(data)
+            deliveries.extend(waiting)
+            size += 1 + len(data)
+        if not self._pending: self._pending_since = None
+        return T_REGISTER, b",".join(buses), deliveries
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                now = time.monotonic()
+                inflight = self._inflight
+                if inflight is None:
+                    item = self._next_frame_locked(now)
+                    if item is None:
+                        wait = self.batch_window - (now - self._pending_since) if self._pending else None
+                        self._cond.wait(wait)
+                        continue
+                    kind, payload, deliveries = item
+                    inflight = self._inflight = _InFlight(self._tx_seq, encode_frame(self._tx_seq, kind, payload), now, deliveries)
+                    self._tx_seq = (self._tx_seq + 1) & 0xFF
+                    self.stats["frames_sent"] += 1
+                elif now - inflight.sent_at < self.ack_timeout:
+                    self._cond.wait(self.ack_timeout - (now - inflight.sent_at))
+                    continue
+                elif inflight.tries > self.max_retries:
+                    self._inflight = None
+                    self.stats["failed"] += 1
+                    print(f"[Serial] ACK 없음, 프레임 {inflight.seq} 포기 ({inflight.tries}회 전송)", file=sys.stderr)
+                    for _, delivery in inflight.deliveries: delivery._finish(False)
+                    continue
+                else:
+                    inflight.tries += 1
+                    inflight.sent_at = now
+                    self.stats["retransmits"] += 1
+                frame = inflight.frame
+            self._write(frame)
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                data = self.port.read(self.port.in_waiting or 1)
+            except OSError as e:
+                print(f"시리얼 수신 오류: {e}", file=sys.stderr)
+                time.sleep(1); continue
+            if not data: continue
+            for seq, kind, payload in self._parser.feed(data):
+                self._on_frame(seq, kind, payload)
+            self.stats["bad_frames"] = self._parser.bad
+
+    def _on_frame(self, seq, kind, payload):
+        now = time.monotonic()
+        if kind == T_ACK:
+            with self._cond:
+                inflight = self._inflight
+                if inflight is None or inflight.seq != seq: return
+                self._inflight = None
+                self.stats["acked"] += 1
+                self._cond.notify_all()
+            tracing.record("serial.rtt", now - inflight.sent_at)
+            # ACK 내용은 아두이노가 목록에 넣지 못한 번호들 (쉼표 구분, 비어 있으면 모두 반영)
+            rejected = set(payload.decode("utf-8", errors="ignore").split(",")) if payload else set()
+            if rejected:
+                self.stats["rejected"] += len(rejected)
+                print(f"[Serial] 아두이노 목록이 가득 차 등록 거절: {', '.join(sorted(rejected))}", file=sys.stderr)
+            for bus, delivery in inflight.deliveries:
+                delivery._finish(True, now - inflight.first_sent, rejected=bus in rejected)
+            return
+        if kind in RELIABLE:
+            self._write(encode_frame(seq, T_ACK))
+            # HELLO는 상대가 다시 시작했다는 뜻이라 순번과 관계없이 받는다 (중복이어도 재등록은 무해)
+            if kind != T_HELLO and seq == self._rx_seq:
+                self.stats["duplicates"] += 1
+                return
+            self._rx_seq = seq
+        self.stats["received"] += 1
+        text = payload.decode("utf-8", errors="ignore")
+        if kind == T_ARRIVED: self._publish("arrived", text)
+        elif kind == T_LOG: self._publish("log", text)
+        elif kind == T_HELLO: self._publish("hello", None)
+
+    def start_server(self, socket_path=LINK_SOCKET):
+        if os.path.exists(socket_path): os.remove(socket_path)
+        self._server = _Server(socket_path, _ClientHandler)
+        self._server.link = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[Serial] 로컬 구독 대기 중: {socket_path}")
+
+    def stop_server(self):
+        server, self._server = self._server, None
+        if not server: return
+        server.shutdown()
+        server.server_close()
+        try: os.remove(server.server_address)
+        except OSError: pass
+
+
+class _ClientHandler(socketserver.StreamRequestHandler):
+    # 한 줄에 JSON 하나: register {bus, wait} | subscribe {topics} | stats | ping
+    def _reply(self, body):
+        self.wfile.write((json.dumps(body, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        link = self.server.link
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                self._reply({"ok": False, "error": str(e)}); continue
+            cmd = request.get("cmd")
+            if cmd == "subscribe": return self._stream(link, request.get("topics"))
+            if cmd == "register":
+                delivery = link.register(str(request["bus"]))
+                accepted = delivery.wait(CLIENT_TIMEOUT) if request.get("wait", True) else None
+                self._reply({"ok": True, "result": {"acked": delivery.acked, "rejected": delivery.rejected,
+                                                    "accepted": accepted, "latency": delivery.latency}})
+            elif cmd == "stats": self._reply({"ok": True, "result": dict(link.stats)})
+            elif cmd == "ping": self._reply({"ok": True, "result": True})
+            else: self._reply({"ok": False, "error": f"알 수 없는 명령: {cmd}"})
+
+    def _stream(self, link, topics):
+        events = queue.Queue()
+        unsubscribe = link.subscribe(lambda topic, data: events.put((topic, data)), topics)
+        try:
+            self._reply({"ok": True})
+            while True:
+                try: topic, data = events.get(timeout=KEEPALIVE)
+                except queue.Empty: topic, data = "keepalive", None   # 끊긴 구독자를 알아내기 위한 빈 메시지
+                self._reply({"topic": topic, "data": data})
+        except OSError:
+            pass
+        finally:
+            unsubscribe()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def call(cmd, socket_path=LINK_SOCKET, timeout=CLIENT_TIMEOUT + 5, **args):
+    # 링크 소유 프로세스가 없으면 ConnectionError (FileNotFoundError / ConnectionRefusedError)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(dict(args, cmd=cmd), ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            line = f.readline()
+    if not line: raise ConnectionError("링크 응답이 없습니다.")
+    return json.loads(line)
+
+
+def listen(topics=None, socket_path=LINK_SOCKET):
+    # (topic, data)를 계속 돌려준다
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({"cmd": "subscribe", "topics": topics}) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                message = json.loads(line)
+                if message["topic"] != "keepalive": yield message["topic"], message["data"]
+
+
+def send_bus(bus, socket_path=LINK_SOCKET, port_path=SERIAL_PORT):
+    # 링크 소유 프로세스(KEYPAD / serve)가 있으면 그쪽으로, 없으면 잠시 직접 포트를 열어 보낸다
+    try:
+        response = call("register", socket_path=socket_path, bus=bus)
+        return bool(response.get("ok") and response["result"]["accepted"])
+    except (FileNotFoundError, ConnectionRefusedError):
+        pass
+    # 포트를 열면 우노가 재시작하므로 부트로더 시간만큼 재전송을 넉넉히
+    link = SerialLink(open_port(port_path), max_retries=20).start()
+    try:
+        return link.register(bus).wait(CLIENT_TIMEOUT)
+    finally:
+        link.close()
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "serve":
+        link = SerialLink(open_port(sys.argv[2] if len(sys.argv) > 2 else SERIAL_PORT)).start()
+        link.subscribe(lambda topic, data: print(f"[{topic}] {data}"))
+        link.start_server()
+        try:
+            while True: time.sleep(3600)
+        except KeyboardInterrupt:
+            link.close()
+    elif cmd == "send" and len(sys.argv) > 2:
+        try:
+            ok = send_bus(sys.argv[2])
+        except OSError as e:
+            print(f"[시리얼 송신 실패] {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"[시리얼 송신 {'성공' if ok else '실패 (ACK 없음 또는 아두이노 목록 가득 참)'}] {sys.argv[2]}")
+        sys.exit(0 if ok else 1)
+    elif cmd == "listen":
+        try:
+            for topic, data in listen(sys.argv[2:] or None): print(f"[{topic}] {data}", flush=True)
+        except KeyboardInterrupt:
+            pass
+    elif cmd == "stats":
+        print(json.dumps(call("stats").get("result"), ensure_ascii=False, indent=1))
+    else:
+        print("사용법: serial_link.py serve [포트] | send <버스번호> | listen [주제...] | stats", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 import pyaudio
 from google.cloud import speech
-import re
-import time
 import os
 import sys
+import threading
+
+from mic_capture import CaptureEngine, PyAudioInput, PRE_ROLL_SECONDS
+from bus_number_decoder import BusNumberDecoder
+from bus_state import BusStateStore
+import tracing
+
+try:
+    import audio_frontend
+    FRONTEND_ENABLED = True
+except ImportError:
+    print("numpy가 없어 음성 전처리(무음 제거/다운샘플링)를 사용하지 않습니다.", file=sys.stderr)
+    FRONTEND_ENABLED = False
 
 try:
     from text_to_speech_rpi import speak
@@ -16,25 +27,20 @@ USB_SPEAKER_KEYWORD = "USB"
 USB_MIC_KEYWORD     = "USB"
 FORMAT, CHANNELS, RATE, CHUNK = pyaudio.paInt16, 1, 48000, 1024
 MAIN_RECORD_SECONDS, CONFIRM_RECORD_SECONDS = 3, 3
-kor2num = { '공': '0', '영': '0', '일': '1', '이': '2', '삼': '3', '사': '4', '오': '5', '육': '6', '칠': '7', '팔': '8', '구': '9' }
-kor_syllable_to_letter = { "에이": "A", "비": "B", "씨": "C", "디": "D", "이": "E", "에프": "F", "지": "G", "에이치": "H", "아이": "I", "제이": "J", "케이": "K", "엘": "L", "엠": "M", "엔": "N", "오": "O", "피": "P", "큐": "Q", "알": "R", "에스": "S", "티": "T", "유": "U", "브이": "V", "더블유": "W", "엑스": "X", "와이": "Y", "제트": "Z" }
+STT_STREAMING = True
+MAIN_STREAM_MAX_SECONDS, CONFIRM_STREAM_MAX_SECONDS = 8, 4
+END_OF_SINGLE_UTTERANCE = speech.StreamingRecognizeResponse.SpeechEventType.END_OF_SINGLE_UTTERANCE
+MAX_ALTERNATIVES = 5
 
 def log_and_speak(message, log_prefix="[STT 안내]"):
     print(f"{log_prefix} {message}")
     speak(message, speaker_keyword=USB_SPEAKER_KEYWORD)
 
 def add_bus_number(new_number, file_path):
-    bus_set = set()
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            bus_set = {line.strip() for line in f if line.strip()}
-    
-    bus_set.add(new_number)
-    
-    with open(file_path, 'w', encoding='utf-8') as f:
-        for bus in sorted(list(bus_set)):
-            f.write(bus + '\n')
-    print(f"  ▶ {file_path}에 {new_number} 추가/갱신 완료. 현재 목록: {sorted(list(bus_set))}")
+    # 키패드 프로세스와 동시에 써도 안전하도록 저널에 한 줄만 추가
+    store = BusStateStore(file_path)
+    store.add(new_number)
+    print(f"  ▶ {file_path}에 {new_number} 추가/갱신 완료. 현재 목록: {store.items()}")
 
 
 def get_microphone_device_index_stt(p_instance, keyword):
@@ -50,70 +56,159 @@ def get_microphone_device_index_stt(p_instance, keyword):
         print(f"STT: 기본 입력 장치 사용: {default_info['name']} (인덱스: {default_info['index']})"); return default_info['index']
     except Exception: return None
 
-def _process_korean_segment(segment_text):
-    processed_chars, i, n = [], 0, len(segment_text)
-    while i < n:
-        found_char = False
-        for kor_syl, letter in sorted(kor_syllable_to_letter.items(), key=lambda item: len(item[0]), reverse=True):
-            if segment_text[i:].startswith(kor_syl):
-                processed_chars.append(letter); i += len(kor_syl); found_char = True; break
-        if found_char: continue
-        if segment_text[i] in kor2num:
-            processed_chars.append(kor2num[segment_text[i]]); i += 1; found_char = True
-        if found_char: continue
-        char_upper = segment_text[i].upper()
-        if 'A' <= char_upper <= 'Z' or '0' <= char_upper <= '9':
-            processed_chars.append(char_upper); i += 1; found_char = True
-        if not found_char: i += 1
-    return "".join(processed_chars)
+_decoder = None
+
+def get_valid_routes():
+    try:
+        from fetch_and_speak import valid_route_numbers
+        return valid_route_numbers()
+    except (ImportError, SystemExit):
+        return None
+
+def get_decoder():
+    global _decoder
+    if _decoder is None: _decoder = BusNumberDecoder(get_valid_routes())
+    return _decoder
+
+def pick_bus_number(alternatives):
+    # 모든 인식 후보를 디코딩하고 실제 노선 번호와 맞는 후보를 우선
+    bus_number, score = get_decoder().best(alternatives)
+    return bus_number or ""
 
 def extract_bus_num(text):
     if not text: return ""
-    processed_text = re.sub(r'\s+', '', text.upper().replace("번", "").replace("버스", "").strip())
-    if not processed_text: return ""
-    match = re.fullmatch(r'([A-Z])?(\d{1,5})(?:-(\d{1,2}))?', processed_text)
-    if match:
-        bus_str = (match.group(1) or "") + match.group(2) + (("-" + match.group(3)) if match.group(3) else "")
-        return bus_str
-    segments = [_process_korean_segment(s) for s in processed_text.split("다시") if s and _process_korean_segment(s)]
-    if not segments: return ""
-    final_bus_num = segments[0]
-    if len(segments) > 1 and re.fullmatch(r'\d+', segments[0]) and re.fullmatch(r'\d+', segments[1]):
-        final_bus_num += "-" + segments[1]
-    if not re.search(r'\d', final_bus_num): return ""
-    if re.fullmatch(r'[A-Z]?\d{1,5}(?:-\d{1,2})?', final_bus_num) and len(final_bus_num) <= 8:
-        return final_bus_num
-    return ""
-
-def record_audio_pyaudio(duration_seconds):
-    p_rec = pyaudio.PyAudio(); mic_idx = get_microphone_device_index_stt(p_rec, USB_MIC_KEYWORD)
-    if mic_idx is None: p_rec.terminate(); return None
-    stream_rec = None; frames = []
+    return pick_bus_number([(text, 1.0)])
+
+def _alternatives(result):
+    alternatives = []
+    for alt in result.alternatives:
+        words = [w.confidence for w in getattr(alt, "words", ()) if w.confidence]
+        alternatives.append((alt.transcript, alt.confidence, words or None))
+    return alternatives
+
+_capture_engine = None
+_capture_lock = threading.Lock()
+
+def get_capture_engine():
+    # USB 마이크는 한 번만 열고 링 버퍼에 계속 녹음해 둔다 (pre-roll로 첫 음절 잘림 방지)
+    global _capture_engine
+    with _capture_lock:
+        if _capture_engine is None:
+            device = PyAudioInput(RATE, CHANNELS, CHUNK, lambda p: get_microphone_device_index_stt(p, USB_MIC_KEYWORD))
+            engine = CaptureEngine(device)
+            engine.start()
+            _capture_engine = engine
+        return _capture_engine
+
+def set_capture_engine(engine):
+    global _capture_engine
+    with _capture_lock:
+        _capture_engine = engine
+
+@tracing.traced("stt.record")
+def record_audio_pyaudio(duration_seconds, pre_roll=PRE_ROLL_SECONDS):
     try:
-        stream_rec = p_rec.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK, input_device_index=mic_idx)
-        print("STT: 마이크 녹음 시작..."); [frames.append(stream_rec.read(CHUNK, exception_on_overflow=False)) for _ in range(0, int(RATE / CHUNK * duration_seconds))]; print("STT: 녹음 완료.")
-        return b''.join(frames)
+        engine = get_capture_engine()
+        print("STT: 마이크 녹음 시작..."); audio = engine.record(duration_seconds, pre_roll=pre_roll); print("STT: 녹음 완료.")
+        return bytes(audio)
     except Exception as e: print(f"STT: PyAudio 녹음 중 오류: {e}", file=sys.stderr); return None
-    finally:
-        if stream_rec: stream_rec.stop_stream(); stream_rec.close()
-        if p_rec: p_rec.terminate()
 
-def recognize_google_cloud(audio_data):
+_speech_client = None
+_speech_client_lock = threading.Lock()
+
+def get_speech_client():
+    # 채널/인증을 매번 새로 맺지 않도록 프로세스당 클라이언트 하나를 재사용
+    global _speech_client
+    with _speech_client_lock:
+        if _speech_client is None:
+            _speech_client = speech.SpeechClient.from_service_account_json(KEY_FILE_PATH)
+        return _speech_client
+
+def set_speech_client(client):
+    global _speech_client
+    with _speech_client_lock:
+        _speech_client = client
+
+def _recognition_config(sample_rate=RATE):
+    return speech.RecognitionConfig(encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16, sample_rate_hertz=sample_rate, language_code="ko-KR",
+                                  max_alternatives=MAX_ALTERNATIVES, enable_word_confidence=True)
+
+@tracing.traced("stt.recognize")
+def recognize_google_cloud(audio_data, sample_rate=RATE):
     if not audio_data: return None
     try:
-        client = speech.SpeechClient.from_service_account_json(KEY_FILE_PATH)
+        client = get_speech_client()
         audio_input = speech.RecognitionAudio(content=audio_data)
-        config = speech.RecognitionConfig(encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16, sample_rate_hertz=RATE, language_code="ko-KR")
+        config = _recognition_config(sample_rate)
         print("STT: Google STT 서버로 음성 변환 요청 중...")
         response = client.recognize(config=config, audio=audio_input)
-        return response.results[0].alternatives[0].transcript if response.results else None
+        return _alternatives(response.results[0]) if response.results else None
     except Exception as e: print(f"STT: Google STT API 오류: {e}", file=sys.stderr); return None
 
+def stream_audio_chunks(max_seconds, stop_event, pre_roll=PRE_ROLL_SECONDS):
+    try: engine = get_capture_engine()
+    except Exception as e: print(f"STT: 마이크를 열 수 없습니다: {e}", file=sys.stderr); return
+    print("STT: 스트리밍 녹음 시작...")
+    yield from engine.iter_chunks(stop_event, max_seconds, pre_roll=pre_roll)
+    print("STT: 스트리밍 녹음 종료.")
+
+@tracing.traced("stt.recognize_streaming")
+def recognize_streaming(audio_chunks, stop_event=None, on_interim=None, sample_rate=RATE):
+    # 말하는 동안 청크를 보내고, 서버가 발화 끝(END_OF_SINGLE_UTTERANCE)을 알리면 녹음을 멈춘다
+    client = get_speech_client()
+    streaming_config = speech.StreamingRecognitionConfig(config=_recognition_config(sample_rate), interim_results=True, single_utterance=True)
+    requests = (speech.StreamingRecognizeRequest(audio_content=bytes(chunk)) for chunk in audio_chunks)
+    final_alternatives = None
+    for response in client.streaming_recognize(config=streaming_config, requests=requests):
+        if response.speech_event_type == END_OF_SINGLE_UTTERANCE and stop_event is not None:
+            stop_event.set()
+        for result in response.results:
+            if not result.alternatives: continue
+            if result.is_final: final_alternatives = _alternatives(result)
+            elif on_interim: on_interim(result.alternatives[0].transcript)
+    return final_alternatives
+
+def frontend_chunks(audio_chunks, stop_event):
+    # 발화 전 무음은 보내지 않고, 16kHz로 줄여 전송. 발화 후 긴 무음이면 로컬에서도 녹음 종료
+    frontend = audio_frontend.StreamingFrontend(input_rate=RATE)
+    for chunk in audio_chunks:
+        data = frontend.process(chunk)
+        if data: yield data
+        if frontend.ended:
+            stop_event.set(); break
+    print(f"STT: 전처리 {frontend.bytes_in} B -> {frontend.bytes_out} B")
+
+def listen_streaming(max_seconds):
+    stop_event = threading.Event()
+    chunks = stream_audio_chunks(max_seconds, stop_event)
+    sample_rate = RATE
+    if FRONTEND_ENABLED:
+        chunks = frontend_chunks(chunks, stop_event)
+        sample_rate = audio_frontend.TARGET_RATE
+    return recognize_streaming(chunks, stop_event, sample_rate=sample_rate,
+                               on_interim=lambda t: print(f"STT: 중간 인식 결과 \"{t}\""))
+
+def listen_and_recognize(record_seconds, stream_max_seconds):
+    if STT_STREAMING:
+        try:
+            return listen_streaming(stream_max_seconds)
+        except Exception as e:
+            print(f"STT: 스트리밍 인식 실패, 일반 인식으로 전환: {e}", file=sys.stderr)
+    audio_data = record_audio_pyaudio(record_seconds)
+    if not audio_data: return None
+    if not FRONTEND_ENABLED: return recognize_google_cloud(audio_data)
+    trimmed = audio_frontend.preprocess(audio_data, input_rate=RATE)
+    print(f"STT: 전처리 {len(audio_data)} B -> {len(trimmed)} B")
+    if not trimmed:
+        print("STT: 음성이 감지되지 않아 인식 요청을 생략합니다.")
+        return None
+    return recognize_google_cloud(trimmed, sample_rate=audio_frontend.TARGET_RATE)
+
 def listen_for_confirmation():
-    speak("네 또는 아니오로 답해주세요.", speaker_keyword=USB_SPEAKER_KEYWORD, block=False)
-    audio_confirm = record_audio_pyaudio(CONFIRM_RECORD_SECONDS)
-    if not audio_confirm: return None
-    text_confirm = recognize_google_cloud(audio_confirm)
+    # 안내 음성 속 "네"가 pre-roll에 섞이지 않도록 안내가 끝난 뒤부터 듣는다
+    speak("네 또는 아니오로 답해주세요.", speaker_keyword=USB_SPEAKER_KEYWORD)
+    alternatives = listen_and_recognize(CONFIRM_RECORD_SECONDS, CONFIRM_STREAM_MAX_SECONDS)
+    text_confirm = alternatives[0][0] if alternatives else None
     if text_confirm:
         print(f"STT: 확인 응답 인식 결과 :  \"{text_confirm}\"")
         positive = ["네", "예", "응", "맞아", "오케이", "확인", "어", "그래"]
@@ -122,18 +217,16 @@ def listen_for_confirmation():
         if any(n in text_confirm for n in negative): return False
     return None
 
-def main():
+@tracing.traced("stt.session")
+def run_voice_session(number_file='bus_number.txt'):
     confirmed_bus_number = None
     log_and_speak("버스 번호를 말씀해주세요.")
     while confirmed_bus_number is None:
-        audio_main = record_audio_pyaudio(MAIN_RECORD_SECONDS)
-        if not audio_main:
-            log_and_speak("음성 녹음에 실패했습니다. 다시 시도합니다."); time.sleep(1); continue
-        text_main = recognize_google_cloud(audio_main)
-        if not text_main:
+        alternatives = listen_and_recognize(MAIN_RECORD_SECONDS, MAIN_STREAM_MAX_SECONDS)
+        if not alternatives:
             log_and_speak("죄송합니다, 음성을 알아듣지 못했습니다. 다시 말씀해주세요."); continue
-        print(f"STT: 전체 음성 인식 결과 \"{text_main}\"")
-        bus_number_candidate = extract_bus_num(text_main)
+        print(f"STT: 전체 음성 인식 결과 {[alt[0] for alt in alternatives]}")
+        bus_number_candidate = pick_bus_number(alternatives)
         if not bus_number_candidate:
             log_and_speak("버스 번호를 찾지 못했습니다. 다시 말씀해주세요."); continue
         print(f"STT: 버스번호 추출 {bus_number_candidate}")
@@ -149,20 +242,28 @@ def main():
             log_and_speak("죄송합니다. 답변을 제대로 듣지 못했습니다. 다시 말씀해주세요.")
     
     if confirmed_bus_number:
-        add_bus_number(confirmed_bus_number, 'bus_number.txt')
+        add_bus_number(confirmed_bus_number, number_file)
         log_and_speak(f"{confirmed_bus_number} 번이 목록에 추가되었습니다.", log_prefix="[STT 최종 결과]")
-        print(f"CONFIRMED_BUS:{confirmed_bus_number}")
     else:
         log_and_speak("오류가 발생하여 버스 번호를 확인하지 못했습니다.", log_prefix="[STT 오류]")
+    return confirmed_bus_number
+
+def check_key_file():
+    if os.path.exists(KEY_FILE_PATH): return True
+    error_msg = f"치명적 오류: 서비스 계정 키 파일({KEY_FILE_PATH})을 찾을 수 없습니다."
+    print(error_msg, file=sys.stderr)
+    speak("시스템 설정에 문제가 있어 음성 인식을 시작할 수 없습니다.", speaker_keyword=USB_SPEAKER_KEYWORD)
+    return False
+
+def main():
+    confirmed_bus_number = run_voice_session()
+    if confirmed_bus_number:
+        print(f"CONFIRMED_BUS:{confirmed_bus_number}")
+    else:
         sys.exit(1) # 오류 발생 시 0이 아닌 코드로 종료
 
 if __name__ == "__main__":
-    if not os.path.exists(KEY_FILE_PATH):
-        error_msg = f"치명적 오류: 서비스 계정 키 파일({KEY_FILE_PATH})을 찾을 수 없습니다."
-        print(error_msg, file=sys.stderr)
-        if 'speak' in globals():
-            speak("시스템 설정에 문제가 있어 음성 인식을 시작할 수 없습니다.", speaker_keyword=USB_SPEAKER_KEYWORD)
+    if not check_key_file():
         exit(1)
     
     main()
-
@@ -0,0 +1,97 @@
+import sys
+import time
+import array
+import math
+import threading
+from types import SimpleNamespace
+
+SPEECH_EVENT_UNSPECIFIED = 0
+END_OF_SINGLE_UTTERANCE  = 1
+
+
+def _rms(chunk):
+    samples = array.array("h", chunk)
+    if not samples: return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def _response(transcript=None, is_final=False, event=SPEECH_EVENT_UNSPECIFIED):
+    results = []
+    if transcript is not None:
+        alternative = SimpleNamespace(transcript=transcript, confidence=0.9 if is_final else 0.0)
+        results.append(SimpleNamespace(is_final=is_final, alternatives=[alternative]))
+    return SimpleNamespace(results=results, speech_event_type=event)
+
+
+class LocalStreamingRecognizer:
+    # Google 스트리밍 인식 대신 쓰는 로컬 흉내 인식기.
+    # 청크 에너지로 발화 시작/끝을 판단하고, 발화 끝에서 END_OF_SINGLE_UTTERANCE 와 최종 결과를 돌려준다
+    def __init__(self, transcript, sample_rate=48000, threshold=500, silence_ms=300, interim_every=5):
+        self.transcript = transcript
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.silence_ms = silence_ms
+        self.interim_every = interim_every
+        self.speech_ended_at = None
+        self.result_at = None
+        self.chunks_received = 0
+
+    def streaming_recognize(self, config=None, requests=()):
+        in_speech, silence_samples, speech_chunks = False, 0, 0
+        silence_limit = self.sample_rate * self.silence_ms // 1000
+        for request in requests:
+            chunk = request.audio_content
+            self.chunks_received += 1
+            now = time.monotonic()
+            if _rms(chunk) >= self.threshold:
+                in_speech, silence_samples = True, 0
+                speech_chunks += 1
+                self.speech_ended_at = None
+                if speech_chunks % self.interim_every == 0:
+                    done = len(self.transcript) * min(speech_chunks, 50) // 50
+                    yield _response(self.transcript[:max(done, 1)])
+                continue
+            if not in_speech: continue
+            if self.speech_ended_at is None: self.speech_ended_at = now
+            silence_samples += len(chunk) // 2
+            if silence_samples >= silence_limit:
+                yield _response(event=END_OF_SINGLE_UTTERANCE)
+                self.result_at = time.monotonic()
+                yield _response(self.transcript, is_final=True)
+                return
+
+
+def synthetic_utterance(speech_seconds, silence_seconds, sample_rate=48000, chunk=1024, lead_seconds=0.3):
+    def block(seconds, amplitude):
+        for start in range(0, int(sample_rate * seconds), chunk):
+            yield array.array("h", (int(amplitude * math.sin(2 * math.pi * 220 * (start + i) / sample_rate))
+                                    for i in range(chunk))).tobytes()
+    yield from block(lead_seconds, 0)
+    yield from block(speech_seconds, 8000)
+    yield from block(silence_seconds, 0)
+
+
+def realtime(chunks, stop_event, sample_rate=48000, chunk=1024):
+    for data in chunks:
+        if stop_event.is_set(): return
+        time.sleep(chunk / sample_rate)
+        yield data
+
+
+def measure(transcript="오천백", speech_seconds=1.0):
+    import speech_to_text_rpi as stt
+    recognizer = LocalStreamingRecognizer(transcript, sample_rate=stt.RATE)
+    stt.set_speech_client(recognizer)
+    stop_event = threading.Event()
+    started = time.monotonic()
+    chunks = realtime(synthetic_utterance(speech_seconds, stt.MAIN_STREAM_MAX_SECONDS, stt.RATE, stt.CHUNK),
+                      stop_event, stt.RATE, stt.CHUNK)
+    result = stt.recognize_streaming(chunks, stop_event)
+    finished = time.monotonic()
+    print(f"인식 결과: {result}")
+    print(f"발화 끝 -> 결과: {(finished - recognizer.speech_ended_at) * 1000:.0f} ms")
+    print(f"전체 소요: {finished - started:.2f} s (고정 녹음 방식은 녹음만 {stt.MAIN_RECORD_SECONDS} s + 업로드)")
+
+
+if __name__ == "__main__":
+    measure(*sys.argv[1:2])
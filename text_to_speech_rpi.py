@@ -1,12 +1,20 @@
-import os
 import subprocess
 from gtts import gTTS
 import sys
 import re
+import queue
+import atexit
+import threading
+
+import tracing
+from tts_cache import clip_key, get_default_cache, prewarm
+from phrase_synth import PhraseEngine, all_fragments
+from audio_player import AudioPlayer, Mpg123Sink, PRIORITY_INFO
 
 TTS_LANG = 'ko'
-TTS_AUDIO_FILE = "temp_tts_output.mp3"
+TTS_SLOW = False
 
+@tracing.traced("audio.device_probe")
 def get_speaker_device_name_by_keyword(keyword):
     if not keyword:
         print("스피커 키워드가 없어 시스템 기본 장치를 사용합니다.")
@@ -34,32 +42,147 @@ def get_speaker_device_name_by_keyword(keyword):
         return None
 
 
-def speak(text_to_speak, speaker_keyword="USB", block=True):
-    if not text_to_speak or not text_to_speak.strip():
-        return
-    alsa_device = get_speaker_device_name_by_keyword(speaker_keyword)
+def render_clip(text, lang=TTS_LANG, slow=TTS_SLOW):
+    cache = get_default_cache()
+    key = clip_key(text, lang, slow)
+    path = cache.lookup(key)
+    if path:
+        return path
+    with tracing.span("tts.synthesize"):
+        tts = gTTS(text=text, lang=lang, slow=slow)
+        return cache.store(key, tts.write_to_fp)
+
+
+def prewarm_vocabulary(background=True):
+    if background:
+        t = threading.Thread(target=prewarm, args=(render_clip,), daemon=True)
+        t.start()
+        return t
+    return prewarm(render_clip)
+
+
+_phrase_engine = None
+_phrase_lock = threading.Lock()
+
+def get_phrase_engine():
+    global _phrase_engine
+    with _phrase_lock:
+        if _phrase_engine is None: _phrase_engine = PhraseEngine()
+        return _phrase_engine
+
+
+def prewarm_phrases(routes, background=True):
+    # 노선 번호/숫자/고정 구절 조각을 미리 합성 (이미 있는 조각은 건너뜀)
+    def run():
+        built = get_phrase_engine().build(all_fragments(routes), render_clip)
+        if built: print(f"[TTS Helper] 안내 문장 조각 {built}개 생성 완료")
+        return built
+    if background:
+        t = threading.Thread(target=run, daemon=True)
+        t.start()
+        return t
+    return run()
 
+
+def render_offline(text):
+    # 네트워크 없이 만들 수 있으면 클립 경로 (템플릿 문장은 조각 합성, 아니면 디스크 캐시), 없으면 None
     try:
-        tts = gTTS(text=text_to_speak, lang=TTS_LANG, slow=False)
-        tts.save(TTS_AUDIO_FILE)
+        clip_path = get_phrase_engine().render(text)
+    except Exception as e:
+        print(f"[TTS Helper] 조각 합성 실패, 온라인 합성으로 대체: {e}", file=sys.stderr)
+        clip_path = None
+    return clip_path or get_default_cache().lookup(clip_key(text, TTS_LANG, TTS_SLOW))
 
-        cmd = ["mpg123", "-q"]
-        if alsa_device:
-            cmd.extend(["-a", alsa_device])
-        
-        cmd.append(TTS_AUDIO_FILE)
-        
-        print(f"[TTS Helper] 다음 명령어로 재생 시도: {' '.join(cmd)}")
-        if block:
-            subprocess.run(cmd, check=True, timeout=30, capture_output=True, text=True)
-
-    except subprocess.CalledProcessError as e:
-        print("[TTS Helper] 치명적 오류: mpg123 실행 실패.", file=sys.stderr)
-        print(f"  - 오류 내용: {e.stderr.strip()}", file=sys.stderr)
-        print("스피커가 올바르게 연결되고 인식되었는지 확인하세요.", file=sys.stderr)
+
+def render_announcement(text):
+    # 템플릿 안내 문장은 저장된 조각을 이어 붙여 네트워크 없이 만들고, 나머지만 gTTS로 합성
+    return render_offline(text) or render_clip(text)
+
+
+_render_jobs = None
+_render_lock = threading.Lock()
+
+def _render_worker(jobs):
+    while True:
+        text, player, handle = jobs.get()
+        if handle.cancel_requested:
+            player.submit(handle, None)   # 큐에 넣지 않고 취소로 끝낸다
+            continue
+        try:
+            player.submit(handle, render_clip(text))
+        except Exception as e:
+            print(f"예외 발생: {e}", file=sys.stderr)
+            player.submit(handle, None, error=e)
+
+def render_later(text, player, priority):
+    # 온라인 합성이 필요한 문장은 합성 스레드 하나가 요청 순서대로 처리하고, 끝나면 재생 큐에 넣는다
+    global _render_jobs
+    with _render_lock:
+        if _render_jobs is None:
+            _render_jobs = queue.Queue()
+            threading.Thread(target=_render_worker, args=(_render_jobs,), daemon=True).start()
+    handle = player.reserve(priority)
+    _render_jobs.put((text, player, handle))
+    return handle
+
+
+_players = {}
+_players_lock = threading.Lock()
+
+def get_player(speaker_keyword="USB"):
+    with _players_lock:
+        player = _players.get(speaker_keyword)
+        if player is None:
+            sink = Mpg123Sink(lambda: get_speaker_device_name_by_keyword(speaker_keyword))
+            player = AudioPlayer(sink)
+            _players[speaker_keyword] = player
+        return player
+
+
+def set_player(player, speaker_keyword="USB"):
+    with _players_lock:
+        _players[speaker_keyword] = player
+
+
+def close_players():
+    with _players_lock:
+        players = list(_players.values())
+        _players.clear()
+    for player in players:
+        player.close()
+
+atexit.register(close_players)
+
+
+@tracing.traced("tts.speak")
+def speak(text_to_speak, speaker_keyword="USB", block=True, priority=PRIORITY_INFO):
+    if not text_to_speak or not text_to_speak.strip():
+        return None
+
+    player = get_player(speaker_keyword)
+    if not block:
+        # 호출한 쪽(키패드 이벤트 루프 등)은 gTTS 왕복을 기다리지 않는다
+        clip_path = render_offline(text_to_speak)
+        print(f"[TTS Helper] 재생 요청: {text_to_speak}")
+        if clip_path: return player.play(clip_path, priority=priority)
+        return render_later(text_to_speak, player, priority)
+
+    try:
+        clip_path = render_announcement(text_to_speak)
     except Exception as e:
         print(f"예외 발생: {e}", file=sys.stderr)
-    finally:
-        if os.path.exists(TTS_AUDIO_FILE):
-            os.remove(TTS_AUDIO_FILE)
+        return None
+
+    print(f"[TTS Helper] 재생 요청: {text_to_speak}")
+    handle = player.play(clip_path, priority=priority)
+    if block:
+        handle.wait()
+        if handle.error:
+            print("[TTS Helper] 치명적 오류: mpg123 재생 실패.", file=sys.stderr)
+            print(f"  - 오류 내용: {handle.error}", file=sys.stderr)
+            print("스피커가 올바르게 연결되고 인식되었는지 확인하세요.", file=sys.stderr)
+    return handle
+
 
+def cache_stats():
+    return get_default_cache().stats()
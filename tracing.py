@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import math
+import time
+import atexit
+import functools
+import threading
+
+# BOOTH_TRACE=1 일 때만 기록한다. 꺼져 있으면 span()은 공용 빈 객체를, traced 함수는 분기 하나만 거친다
+TRACE_FILE         = os.environ.get("BOOTH_TRACE_FILE",
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), "trace_histograms.json"))
+BUCKETS_PER_DECADE = 10      # 로그 간격 버킷 (한 자릿수당 10칸, 약 26% 간격)
+MIN_SECONDS        = 1e-6
+
+_enabled = os.environ.get("BOOTH_TRACE", "") not in ("", "0")
+_lock = threading.Lock()
+_histograms = {}
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        index = math.floor(math.log10(max(seconds, MIN_SECONDS)) * BUCKETS_PER_DECADE)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        # 해당 버킷의 상한값 (실제 최댓값을 넘지 않게)
+        if not self.count: return 0.0
+        target, seen = q * self.count, 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target: return min(10 ** ((index + 1) / BUCKETS_PER_DECADE), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count, "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0, "max": self.max,
+            "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+            "buckets": {f"{10 ** ((i + 1) / BUCKETS_PER_DECADE):.6g}": n for i, n in sorted(self.buckets.items())},
+        }
+
+
+def enabled():
+    return _enabled
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+def record(name, seconds):
+    if not _enabled or seconds is None: return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None: histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+class _NullSpan:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.start)
+        if exc_type is not None: record(self.name + ".error", 0.0)
+        return False
+
+
+def span(name):
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def traced(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled: return func(*args, **kwargs)
+            with _Span(name): return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def reset():
+    with _lock: _histograms.clear()
+
+def snapshot():
+    with _lock:
+        return {name: h.to_dict() for name, h in sorted(_histograms.items())}
+
+def export(path=TRACE_FILE):
+    data = {"exported_at": time.time(), "pid": os.getpid(), "spans": snapshot()}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+def report(spans=None, file=sys.stdout):
+    spans = snapshot() if spans is None else spans
+    print(f"{'구간':<28}{'횟수':>6}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'최대(ms)':>10}", file=file)
+    for name, h in spans.items():
+        print(f"{name:<28}{h['count']:>6}{h['p50'] * 1000:>10.1f}{h['p90'] * 1000:>10.1f}"
+              f"{h['p99'] * 1000:>10.1f}{h['max'] * 1000:>10.1f}", file=file)
+
+
+def _export_at_exit():
+    if not _enabled or not _histograms: return
+    try: print(f"[Trace] 히스토그램 저장: {export()}", file=sys.stderr)
+    except OSError as e: print(f"[Trace] 히스토그램 저장 실패: {e}", file=sys.stderr)
+
+atexit.register(_export_at_exit)
@@ -27,6 +27,42 @@ struct NumberItem {
 const int MAX_SUCCESS = 10; 
 
 
+// 라즈베리파이 시리얼 프레임: A5 5A | 길이 | 순번 | 종류 | 내용 | Fletcher-16 (serial_link.py와 같은 형식)
+#define SYNC1 0xA5
+#define SYNC2 0x5A
+#define MAX_PAYLOAD 48
+#define T_REGISTER 'R'
+#define T_ARRIVED  'A'
+#define T_HELLO    'H'
+#define T_ACK      'K'
+#define T_LOG      'L'
+#define ACK_TIMEOUT 250
+#define MAX_RETRIES 8
+#define OUT_QUEUE   12
+
+
+uint8_t rxBuf[MAX_PAYLOAD + 7];
+int rxLen = 0;
+int lastRxSeq = -1;
+// 마지막 등록 프레임에 돌려준 ACK 내용(목록이 가득 차 거절된 번호들). ACK가 유실되어 같은 프레임이 다시 오면 그대로 다시 보낸다
+uint8_t lastReply[MAX_PAYLOAD];
+uint8_t lastReplyLen = 0;
+
+
+// ACK를 받아야 하는 송신 프레임(HELLO / ARRIVED): 맨 앞 하나만 보내고 기다린다
+struct OutFrame {
+  uint8_t kind;
+  char payload[16];
+};
+OutFrame outQueue[OUT_QUEUE];
+int outHead = 0, outCount = 0;
+uint8_t txSeq = 0;
+bool inflight = false;
+uint8_t inflightSeq = 0;
+unsigned long inflightSentAt = 0;
+int inflightTries = 0;
+
+
 NumberItem sendList[10];
 int sendListSize = 0;
 int sendIndex    = 0;
@@ -35,6 +71,7 @@ unsigned long lastSendTime = 0;
 
 void setup() {
   Serial.begin(115200);
+  queueFrame(T_HELLO, "");
   lcd.init();
   lcd.backlight();
   lcd.clear();
@@ -51,31 +88,13 @@ void setup() {
   radio.stopListening();
 
 
-  Serial.println("Ready. Add bus numbers via Serial.");
+  sendLog("Ready. Add bus numbers via Serial.");
 }
 
 
 void loop() {
-  if (Serial.available()) {
-    String input = Serial.readStringUntil('\n');
-    input.trim();
-    if (input.length() > 0 && sendListSize < 10) {
-      bool exists = false;
-      for (int i = 0; i < sendListSize; i++) {
-        if (sendList[i].number.equals(input)) {
-          exists = true;
-          break;
-        }
-      }
-      if (!exists) {
-        sendList[sendListSize] = { input, 0, 0 };
-        sendListSize++;
-        Serial.print("Added bus: "); Serial.println(input);
-      } else {
-        Serial.print("Bus "); Serial.print(input); Serial.println(" already in list.");
-      }
-    }
-  }
+  pollSerial();
+  serviceOutgoing();
 
 
   unsigned long now = millis();
@@ -85,9 +104,7 @@ void loop() {
     item.tries++;
 
 
-    Serial.print("TX "); Serial.print(item.number);
-    Serial.print(" (try "); Serial.print(item.tries);
-    Serial.print(")  ACK "); Serial.println(ok ? "YES" : "NO");
+    sendLog(String("TX ") + item.number + " (try " + String(item.tries) + ")  ACK " + (ok ? "YES" : "NO"));
 
 
     lcd.clear();
@@ -104,8 +121,7 @@ void loop() {
     if (ok) { 
       item.successCount++;
       if (item.successCount >= MAX_SUCCESS) {
-        Serial.print("ARRIVED:");
-        Serial.println(item.number);
+        queueFrame(T_ARRIVED, item.number);
        
         removeNumberAt(sendIndex);
        
@@ -142,3 +158,153 @@ void removeNumberAt(int idx) {
   sendListSize--;
 }
 
+
+// 목록에 있으면(이미 있던 번호 포함) true, 목록이 가득 차 넣지 못하면 false
+bool addNumber(const String &input) {
+  if (input.length() == 0) return true;
+  for (int i = 0; i < sendListSize; i++) {
+    if (sendList[i].number.equals(input)) {
+      sendLog(String("Bus ") + input + " already in list.");
+      return true;
+    }
+  }
+  if (sendListSize >= 10) {
+    sendLog(String("List full: ") + input);
+    return false;
+  }
+  sendList[sendListSize] = { input, 0, 0 };
+  sendListSize++;
+  sendLog(String("Added bus: ") + input);
+  return true;
+}
+
+
+uint16_t fletcher16(const uint8_t *data, int len) {
+  uint16_t a = 0, b = 0;
+  for (int i = 0; i < len; i++) {
+    a = (a + data[i]) % 255;
+    b = (b + a) % 255;
+  }
+  return (b << 8) | a;
+}
+
+
+void writeFrame(uint8_t seq, uint8_t kind, const uint8_t *payload, uint8_t len) {
+  uint8_t body[MAX_PAYLOAD + 3];
+  if (len > MAX_PAYLOAD) len = MAX_PAYLOAD;
+  body[0] = len;
+  body[1] = seq;
+  body[2] = kind;
+  for (int i = 0; i < len; i++) body[3 + i] = payload[i];
+  uint16_t sum = fletcher16(body, len + 3);
+  Serial.write(SYNC1);
+  Serial.write(SYNC2);
+  Serial.write(body, len + 3);
+  Serial.write((uint8_t)(sum >> 8));
+  Serial.write((uint8_t)(sum & 0xFF));
+}
+
+
+// 상태 출력은 ACK 없이 보낸다 (파이에서 log 주제로 구독)
+void sendLog(const String &text) {
+  writeFrame(0, T_LOG, (const uint8_t *)text.c_str(), text.length());
+}
+
+
+void queueFrame(uint8_t kind, const String &payload) {
+  if (outCount >= OUT_QUEUE) return;
+  OutFrame &frame = outQueue[(outHead + outCount) % OUT_QUEUE];
+  frame.kind = kind;
+  payload.toCharArray(frame.payload, sizeof(frame.payload));
+  outCount++;
+}
+
+
+void serviceOutgoing() {
+  unsigned long now = millis();
+  if (inflight) {
+    if (now - inflightSentAt < ACK_TIMEOUT) return;
+    if (inflightTries > MAX_RETRIES) {
+      inflight = false;
+      outHead = (outHead + 1) % OUT_QUEUE;
+      outCount--;
+      return;
+    }
+  } else {
+    if (outCount == 0) return;
+    inflight = true;
+    inflightSeq = txSeq++;
+    inflightTries = 0;
+  }
+  OutFrame &frame = outQueue[outHead];
+  writeFrame(inflightSeq, frame.kind, (const uint8_t *)frame.payload, strlen(frame.payload));
+  inflightSentAt = now;
+  inflightTries++;
+}
+
+
+// 한 바이트씩 모아 프레임을 완성한다. 깨진 프레임은 ACK 없이 버려 파이가 재전송하게 한다
+void pollSerial() {
+  while (Serial.available()) {
+    uint8_t c = Serial.read();
+    if (rxLen == 0 && c != SYNC1) continue;
+    if (rxLen == 1 && c != SYNC2) {
+      rxLen = (c == SYNC1) ? 1 : 0;
+      continue;
+    }
+    rxBuf[rxLen++] = c;
+    if (rxLen == 3 && rxBuf[2] > MAX_PAYLOAD) {
+      rxLen = 0;
+      continue;
+    }
+    if (rxLen >= 3 && rxLen == rxBuf[2] + 7) {
+      handleFrame();
+      rxLen = 0;
+    }
+  }
+}
+
+
+void handleFrame() {
+  uint8_t len = rxBuf[2], seq = rxBuf[3], kind = rxBuf[4];
+  uint16_t sum = fletcher16(rxBuf + 2, len + 3);
+  if (rxBuf[5 + len] != (sum >> 8) || rxBuf[6 + len] != (sum & 0xFF)) return;
+
+  if (kind == T_ACK) {
+    if (inflight && seq == inflightSeq) {
+      inflight = false;
+      outHead = (outHead + 1) % OUT_QUEUE;
+      outCount--;
+    }
+    return;
+  }
+  if (kind != T_REGISTER && kind != T_HELLO) return;
+  if (kind == T_HELLO) {
+    writeFrame(seq, T_ACK, NULL, 0);
+    lastRxSeq = seq;
+    return;
+  }
+  if (seq == lastRxSeq) {   // ACK가 유실되어 다시 온 프레임
+    writeFrame(seq, T_ACK, lastReply, lastReplyLen);
+    return;
+  }
+  lastRxSeq = seq;
+
+  // 쉼표로 묶인 버스 번호들. 목록에 넣은 뒤 ACK를 보내고, 거절된 번호는 ACK 내용으로 알린다
+  String number = "", rejected = "";
+  for (int i = 0; i <= len; i++) {
+    char ch = (i < len) ? (char)rxBuf[5 + i] : ',';
+    if (ch != ',') {
+      number += ch;
+      continue;
+    }
+    if (!addNumber(number)) {
+      if (rejected.length() > 0) rejected += ',';
+      rejected += number;
+    }
+    number = "";
+  }
+  lastReplyLen = rejected.length();
+  for (int i = 0; i < lastReplyLen; i++) lastReply[i] = rejected[i];
+  writeFrame(seq, T_ACK, lastReply, lastReplyLen);
+}
@@ -0,0 +1,143 @@
+import os
+import sys
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+CACHE_DIR        = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+CACHE_MAX_BYTES  = 50 * 1024 * 1024
+CLIP_EXT         = ".mp3"
+
+# 부스 시작 시 미리 만들어 두는 고정 안내 문구 (키패드 에코 + 상태 안내)
+KEYPAD_VOCABULARY = [str(d) for d in range(10)] + ["지우기", "다시", "엠"]
+STATUS_VOCABULARY = [
+    "키패드 사용이 가능합니다.",
+    "음성 입력 모드로 전환합니다.",
+    "조회할 버스가 없습니다.",
+    "등록된 모든 버스의 실시간 도착 정보를 조회합니다.",
+    "입력된 버스 번호가 없습니다.",
+    "모든 버스 탑승이 완료되었습니다.",
+    "시리얼 장치 연결을 확인해주세요.",
+    "저장된 버스 정보가 없습니다.",
+    "버스 번호 파일을 읽는 데 실패했습니다.",
+    "버스 번호를 말씀해주세요.",
+    "네 또는 아니오로 답해주세요.",
+    "죄송합니다, 음성을 알아듣지 못했습니다. 다시 말씀해주세요.",
+    "버스 번호를 찾지 못했습니다. 다시 말씀해주세요.",
+    "알겠습니다. 버스 번호를 다시 말씀해주세요.",
+    "죄송합니다. 답변을 제대로 듣지 못했습니다. 다시 말씀해주세요.",
+]
+PREWARM_VOCABULARY = KEYPAD_VOCABULARY + STATUS_VOCABULARY
+
+
+def clip_key(text, lang, slow=False, tld="com"):
+    raw = "\x1f".join([text, lang, "slow" if slow else "normal", tld])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSClipCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, clip_ext=CLIP_EXT):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.clip_ext = clip_ext
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, 오래 안 쓴 순서
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.clip_ext)
+
+    def _load_index(self):
+        found = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                # 저장 도중 중단된 임시 파일 정리
+                try: os.remove(path)
+                except OSError: pass
+                continue
+            if not name.endswith(self.clip_ext): continue
+            try: st = os.stat(path)
+            except OSError: continue
+            found.append((st.st_mtime, name[:-len(self.clip_ext)], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def lookup(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            if not os.path.exists(path):
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try: os.utime(path, None)  # 재시작 후에도 LRU 순서 유지
+        except OSError: pass
+        return path
+
+    def store(self, key, writer):
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+                f.flush()
+                os.fsync(f.fileno())
+            size = os.path.getsize(tmp_path)
+            path = self._path(key)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict_locked(keep=key)
+        return path
+
+    def _evict_locked(self, keep=None):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep: break
+            size = self._entries.pop(key)
+            self._total_bytes -= size
+            try: os.remove(self._path(key))
+            except OSError: pass
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "clips": len(self._entries), "bytes": self._total_bytes}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TTSClipCache()
+        return _default_cache
+
+
+def prewarm(render_clip, phrases=PREWARM_VOCABULARY):
+    rendered = 0
+    for text in phrases:
+        try:
+            render_clip(text)
+            rendered += 1
+        except Exception as e:
+            print(f"[TTS Cache] 미리 생성 실패 '{text}': {e}", file=sys.stderr)
+    return rendered